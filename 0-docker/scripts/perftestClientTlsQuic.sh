@@ -35,6 +35,12 @@ if [ -z "$MUTUAL" ]; then
      MUTUAL="true"
 fi
 
+# text (default): "Execution i - ..." + client output
+# jsonl: one JSON object per handshake (see run_client)
+if [ -z "$OUTPUT_FORMAT" ]; then
+    OUTPUT_FORMAT="text"
+fi
+
 INTERFAZ="lo"
 
 echo "Applying netem rules to $INTERFAZ..."
@@ -85,6 +91,39 @@ echo "Running $0 with SIG_ALG=$SIG_ALG and KEM_ALG=$KEM_ALG"
 
 NUM_RUNS=$NUM_RUNS
 
+# ---------------------------
+# Structured output (OUTPUT_FORMAT=jsonl)
+# ---------------------------
+# Runs the client and prints one JSON line with protocol, auth mode, SIG, KEM,
+# run index, start/end timestamps, duration, exit status and netem settings.
+#   ts_*_ns : CLOCK_REALTIME in ns, same clock as pcap timestamps (join with captures)
+# There is no monotonic field: the runtime image has no tool that reads
+# CLOCK_MONOTONIC in ns, and /proc/uptime only has 10 ms resolution.
+# $1 = protocol, $2 = auth mode, rest = client command line
+run_client() {
+    proto=$1
+    auth=$2
+    shift 2
+
+    if [ "$OUTPUT_FORMAT" != "jsonl" ]; then
+        echo "Execution $i - $proto $auth"
+        "$@"
+        return
+    fi
+
+    ts_start=$(date +%s%N)
+    status=0
+    out=$("$@" 2>&1) || status=$?
+    ts_end=$(date +%s%N)
+
+    duration=$(printf '%s\n' "$out" | sed -n 's/.*Handshake duration: \([0-9.]*\) ms.*/\1/p' | head -n 1)
+    [ -n "$duration" ] || duration=null
+
+    printf '{"protocol":"%s","auth":"%s","sig":"%s","kem":"%s","run":%d,"ts_start_ns":%s,"ts_end_ns":%s,"duration_ms":%s,"exit":%d,"netem":{"tc_delay":"%s","tc_loss":"%s","profile":"%s"}}\n' \
+        "$proto" "$auth" "$SIG_ALG" "$KEM_ALG" "$i" "$ts_start" "$ts_end" \
+        "$duration" "$status" "$TC_DELAY" "$TC_LOSS" "${NETEM_PROFILE:-none}"
+}
+
 i=1
       
 
@@ -93,12 +132,11 @@ i=1
     if [ "$USE_TLS" = "true" ]; then
    
          if [ "$MUTUAL" = "true" ]; then
-           echo "Execution $i - TLS Mutual"
-
+           run_client TLS Mutual \
            openssl s_connection -connect $DOCKER_HOST:4433 -new  -verify 1 -CAfile $CERT_PATH/CA.crt -cert $CERT_PATH/user.crt  -key $CERT_PATH/user.key 
         
          else
-           echo "Execution $i - TLS Single" 
+           run_client TLS Single \
            openssl s_connection -connect $DOCKER_HOST:4433 -new -verify 1 -CAfile $CERT_PATH/CA.crt
 
          fi   
@@ -117,11 +155,11 @@ i=1
         #echo "Execution $i - QUIC"
 
          if [ "$MUTUAL" = "true" ]; then
-           echo "Execution $i - QUIC Mutual"
+           run_client QUIC Mutual \
            quics_connection -groups:$KEM_ALG -target:$DOCKER_HOST -CAfile:"$CERT_PATH/CA.crt" -cert $CERT_PATH/user.crt  -key $CERT_PATH/user.key 
 
          else
-           echo "Execution $i - QUIC Single" 
+           run_client QUIC Single \
            quics_connection -groups:$KEM_ALG -target:$DOCKER_HOST -CAfile:"$CERT_PATH/CA.crt"
 
          fi   
@@ -1,6 +1,7 @@
 import re
 import csv
 import sys
+import json
 from collections import defaultdict
 from itertools import zip_longest
 
@@ -12,29 +13,34 @@ log_file = sys.argv[1]
 
 tag = sys.argv[2]
 
-# Leer archivo
-with open(log_file, 'r') as f:
-    content = f.read()
-
-pattern = re.compile(
-    r"Running .*?with SIG_ALG=(\w+) and KEM_ALG=([-\w]+)\s+(.*?)(?=Running|\Z)",
-    re.DOTALL
-)
-
+running_pattern = re.compile(r"Running .*?with SIG_ALG=(\w+) and KEM_ALG=([-\w]+)")
 execution_pattern = re.compile(r"Execution \d+ - (TLS|QUIC)", re.IGNORECASE)
 handshake_pattern = re.compile(r"Handshake duration: ([\d.]+) ms")
 
-resultados = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-orden_kems = defaultdict(lambda: defaultdict(list))
-
-for match in pattern.finditer(content):
-    sig_alg = match.group(1)
-    kem_alg = match.group(2)
-    block = match.group(3)
 
+# Recorre el log línea a línea (Running → Execution N → Handshake duration)
+# sin cargar el fichero entero en memoria. Las líneas JSON del cliente
+# (OUTPUT_FORMAT=jsonl) ya traen todos los campos y se cargan sin regex.
+def iter_handshakes(lineas):
+    sig_alg = kem_alg = None
     current_protocolo = None
 
-    for line in block.splitlines():
+    for line in lineas:
+        if line.startswith('{"'):
+            registro = json.loads(line)
+            if registro["duration_ms"] is not None:
+                yield registro["protocol"].upper(), registro["sig"], registro["kem"], float(registro["duration_ms"])
+            continue
+
+        if "Running" in line:
+            m = running_pattern.search(line)
+            sig_alg, kem_alg = m.groups() if m else (None, None)
+            current_protocolo = None
+            continue
+
+        if kem_alg is None:
+            continue
+
         exec_match = execution_pattern.search(line)
         if exec_match:
             current_protocolo = exec_match.group(1).upper()
@@ -42,23 +48,56 @@ for match in pattern.finditer(content):
 
         hs_match = handshake_pattern.search(line)
         if hs_match and current_protocolo:
-            duration = float(hs_match.group(1))
-            if kem_alg not in orden_kems[current_protocolo][sig_alg]:
-                orden_kems[current_protocolo][sig_alg].append(kem_alg)
-            resultados[current_protocolo][sig_alg][kem_alg].append(duration)
-
-# Guardar los CSVs
-for protocolo, firmas in resultados.items():
-    for sig_alg, kem_dict in firmas.items():
-        kems = orden_kems[protocolo][sig_alg]
-        rows = list(zip_longest(*(kem_dict[kem] for kem in kems), fillvalue=""))
-
-        filename = f"{sig_alg}_{protocolo.lower()}_{tag}.csv"
-
-        print(filename)
-        with open(filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(kems)
-            writer.writerows(rows)
-
-print("CSV creados por cada SIG_ALG y protocolo (TLS/QUIC), columnas por KEM_ALG en orden de aparición.")
\ No newline at end of file
+            yield current_protocolo, sig_alg, kem_alg, float(hs_match.group(1))
+
+
+# Guardar el CSV de un bloque (protocolo, SIG_ALG) en cuanto termina
+def guardar_csv(protocolo, sig_alg, kem_dict, kems):
+    rows = list(zip_longest(*(kem_dict[kem] for kem in kems), fillvalue=""))
+
+    filename = f"{sig_alg}_{protocolo.lower()}_{tag}.csv"
+
+    print(filename)
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(kems)
+        writer.writerows(rows)
+
+
+# Si un bloque reaparece más adelante en el log, se recupera su CSV
+def cargar_csv(protocolo, sig_alg):
+    kem_dict, kems = defaultdict(list), []
+    with open(f"{sig_alg}_{protocolo.lower()}_{tag}.csv", newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        kems.extend(next(reader, []))
+        for fila in reader:
+            for kem, valor in zip(kems, fila):
+                if valor:
+                    kem_dict[kem].append(float(valor))
+    return kem_dict, kems
+
+
+escritos = set()
+actual = None
+kem_dict, kems = defaultdict(list), []
+
+with open(log_file, 'r') as f:
+    for protocolo, sig_alg, kem_alg, duration in iter_handshakes(f):
+        if (protocolo, sig_alg) != actual:
+            if actual is not None:
+                guardar_csv(*actual, kem_dict, kems)
+                escritos.add(actual)
+            actual = (protocolo, sig_alg)
+            if actual in escritos:
+                kem_dict, kems = cargar_csv(*actual)
+            else:
+                kem_dict, kems = defaultdict(list), []
+
+        if kem_alg not in kems:
+            kems.append(kem_alg)
+        kem_dict[kem_alg].append(duration)
+
+if actual is not None:
+    guardar_csv(*actual, kem_dict, kems)
+
+print("CSV creados por cada SIG_ALG y protocolo (TLS/QUIC), columnas por KEM_ALG en orden de aparición.")
@@ -1,37 +1,93 @@
 #!/bin/bash
 
+# Convierte en paralelo cada .pcapng del directorio a CSV.
+#   JOBS=<n>   procesos tshark simultáneos (por defecto, número de núcleos)
+#   FORCE=1    reconvierte aunque el CSV sea más reciente que la captura
+#              (un CSV cuya cabecera no tiene los campos actuales se rehace siempre)
+
 # Directorio que contiene los archivos .pcapng (puedes cambiarlo o usar "." para el actual)
-DIRECTORIO="./"
-
-# Campos a extraer
-CAMPOS=(
-  -e frame.number
-  -e frame.time_relative
-  -e frame.len
-  -e eth.src
-  -e eth.dst
-  -e ip.src
-  -e ip.dst
-  -e _ws.col.Protocol
-  -e _ws.col.Info
-)
-
-# Recorre cada archivo .pcapng del directorio
-for archivo in "$DIRECTORIO"/*.pcapng; do
-  # Obtener el nombre base sin extensión
-  nombre_base=$(basename "$archivo" .pcapng)
-  salida_csv="${DIRECTORIO}/${nombre_base}.csv"
-
-  echo "Convirtiendo: $archivo -> $salida_csv"
+DIRECTORIO="${1:-./}"
+
+JOBS="${JOBS:-$(nproc 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 4)}"
+
+# Milisegundos (EPOCHREALTIME requiere bash 5; si no, resolución de segundos)
+ahora_ms() {
+  if [[ -n "${EPOCHREALTIME:-}" ]]; then
+    local t="${EPOCHREALTIME/[.,]/}"
+    echo $(( t / 1000 ))
+  else
+    echo $(( $(date +%s) * 1000 ))
+  fi
+}
+
+# Convierte una captura: tshark escribe en un temporal que sólo se renombra
+# al CSV final si termina bien (nunca queda un CSV a medias).
+convertir() {
+  local archivo="$1"
+  local salida_csv="${archivo%.pcapng}.csv"
+  local tmp_csv
+  tmp_csv="$(dirname "$salida_csv")/.$(basename "$salida_csv").tmp.$$"
+
+  # Campos a extraer
+  local CAMPOS=(
+    -e frame.number
+    -e frame.time_relative
+    -e frame.len
+    -e eth.src
+    -e eth.dst
+    -e ip.src
+    -e ip.dst
+    -e _ws.col.Protocol
+    -e _ws.col.Info
+  )
 
+  # Actualizado sólo si es más reciente que la captura y tiene los mismos
+  # campos (la cabecera los nombra; sin distinguir mayúsculas entre versiones de tshark)
+  local esperada cabecera
+  esperada=$(printf '%s\n' "${CAMPOS[@]}" | grep -v '^-e$' | paste -sd, - | tr '[:upper:]' '[:lower:]')
+  if [[ "${FORCE:-0}" != "1" && -s "$salida_csv" && "$salida_csv" -nt "$archivo" ]]; then
+    cabecera=$(head -n 1 "$salida_csv" | tr -d '"\r' | tr '[:upper:]' '[:lower:]')
+    if [[ "$cabecera" == "$esperada" ]]; then
+      echo "Actualizado, se omite: $salida_csv"
+      return 0
+    fi
+  fi
+
+  local t0 t1
+  t0=$(ahora_ms)
   # Ejecutar tshark para convertir a CSV
-  tshark -n -r "$archivo" \
-    -T fields \
-    "${CAMPOS[@]}" \
-    -E header=y \
-    -E separator=, \
-    -E quote=d \
-    -E occurrence=f > "$salida_csv"
-done
-
-echo "Conversión completada."
+  if tshark -n -r "$archivo" \
+      -T fields \
+      "${CAMPOS[@]}" \
+      -E header=y \
+      -E separator=, \
+      -E quote=d \
+      -E occurrence=f > "$tmp_csv"; then
+    mv -f "$tmp_csv" "$salida_csv"
+    t1=$(ahora_ms)
+    echo "Convertido: $archivo -> $salida_csv ($(( t1 - t0 )) ms)"
+  else
+    rm -f "$tmp_csv"
+    echo "ERROR: tshark falló con $archivo"
+    return 1
+  fi
+}
+export -f convertir ahora_ms
+
+shopt -s nullglob
+archivos=("$DIRECTORIO"/*.pcapng)
+if [ ${#archivos[@]} -eq 0 ]; then
+  echo "No hay archivos .pcapng en '$DIRECTORIO'"
+  exit 0
+fi
+
+inicio=$(ahora_ms)
+estado=0
+printf '%s\0' "${archivos[@]}" | xargs -0 -n 1 -P "$JOBS" bash -c 'convertir "$1"' _ || estado=$?
+fin=$(ahora_ms)
+
+if [ $estado -ne 0 ]; then
+  echo "Conversión con errores."
+  exit 1
+fi
+echo "Conversión completada ($(( fin - inicio )) ms, $JOBS procesos)."
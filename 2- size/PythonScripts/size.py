@@ -3,6 +3,8 @@ import os
 import re
 from collections import defaultdict
 
+import pandas as pd
+
 # Ruta al directorio con los CSV de entrada
 directorio_entrada = '.'  # <-- cámbialo por la ruta real si es necesario
 # Ruta donde guardar los CSV de salida (puede ser el mismo)
@@ -41,22 +43,14 @@ for nombre_archivo in os.listdir(directorio_entrada):
         continue
 
     sig_alg, kem_alg = match.groups()
-    suma_quic = 0
 
     ruta_completa = os.path.join(directorio_entrada, nombre_archivo)
 
-    with open(ruta_completa, mode='r', newline='', encoding='utf-8') as f:
-        lector = csv.DictReader(f)
-        for fila in lector:
-            protocolo = fila["_ws.col.protocol"]
-            try:
-                longitud = int(fila["frame.len"])
-            except ValueError:
-                continue
-
-            if protocolo == "QUIC":
-                suma_quic += longitud
-
+    # Sólo las dos columnas necesarias; suma por protocolo vectorizada
+    tramas = pd.read_csv(ruta_completa, usecols=["_ws.col.protocol", "frame.len"], dtype={"_ws.col.protocol": "string"})
+    longitud = pd.to_numeric(tramas["frame.len"], errors="coerce")
+    suma_por_protocolo = longitud[longitud.notna()].astype("int64").groupby(tramas["_ws.col.protocol"]).sum()
+    suma_quic = int(suma_por_protocolo.get("QUIC", 0))
     
     agrupado_por_firma[sig_alg].append([kem_alg, suma_quic])
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+decrypt_cache.py
+Caché en disco de la disección descifrada de cada par (captura, keylog).
+
+Descifrar con -o tls.keylog_file es lo caro de handshake_bytes.py: aquí cada
+par se disecciona una sola vez y se guardan los campos extraídos por tshark
+(tipos y longitudes de los mensajes del handshake, key_share, longitud del
+certificado y de CertificateVerify, flags TCP, frames QUIC...) comprimidos
+con zlib. Volver a analizar (FORCE=1, otro informe, otro nivel) no vuelve a
+lanzar tshark.
+
+La clave es el hash del contenido de la captura, el del keylog y la lista de
+campos: si cambia cualquiera de los dos ficheros (p.ej. un keylog completado
+después) o se piden otros campos, la entrada deja de coincidir. El
+almacenamiento (índice de hashes, escritura atómica, expulsión LRU) es el de
+4- loss/scripts/cache_contenido.py, compartido con parse_cache.py.
+
+Variables de entorno:
+    DECRYPT_CACHE=0              desactiva la caché
+    DECRYPT_CACHE_DIR=<dir>      directorio (por defecto ~/.cache/tls-quic-decrypt)
+    DECRYPT_CACHE_MAX_MB=<n>     tamaño máximo en MB (por defecto 2048)
+"""
+
+import os
+import sys
+import zlib
+import hashlib
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+LOSS_SCRIPTS = os.path.join(REPO, "4- loss", "scripts")
+sys.path.insert(0, LOSS_SCRIPTS)
+from cache_contenido import CacheContenido  # noqa: E402
+
+CACHE_DIR = os.environ.get("DECRYPT_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "tls-quic-decrypt"))
+MAX_BYTES = int(float(os.environ.get("DECRYPT_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+CACHE = CacheContenido(CACHE_DIR, MAX_BYTES, "DECRYPT_CACHE")
+
+
+def activa():
+    return CACHE.activa()
+
+
+def clave(pcap, keylog, campos):
+    h = hashlib.blake2b(digest_size=20)
+    h.update(CACHE.hash_fichero(pcap).encode())
+    h.update(CACHE.hash_fichero(keylog).encode())
+    h.update("\t".join(campos).encode())
+    return h.hexdigest()
+
+
+def cargar_o_diseccionar(pcap, keylog, campos, diseccionar):
+    """
+    Devuelve la salida de texto de diseccionar() (tshark -T fields con `campos`)
+    para el par (pcap, keylog), descifrando sólo si el par no está en la caché.
+    """
+    if not activa():
+        return diseccionar()
+
+    nombre = clave(pcap, keylog, campos) + ".tsv.z"
+    datos = CACHE.leer(nombre)
+    if datos is not None:
+        try:
+            return zlib.decompress(datos).decode("utf-8")
+        except (zlib.error, UnicodeDecodeError):
+            pass
+
+    texto = diseccionar()
+    CACHE.guardar(nombre, zlib.compress(texto.encode("utf-8"), 6))
+    return texto
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+handshake_bytes.py
+Extracción en una sola pasada de tshark de los bytes del handshake TLS/QUIC.
+
+Antes analyze_tls_bytes.sh / analyze_quic_bytes.sh lanzaban tshark una vez por
+métrica (payload, bytes en el cable, SYN/ACK/RST, cada first_int...) y cada
+ejecución volvía a descifrar la captura entera. Aquí tshark se ejecuta una vez
+con todos los campos necesarios y la clasificación (filtro TLS, SYN, ACK-only,
+RST, CRYPTO, último 1-RTT) y el tamaño de keyshare/certificado/firma se hacen
+en Python con la misma semántica que los filtros originales.
+
+La disección descifrada de cada par (captura, keylog) se guarda en
+decrypt_cache.py, así que volver a analizar el mismo par no vuelve a descifrar.
+
+Además del resumen de la captura (keyshare/certificado/firma del primer
+handshake, como el `awk ... {print; exit}` original), con --per-handshake se
+escribe una fila por handshake: las tramas se agrupan por conexión
+(tcp.stream / quic.connection.number) y cada grupo se analiza por separado,
+para ver la variación entre ejecuciones por retransmisiones,
+HelloRetryRequest o paquetes coalescidos.
+
+Primer vuelo del servidor: bytes y segmentos del vuelo con el que el
+servidor responde al Client Hello / Initial y si chocó con su límite de
+envío antes de oír al cliente:
+  - TLS: ventana de congestión inicial, INITCWND segmentos (10, RFC 6928)
+    de MSS bytes (el menor MSS anunciado en el SYN / SYN-ACK), que crece en
+    slow start con lo que el cliente confirma.
+  - QUIC: límite anti-amplificación, 3 veces los bytes UDP recibidos del
+    cliente mientras su dirección no está validada (hasta su primer
+    paquete Handshake).
+Si lo desborda, el resto del vuelo espera a un ACK / paquete del cliente: un
+RTT de más, que se mide como el hueco (stall) entre el último envío dentro
+del límite y el siguiente. flight_overflow va también a la fila resumen.
+
+Contabilidad QUIC por datagrama (los que entran en total_quic con CRYPTO):
+bytes de datos CRYPTO, bytes de PADDING (el relleno obligatorio de los
+Initial hasta 1200 bytes), frames ACK y paquetes coalescidos en el mismo
+datagrama (Initial + Handshake...). Lo que queda hasta frame.len son
+cabeceras Ethernet/IP/UDP/QUIC, tag AEAD y el resto de frames.
+
+Uso (lo llaman los analyze_*.sh, que detectan el KEM y el CSV de salida):
+    python3 handshake_bytes.py tls|quic <capture.pcapng> <keylog_file> <output_csv> <kem>
+                               [--per-handshake <csv>]
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import tempfile
+import subprocess
+
+import decrypt_cache
+
+CAMPOS = [
+    "frame.number",
+    "frame.time_relative",
+    "frame.len",
+    "tcp.len",
+    "tcp.flags.syn",
+    "tcp.flags.ack",
+    "tcp.flags.fin",
+    "tcp.flags.reset",
+    "tcp.flags.push",
+    "tls.record.content_type",
+    "tls.record.length",
+    "tls.handshake.type",
+    "tls.handshake.extensions_key_share_key_exchange_length",
+    "tls.handshake.certificate_length",
+    "tls.handshake.sig_len",          # "Signature length" de CertificateVerify
+    "quic.frame_type",
+    "quic.header_form",
+    "tcp.stream",
+    "quic.connection.number",
+    "ip.src",
+    "tcp.srcport",
+    "udp.srcport",
+    "udp.length",
+    "tcp.options.mss_val",
+    "tcp.ack",
+    "quic.long.packet_type",
+    "quic.crypto.length",
+    "quic.padding_length",
+]
+
+CABECERA_CSV = {
+    "tls":  "kem,total_tcp,keyshare,certificate,signature,total_tls,flight_overflow",
+    "quic": "kem,keyshare,certificate,signature,1RTT,total_quic,flight_overflow,"
+            "crypto,padding,ack_frames,coalesced",
+}
+
+CABECERA_VUELO = "flight_bytes,flight_segments,flight_limit,flight_overflow,stall_ms"
+CABECERA_POR_HANDSHAKE = {
+    "tls":  "kem,handshake,keyshare,certificate,signature,total_tcp,total_tls,packets," + CABECERA_VUELO,
+    "quic": "kem,handshake,keyshare,certificate,signature,1RTT,total_quic,packets," + CABECERA_VUELO
+            + ",crypto,padding,ack_frames,coalesced",
+}
+
+# Campo que identifica la conexión (un handshake por conexión)
+CONEXION = {"tls": "tcp.stream", "quic": "quic.connection.number"}
+
+LINEA = "---------------------------------------------------------------"
+
+# Límites de envío del primer vuelo del servidor
+INITCWND = int(os.environ.get("INITCWND", "10"))   # segmentos (RFC 6928)
+MSS_POR_DEFECTO = 1460                               # si el SYN no trae la opción MSS
+AMPLIFICACION = 3                                    # RFC 9000, 8.1
+QUIC_HANDSHAKE = 2                                   # quic.long.packet_type
+
+QUIC_TIPOS_LONG = {0: "Initial", 1: "0-RTT", QUIC_HANDSHAKE: "Handshake", 3: "Retry"}
+QUIC_ACK = (0x02, 0x03)                              # ACK, ACK_ECN
+
+
+# ---------- Lectura: una única ejecución de tshark ----------
+def comando_tshark(pcap, keys, campos=CAMPOS):
+    cmd = ["tshark", "-r", pcap, "-o", f"tls.keylog_file:{keys}", "-T", "fields",
+           "-E", "separator=\t", "-E", "occurrence=a", "-E", "aggregator=,"]
+    for campo in campos:
+        cmd += ["-e", campo]
+    return cmd
+
+
+def parsear_tramas(lineas, campos=CAMPOS):
+    """Cada línea de tshark → dict campo → lista de valores (vacía si no aparece)."""
+    for linea in lineas:
+        valores = linea.rstrip("\r\n").split("\t")
+        if not valores or not valores[0]:
+            continue
+        valores += [""] * (len(campos) - len(valores))
+        yield {campo: [v for v in valor.split(",") if v] for campo, valor in zip(campos, valores)}
+
+
+def diseccionar(pcap, keys, campos=CAMPOS):
+    proc = subprocess.run(comando_tshark(pcap, keys, campos), stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL, text=True, check=True)
+    return proc.stdout
+
+
+def leer_tramas(pcap, keys, campos=CAMPOS):
+    # Un par (captura, keylog) ya diseccionado sale de la caché sin lanzar tshark
+    salida = decrypt_cache.cargar_o_diseccionar(pcap, keys, campos,
+                                                lambda: diseccionar(pcap, keys, campos))
+    return list(parsear_tramas(salida.splitlines(), campos))
+
+
+# ---------- Utilidades de campos ----------
+def enteros(trama, campo):
+    """Valores enteros decimales del campo (lo mismo que awk '/^[0-9]+$/')."""
+    return [int(v) for v in trama[campo] if v.isdigit()]
+
+
+def numeros(trama, campo):
+    """Valores numéricos admitiendo hexadecimal (p.ej. quic.frame_type = 0x06)."""
+    resultado = []
+    for v in trama[campo]:
+        try:
+            resultado.append(int(v, 0))
+        except ValueError:
+            pass
+    return resultado
+
+
+def flag(trama, campo):
+    """Booleanos de tshark: 1/0 o True/False según la versión."""
+    return any(v in ("1", "True", "true") for v in trama[campo])
+
+
+def primero(trama, campo):
+    valores = numeros(trama, campo)
+    return valores[0] if valores else None
+
+
+def first_int(tramas, tipo_handshake, campo):
+    """Primer entero de `campo` en las tramas con tls.handshake.type == tipo (0 si no hay)."""
+    for trama in tramas:
+        if tipo_handshake in numeros(trama, "tls.handshake.type"):
+            valores = enteros(trama, campo)
+            if valores:
+                return valores[0]
+    return 0
+
+
+def por_conexion(tramas, campo):
+    """Tramas agrupadas por el primer valor de `campo`, en orden de aparición de la conexión."""
+    grupos = {}
+    for trama in tramas:
+        conexion = primero(trama, campo)
+        if conexion is not None:
+            grupos.setdefault(conexion, []).append(trama)
+    return list(grupos.values())
+
+
+def emisor(trama):
+    return ((trama["ip.src"] or [""])[0],
+            (trama["tcp.srcport"] or trama["udp.srcport"] or [""])[0])
+
+
+def instante(trama):
+    try:
+        return float(trama["frame.time_relative"][0])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+def detalles_crypto(tramas):
+    return {
+        "keyshare":    first_int(tramas, 1, "tls.handshake.extensions_key_share_key_exchange_length"),
+        "certificate": first_int(tramas, 11, "tls.handshake.certificate_length"),
+        "signature":   first_int(tramas, 15, "tls.handshake.sig_len"),
+    }
+
+
+# ---------- Primer vuelo del servidor ----------
+def recorrer_vuelo(vuelo, limite):
+    """
+    vuelo: [(instante, bytes, límite vigente)] de los envíos del servidor.
+    Un envío que no cabía en el límite vigente en el envío anterior tuvo que
+    esperar al cliente: el hueco con el envío anterior es stall.
+    Devuelve (desbordado, stall en segundos).
+    """
+    enviado, desbordado, stall = 0, False, 0.0
+    t_previo, limite_previo = None, None
+    for t, n, limite in vuelo:
+        if t_previo is not None and enviado + n > limite_previo:
+            desbordado = True
+            stall += t - t_previo
+        enviado += n
+        t_previo, limite_previo = t, limite
+    return desbordado, stall
+
+
+def resultado_vuelo(vuelo, segmentos, limite):
+    desbordado, stall = recorrer_vuelo(vuelo, limite)
+    return {
+        "flight_bytes": sum(n for _, n, _ in vuelo),
+        "flight_segments": segmentos,
+        "flight_limit": limite,
+        "flight_overflow": int(desbordado),
+        "stall_ms": round(stall * 1000, 3),
+    }
+
+
+def primera_conexion(tramas, protocolo):
+    grupos = por_conexion(tramas, CONEXION[protocolo])
+    return grupos[0] if grupos else []
+
+
+def vuelo_tls(tramas):
+    """
+    Segmentos con datos del servidor entre el Client Hello y el siguiente
+    envío con datos del cliente, frente a la ventana inicial INITCWND × MSS.
+    En slow start cada byte confirmado por un ACK del cliente amplía la
+    ventana en otro, así que el límite vigente es ventana + 2 × confirmado.
+    Los segmentos se cuentan por MSS (una trama capturada con GSO/TSO puede
+    llevar varios).
+    """
+    tramas = primera_conexion(tramas, "tls")
+    mss = [n for t in tramas if flag(t, "tcp.flags.syn") for n in enteros(t, "tcp.options.mss_val")]
+    mss = min(mss) if mss else MSS_POR_DEFECTO
+    ventana = INITCWND * mss
+
+    cliente, vuelo, segmentos, confirmado = None, [], 0, 0
+    for t in tramas:
+        datos = primero(t, "tcp.len") or 0
+        if cliente is None:
+            if datos:
+                cliente = emisor(t)   # Client Hello
+            continue
+        if emisor(t) == cliente:
+            if datos:
+                break
+            # tcp.ack relativo: el SYN del servidor ocupa el número 0
+            confirmado = max(confirmado, (primero(t, "tcp.ack") or 1) - 1)
+        elif datos:
+            vuelo.append((instante(t), datos, ventana + 2 * confirmado))
+            segmentos += -(-datos // mss)
+    return resultado_vuelo(vuelo, segmentos, ventana)
+
+
+def vuelo_quic(tramas):
+    """
+    Datagramas del servidor hasta el primer paquete Handshake del cliente
+    (dirección validada), frente a AMPLIFICACION veces los bytes UDP
+    recibidos del cliente hasta ese momento.
+    """
+    tramas = primera_conexion(tramas, "quic")
+    cliente = emisor(tramas[0]) if tramas else None
+    recibido, vuelo = 0, []
+    for t in tramas:
+        datos = max((primero(t, "udp.length") or 0) - 8, 0)
+        if emisor(t) == cliente:
+            if vuelo and QUIC_HANDSHAKE in numeros(t, "quic.long.packet_type"):
+                break
+            recibido += datos
+        else:
+            vuelo.append((instante(t), datos, AMPLIFICACION * recibido))
+    limite = vuelo[0][2] if vuelo else 0
+    return resultado_vuelo(vuelo, len(vuelo), limite)
+
+
+def informe_vuelo(r):
+    limite = "initcwnd" if "wire_tcp" in r else "amplification limit"
+    print(LINEA)
+    print(f"✈️  Server first flight      : {r['flight_bytes']} bytes ({r['flight_segments']} segments)")
+    print(f"   • {limite:<22}: {r['flight_limit']} bytes")
+    if r["flight_overflow"]:
+        print(f"   ⚠️  Flight overflow: stalled {r['stall_ms']} ms waiting for the client")
+    else:
+        print("   ✅ Fits in the first flight")
+
+
+def fila_vuelo(r):
+    return (f"{r['flight_bytes']},{r['flight_segments']},{r['flight_limit']},"
+            f"{r['flight_overflow']},{r['stall_ms']}")
+
+
+# ---------- TLS ----------
+def es_tls_handshake(t):
+    # (tls.record.content_type == 22 || == 20) && tcp.len > 0 && tcp.flags.reset == 0
+    tipos = numeros(t, "tls.record.content_type")
+    return (22 in tipos or 20 in tipos) and (primero(t, "tcp.len") or 0) > 0 \
+        and not flag(t, "tcp.flags.reset")
+
+
+def es_syn(t):
+    return flag(t, "tcp.flags.syn") and primero(t, "tcp.len") == 0
+
+
+def es_ack_only(t):
+    return (flag(t, "tcp.flags.ack") and primero(t, "tcp.len") == 0
+            and not any(flag(t, f) for f in ("tcp.flags.syn", "tcp.flags.fin",
+                                              "tcp.flags.reset", "tcp.flags.push")))
+
+
+def es_rst(t):
+    return flag(t, "tcp.flags.reset")
+
+
+def sumar(tramas, filtro):
+    seleccion = [t for t in tramas if filtro(t)]
+    return sum(primero(t, "frame.len") or 0 for t in seleccion), len(seleccion)
+
+
+def analizar_tls(tramas):
+    handshake = [t for t in tramas if es_tls_handshake(t)]
+    longitudes = [n for t in handshake for n in enteros(t, "tls.record.length")]
+
+    r = {
+        "tls_records": len(longitudes),
+        "tls_payload": sum(longitudes),
+        "wire_tls": sum(primero(t, "frame.len") or 0 for t in handshake),
+        "wire_tls_pkts": len(handshake),
+        "frames": [(t["frame.number"][0], (t["frame.time_relative"] or [""])[0],
+                    (t["frame.len"] or [""])[0]) for t in handshake],
+    }
+    r["syn"], r["syn_pkts"] = sumar(tramas, es_syn)
+    r["ack"], r["ack_pkts"] = sumar(tramas, es_ack_only)
+    r["rst"], r["rst_pkts"] = sumar(tramas, es_rst)
+    r["wire_tcp"] = r["syn"] + r["ack"] + r["rst"]
+    r["tcp_pkts"] = r["syn_pkts"] + r["ack_pkts"] + r["rst_pkts"]
+    r["total"] = r["wire_tls"]
+    r["packets"] = r["wire_tls_pkts"] + r["tcp_pkts"]
+    r.update(detalles_crypto(tramas))
+    r.update(vuelo_tls(tramas))
+    return r
+
+
+def informe_tls(r):
+    print(f"📦 TLS records              : {r['tls_records']}")
+    print(f"🧩 tls.record.length (sum)  : {r['tls_payload']} bytes")
+    print(f"🧩 + headers (5B/record)    : {r['tls_payload'] + 5 * r['tls_records']} bytes")
+    print(f"🧲 TLS on the wire          : {r['wire_tls']} bytes ({r['wire_tls_pkts']} pkts)")
+    print(LINEA)
+    print(f"🔹 TCP SYN (len=0)          : {r['syn']} bytes ({r['syn_pkts']} pkts)")
+    print(f"🔹 TCP ACK-only (len=0)     : {r['ack']} bytes ({r['ack_pkts']} pkts)")
+    print(f"🔹 TCP RST                  : {r['rst']} bytes ({r['rst_pkts']} pkts)")
+    print(f"🧲 TCP on the wire          : {r['wire_tcp']} bytes ({r['tcp_pkts']} pkts)")
+    print(LINEA)
+    print(f"🔢 TOTAL selected           : {r['wire_tls'] + r['wire_tcp']} bytes "
+          f"({r['wire_tls_pkts'] + r['tcp_pkts']} pkts)")
+    print(LINEA)
+    print("🔎 TLS Handshake frames (number, t_rel, frame.len):")
+    for numero, t_rel, longitud in r["frames"]:
+        print(f"  • Frame {numero:<6} t={t_rel:<10} len={longitud}")
+
+    crypto = r["keyshare"] + r["certificate"] + r["signature"]
+    pct = crypto / r["wire_tls"] * 100 if r["wire_tls"] else 0.0
+    print(LINEA)
+    print("🔐 TLS 1.3 cryptographic details")
+    print(f"   • KeyShare (pk or ct)     : {r['keyshare']:4d} bytes")
+    print(f"   • Certificate             : {r['certificate']:4d} bytes")
+    print(f"   • Signature               : {r['signature']:4d} bytes")
+    print(f"   ➕ Useful crypto total     : {crypto:4d} bytes")
+    print(f"  TOTAL TLS - Useful crypto total : {r['wire_tls']:6d}  -  {crypto:6d} bytes")
+    print(f"  Non-crypto TLS payload           : {r['wire_tls'] - crypto:6d} bytes")
+    print(f"  % Crypto inside TLS             : {pct:6.2f} %")
+    informe_vuelo(r)
+
+
+def fila_tls(kem, r):
+    return (f"{kem},{r['wire_tcp']},{r['keyshare']},{r['certificate']},{r['signature']},{r['wire_tls']},"
+            f"{r['flight_overflow']}")
+
+
+def fila_tls_handshake(kem, n, r):
+    return (f"{kem},{n},{r['keyshare']},{r['certificate']},{r['signature']},"
+            f"{r['wire_tcp']},{r['wire_tls']},{r['packets']},{fila_vuelo(r)}")
+
+
+# ---------- QUIC ----------
+def es_short_header(valor):
+    return valor in ("0", "False", "false")
+
+
+def paquetes_datagrama(t):
+    """Tipo de cada paquete QUIC (coalescidos) del datagrama, en orden."""
+    largos = iter(numeros(t, "quic.long.packet_type"))
+    return ["1-RTT" if es_short_header(v) else QUIC_TIPOS_LONG.get(next(largos, None), "?")
+            for v in t["quic.header_form"]]
+
+
+def contabilizar_datagrama(t):
+    return {
+        "frame": t["frame.number"][0],
+        "len": primero(t, "frame.len") or 0,
+        "packets": paquetes_datagrama(t),
+        "crypto": sum(enteros(t, "quic.crypto.length")),
+        "padding": sum(enteros(t, "quic.padding_length")),
+        "acks": sum(1 for tipo in numeros(t, "quic.frame_type") if tipo in QUIC_ACK),
+    }
+
+
+def analizar_quic(tramas):
+    # quic.frame_type == 0x06 (CRYPTO) en cualquiera de los paquetes de la trama
+    crypto = [t for t in tramas if 6 in numeros(t, "quic.frame_type")]
+    # quic.header_form == 0 (short header / 1-RTT): nos quedamos con el último
+    uno_rtt = [t for t in tramas if any(es_short_header(v) for v in t["quic.header_form"])]
+    datagramas = [contabilizar_datagrama(t) for t in crypto]
+
+    r = {
+        "crypto_bytes": sum(primero(t, "frame.len") or 0 for t in crypto),
+        "last_1rtt": (primero(uno_rtt[-1], "frame.len") or 0) if uno_rtt else 0,
+        "datagrams": datagramas,
+        "crypto": sum(d["crypto"] for d in datagramas),
+        "padding": sum(d["padding"] for d in datagramas),
+        "ack_frames": sum(d["acks"] for d in datagramas),
+        "coalesced": sum(len(d["packets"]) - 1 for d in datagramas if d["packets"]),
+    }
+    r["total_quic"] = r["crypto_bytes"] + r["last_1rtt"]
+    r["total"] = r["total_quic"]
+    r["packets"] = len(crypto) + (1 if uno_rtt else 0)
+    r.update(detalles_crypto(tramas))
+    r.update(vuelo_quic(tramas))
+    return r
+
+
+def informe_quic(r):
+    print("🔐 QUIC/TLS details")
+    print(f"   • KeyShare (client) : {r['keyshare']} bytes")
+    print(f"   • Certificate       : {r['certificate']} bytes")
+    print(f"   • Signature         : {r['signature']} bytes")
+    print(LINEA)
+    print(f"🧩 Last 1-RTT (KP0)     : {r['last_1rtt']} bytes")
+    print(f"🧲 total_quic (CRYPTO+1RTT): {r['total_quic']} bytes")
+    print(LINEA)
+    print("🔎 QUIC datagrams with CRYPTO (number, len, packets, crypto, padding, ACK frames):")
+    for d in r["datagrams"]:
+        print(f"  • Frame {d['frame']:<6} len={d['len']:<5} {'+'.join(d['packets']):<22} "
+              f"crypto={d['crypto']:<5} padding={d['padding']:<5} acks={d['acks']}")
+    resto = r["crypto_bytes"] - r["crypto"] - r["padding"]
+    print(f"   • CRYPTO data             : {r['crypto']} bytes")
+    print(f"   • PADDING                 : {r['padding']} bytes")
+    print(f"   • Headers/AEAD/ACK/other  : {resto} bytes ({r['ack_frames']} ACK frames)")
+    print(f"   • Coalesced packets       : {r['coalesced']}")
+    informe_vuelo(r)
+
+
+def fila_contabilidad_quic(r):
+    return f"{r['crypto']},{r['padding']},{r['ack_frames']},{r['coalesced']}"
+
+
+def fila_quic(kem, r):
+    return (f"{kem},{r['keyshare']},{r['certificate']},{r['signature']},{r['last_1rtt']},{r['total_quic']},"
+            f"{r['flight_overflow']},{fila_contabilidad_quic(r)}")
+
+
+def fila_quic_handshake(kem, n, r):
+    return (f"{kem},{n},{r['keyshare']},{r['certificate']},{r['signature']},"
+            f"{r['last_1rtt']},{r['total_quic']},{r['packets']},{fila_vuelo(r)},{fila_contabilidad_quic(r)}")
+
+
+ANALISIS = {
+    "tls":  (analizar_tls, informe_tls, fila_tls),
+    "quic": (analizar_quic, informe_quic, fila_quic),
+}
+
+FILA_POR_HANDSHAKE = {"tls": fila_tls_handshake, "quic": fila_quic_handshake}
+
+
+# ---------- Desglose por handshake ----------
+def analizar_por_handshake(protocolo, tramas):
+    """Un resultado de analizar_tls / analizar_quic por conexión de la captura."""
+    analizar = ANALISIS[protocolo][0]
+    return [analizar(grupo) for grupo in por_conexion(tramas, CONEXION[protocolo])]
+
+
+def informe_por_handshake(resultados):
+    if not resultados:
+        print("⚠️  No connections found for the per-handshake breakdown")
+        return
+    totales = [r["total"] for r in resultados]
+    print(LINEA)
+    print(f"🔁 Handshakes in capture    : {len(resultados)}")
+    print(f"   • total min/median/max   : {min(totales)} / {statistics.median(totales):g} / {max(totales)} bytes")
+    for campo in ("keyshare", "certificate", "signature"):
+        valores = {r[campo] for r in resultados}
+        if len(valores) > 1:
+            print(f"   ⚠️  {campo} differs between handshakes: {sorted(valores)}")
+    desbordados = [r["stall_ms"] for r in resultados if r["flight_overflow"]]
+    if desbordados:
+        print(f"   ✈️  flight overflow in {len(desbordados)}/{len(resultados)} handshakes, "
+              f"median stall {statistics.median(desbordados):g} ms")
+
+
+def escribir_por_handshake(output_csv, protocolo, kem, resultados):
+    """Reescribe (atómicamente) la tabla por handshake de esta captura."""
+    directorio = os.path.dirname(output_csv) or "."
+    os.makedirs(directorio, exist_ok=True)
+    fila = FILA_POR_HANDSHAKE[protocolo]
+    fd, tmp = tempfile.mkstemp(dir=directorio, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(CABECERA_POR_HANDSHAKE[protocolo] + "\n")
+            for n, r in enumerate(resultados, 1):
+                f.write(fila(kem, n, r) + "\n")
+        os.replace(tmp, output_csv)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def rotar(output_csv):
+    """Aparta un CSV con otra cabecera a <csv>.old (o .old1, .old2...) y devuelve el nombre."""
+    destino, n = output_csv + ".old", 0
+    while os.path.exists(destino):
+        n += 1
+        destino = f"{output_csv}.old{n}"
+    os.replace(output_csv, destino)
+    return destino
+
+
+def anadir_fila(output_csv, protocolo, fila):
+    """
+    Añade la fila (y la cabecera si el CSV no existe) con escritura atómica.
+    Si el CSV existente tiene otras columnas (p.ej. generado por una versión
+    anterior), se aparta con rotar() en lugar de mezclar filas de distinta
+    anchura, que luego el merge y los plots leerían desalineadas.
+    """
+    previo = ""
+    if os.path.exists(output_csv):
+        with open(output_csv) as f:
+            previo = f.read()
+    if previo and previo.split("\n", 1)[0].rstrip("\r") != CABECERA_CSV[protocolo]:
+        antiguo = rotar(output_csv)
+        print(f"⚠️  {output_csv} has a different header (older layout): moved to {antiguo}")
+        previo = ""
+    if not previo:
+        previo = CABECERA_CSV[protocolo] + "\n"
+    elif not previo.endswith("\n"):
+        previo += "\n"
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(output_csv) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(previo + fila + "\n")
+        os.replace(tmp, output_csv)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bytes del handshake TLS/QUIC con una sola pasada de tshark")
+    ap.add_argument("protocolo", choices=sorted(ANALISIS))
+    ap.add_argument("pcap")
+    ap.add_argument("keylog")
+    ap.add_argument("output_csv")
+    ap.add_argument("kem")
+    ap.add_argument("--per-handshake", metavar="CSV", default=None,
+                    help="escribe también una fila por handshake (conexión) de la captura")
+    args = ap.parse_args()
+
+    analizar, informe, fila = ANALISIS[args.protocolo]
+    try:
+        tramas = leer_tramas(args.pcap, args.keylog)
+    except (OSError, subprocess.CalledProcessError) as e:
+        sys.exit(f"❌ tshark failed on {args.pcap}: {e}")
+
+    resultado = analizar(tramas)
+    informe(resultado)
+    anadir_fila(args.output_csv, args.protocolo, fila(args.kem, resultado))
+
+    if args.per_handshake:
+        resultados = analizar_por_handshake(args.protocolo, tramas)
+        informe_por_handshake(resultados)
+        escribir_por_handshake(args.per_handshake, args.protocolo, args.kem, resultados)
+
+
+if __name__ == "__main__":
+    main()
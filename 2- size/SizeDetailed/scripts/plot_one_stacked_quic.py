@@ -14,7 +14,10 @@ ALIASES = {
     "signature": ["signature", "sig"],
     # 👇 NUEVO: detectar columna 1-RTT (acepta varios alias)
     "rtt1": ["1rtt", "1-rtx", "1-rtt", "rtt1", "one_rtt", "kp0", "short_header"],
-    "total_quic": ["total_quic", "quic_total", "quic"]
+    "total_quic": ["total_quic", "quic_total", "quic"],
+    # Contabilidad por datagrama de handshake_bytes.py (opcional)
+    "crypto": ["crypto", "crypto_data"],
+    "padding": ["padding", "pad"]
 }
 
 def read_csv_robust(path: Path) -> pd.DataFrame:
@@ -38,7 +41,8 @@ def ensure_numeric(df, cols):
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("csv_file", help="Ruta al CSV (kem,keyshare,certificate,signature,1RTT,total_quic)")
+    ap.add_argument("csv_file", help="Ruta al CSV (kem,keyshare,certificate,signature,1RTT,total_quic"
+                                     "[,crypto,padding])")
     ap.add_argument("-o", "--output", help="Directorio de salida", default=None)
     ap.add_argument("--kb-base", type=int, default=1024, help="Bytes por KB (1000 o 1024).")
     args = ap.parse_args()
@@ -62,6 +66,15 @@ def main():
     sig_col = find_col(df, "signature")
     rtt_col = find_col(df, "rtt1")            # 👈 NUEVO
     quic_col= find_col(df, "total_quic")
+    crypto_col = find_col(df, "crypto")
+    pad_col    = find_col(df, "padding")
+    desglose = crypto_col is not None and pad_col is not None
+    # Un merge de CSV con cabeceras antiguas y nuevas deja crypto/padding vacíos
+    # en parte de las filas: sin desglose completo se vuelve al residual único
+    if desglose and df[[crypto_col, pad_col]].apply(pd.to_numeric, errors="coerce").isna().any().any():
+        print("AVISO: crypto/padding incompletos (CSV con cabeceras mezcladas); "
+              "se dibuja el residual QUIC sin desglose.", file=sys.stderr)
+        desglose = False
 
     missing_required = [n for n,c in [("kem",kem_col),("keyshare",ks_col),
                                       ("certificate",cert_col),("signature",sig_col),
@@ -72,7 +85,8 @@ def main():
         sys.exit(1)
 
     # 1-RTT es opcional; si no está, lo tratamos como 0
-    ensure_numeric(df, [ks_col, cert_col, sig_col, quic_col] + ([rtt_col] if rtt_col else []))
+    ensure_numeric(df, [ks_col, cert_col, sig_col, quic_col] + ([rtt_col] if rtt_col else [])
+                   + ([crypto_col, pad_col] if desglose else []))
 
     # Partes QUIC (KB)
     base = float(args.kb_base)
@@ -90,6 +104,18 @@ def main():
         print("AVISO: residual QUIC negativo; se recorta a 0 para el gráfico.", file=sys.stderr)
         resid_kb = np.maximum(resid_kb, 0)
 
+    # Con la contabilidad por datagrama el residual se reparte en resto del
+    # handshake TLS (CRYPTO), PADDING y cabeceras/AEAD/ACK
+    if desglose:
+        tls_kb = np.maximum(df[crypto_col].to_numpy(float) / base - (ks_kb + cert_kb + sig_kb), 0)
+        pad_kb = df[pad_col].to_numpy(float) / base
+        over_kb = quic_kb - (ks_kb + cert_kb + sig_kb + tls_kb + pad_kb + rtt_kb)
+        if np.any(over_kb < -1e-9):
+            print("AVISO: cabeceras QUIC negativas; se recortan a 0 para el gráfico.", file=sys.stderr)
+            over_kb = np.maximum(over_kb, 0)
+        for kem, t, p_, o in zip(kems, tls_kb, pad_kb, over_kb):
+            print(f"{kem}: TLS handshake restante {t:.2f} KB, PADDING {p_:.2f} KB, cabeceras/ACK {o:.2f} KB")
+
     x = np.arange(len(kems))
     width = 0.65
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -100,15 +126,27 @@ def main():
         "Certificate": "#748BAE",
         "Signature": "#C59FC9",
         "1-RTT": "#E5C16D",            # 👈 NUEVO
-        "QUIC Residual": "#9CCF7C"
+        "QUIC Residual": "#9CCF7C",
+        "TLS Handshake": "#B5D3E7",
+        "PADDING": "#D9D9D9",
+        "Headers": "#9CCF7C"
     }
 
     # Barras apiladas (añadimos 1-RTT)
     b_ks   = ax.bar(x, ks_kb,   width, label="KeyShare",                    color=colors["KeyShare"])
     b_cert = ax.bar(x, cert_kb, width, bottom=ks_kb,                        label="Certificate",                 color=colors["Certificate"])
     b_sig  = ax.bar(x, sig_kb,  width, bottom=ks_kb+cert_kb,                label="Signature",                   color=colors["Signature"])
-    b_rtt  = ax.bar(x, rtt_kb,  width, bottom=ks_kb+cert_kb+sig_kb,         label="1-RTT",                       color=colors["1-RTT"])  # 👈 NUEVO
-    b_rest = ax.bar(x, resid_kb,width, bottom=ks_kb+cert_kb+sig_kb+rtt_kb,  label="Non-cryptographic QUIC Data", color=colors["QUIC Residual"])
+    if desglose:
+        abajo = ks_kb + cert_kb + sig_kb
+        for etiqueta, valores, color in (("Other TLS Handshake", tls_kb, "TLS Handshake"),
+                                         ("Initial PADDING", pad_kb, "PADDING"),
+                                         ("1-RTT", rtt_kb, "1-RTT"),
+                                         ("QUIC Headers/AEAD/ACK", over_kb, "Headers")):
+            ax.bar(x, valores, width, bottom=abajo, label=etiqueta, color=colors[color])
+            abajo = abajo + valores
+    else:
+        b_rtt  = ax.bar(x, rtt_kb,  width, bottom=ks_kb+cert_kb+sig_kb,         label="1-RTT",                       color=colors["1-RTT"])  # 👈 NUEVO
+        b_rest = ax.bar(x, resid_kb,width, bottom=ks_kb+cert_kb+sig_kb+rtt_kb,  label="Non-cryptographic QUIC Data", color=colors["QUIC Residual"])
 
     # Totales encima
     for xi, total in zip(x, quic_kb):
@@ -133,7 +171,7 @@ def main():
 
     # Leyenda (con 1-RTT)
     handles, labels = ax.get_legend_handles_labels()
-    new_labels = ["KeyShare", "Certificate", "Signature", "1-RTT", "QUIC Record Payload"]
+    new_labels = labels if desglose else ["KeyShare", "Certificate", "Signature", "1-RTT", "QUIC Record Payload"]
     ax.legend(handles, new_labels, fontsize=12)
 
     fig.tight_layout()
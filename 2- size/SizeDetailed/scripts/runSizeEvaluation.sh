@@ -25,6 +25,14 @@ cp "$CSV/handshake_L1_merged.csv" "$CSV_DIR/handshake_L1_merged_TLS.csv"
 cp "$CSV/handshake_L3_merged.csv" "$CSV_DIR/handshake_L3_merged_TLS.csv"
 cp "$CSV/handshake_L5_merged.csv" "$CSV_DIR/handshake_L5_merged_TLS.csv"
 
+# Per-handshake breakdown (one row per connection), same level split
+./merge_levels.sh "$CSV/per_handshake"
+for lvl in L1 L3 L5; do
+  if [[ -f "$CSV/per_handshake/handshake_${lvl}_merged.csv" ]]; then
+    cp "$CSV/per_handshake/handshake_${lvl}_merged.csv" "$CSV_DIR/handshake_${lvl}_per_handshake_TLS.csv"
+  fi
+done
+
 # Generate stacked plots for each level
 python3 plot_one_stacked_tls.py "$CSV/handshake_L1_merged.csv"
 python3 plot_one_stacked_tls.py "$CSV/handshake_L3_merged.csv"
@@ -47,6 +55,14 @@ cp "$CSV/handshake_L1_merged.csv" "$CSV_DIR/handshake_L1_merged_QUIC.csv"
 cp "$CSV/handshake_L3_merged.csv" "$CSV_DIR/handshake_L3_merged_QUIC.csv"
 cp "$CSV/handshake_L5_merged.csv" "$CSV_DIR/handshake_L5_merged_QUIC.csv"
 
+# Per-handshake breakdown (one row per connection), same level split
+./merge_levels.sh "$CSV/per_handshake"
+for lvl in L1 L3 L5; do
+  if [[ -f "$CSV/per_handshake/handshake_${lvl}_merged.csv" ]]; then
+    cp "$CSV/per_handshake/handshake_${lvl}_merged.csv" "$CSV_DIR/handshake_${lvl}_per_handshake_QUIC.csv"
+  fi
+done
+
 
 # Generate stacked plots for each level
 python3 plot_one_stacked_quic.py "$CSV/handshake_L1_merged.csv"
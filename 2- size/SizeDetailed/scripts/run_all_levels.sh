@@ -5,11 +5,16 @@
 # Usage: ./run_all_levels_any.sh <ROOT> [tls|quic]
 # Example: ./run_all_levels_any.sh ../pcapKeysTLS tls
 #          ./run_all_levels_any.sh ../pcapKeysQUIC quic
+#
+# The captures are analysed in parallel:
+#   JOBS=<n>   number of workers (default: number of cores)
+#   FORCE=1    re-analyse captures whose CSV is already up to date
 set -euo pipefail
 
 ROOT="${1:-.}"
 PROTOCOL="${2:-tls}"
 proto="${PROTOCOL,,}"   # a minúsculas: tls/quic
+JOBS="${JOBS:-$(nproc 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 4)}"
 
 # Valida protocolo
 case "$proto" in
@@ -19,8 +24,20 @@ esac
 
 mkdir -p "$ROOT/csv"
 
-shopt -s nullglob
-for pcap in "$ROOT"/*.pcapng "$ROOT"/*.pcap; do
+# Milliseconds since epoch (EPOCHREALTIME needs bash 5; fallback to seconds)
+now_ms() {
+  if [[ -n "${EPOCHREALTIME:-}" ]]; then
+    local t="${EPOCHREALTIME/[.,]/}"
+    echo $(( t / 1000 ))
+  else
+    echo $(( $(date +%s) * 1000 ))
+  fi
+}
+
+# Analiza una captura; la salida se agrupa para que no se mezcle entre workers
+analyze_one() {
+  local pcap="$1"
+  local base keylog out rc=0 t0 t1
   base="$(basename "${pcap%.*}")"  # sin extensión
 
   # Regla de keylog por protocolo
@@ -32,15 +49,25 @@ for pcap in "$ROOT"/*.pcapng "$ROOT"/*.pcap; do
 
   if [[ ! -f "$keylog" ]]; then
     echo "⚠️  Keylog file not found for $pcap -> $keylog (skipping)"
-    continue
+    return 0
   fi
 
-  echo "▶️  $pcap  (PROTOCOL=${proto^^}, KEYLOG=$keylog)"
+  t0=$(now_ms)
+  out=$(./analyze_"${proto}"_bytes.sh "$pcap" "$keylog" "$ROOT" 2>&1) || rc=$?
+  t1=$(now_ms)
 
-  if [[ "$proto" = "tls" ]]; then
-    ./analyze_tls_bytes.sh "$pcap" "$keylog" "$ROOT"
-  else
-    ./analyze_quic_bytes.sh "$pcap" "$keylog" "$ROOT"
-  fi
-done
+  printf '▶️  %s  (PROTOCOL=%s, KEYLOG=%s) [%d ms]\n%s\n' \
+    "$pcap" "${proto^^}" "$keylog" $(( t1 - t0 )) "$out"
+  return $rc
+}
+export -f analyze_one now_ms
+export ROOT proto
+
+shopt -s nullglob
+pcaps=("$ROOT"/*.pcapng "$ROOT"/*.pcap)
+[[ ${#pcaps[@]} -eq 0 ]] && { echo "⚠️  No captures in $ROOT"; exit 0; }
 
+echo "⚙️  ${#pcaps[@]} captures, $JOBS workers"
+start=$(now_ms)
+printf '%s\0' "${pcaps[@]}" | xargs -0 -n 1 -P "$JOBS" bash -c 'analyze_one "$1"' _
+echo "⏱️  Total: $(( $(now_ms) - start )) ms"
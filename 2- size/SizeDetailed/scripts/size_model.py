@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+size_model.py
+Modelo analítico del tamaño del handshake TLS/QUIC a partir de sus componentes.
+
+Para cada combinación nueva de KEM y algoritmo de firma había que levantar los
+contenedores, capturar, descifrar y pasar handshake_bytes.py. Este modelo
+predice los bytes del handshake sumando:
+  - key_share del Client Hello y del Server Hello (tamaños de la IANA / FIPS 203
+    por grupo; los híbridos suman sus componentes),
+  - Certificate: los bytes medidos si el SIG_ALG está en los CSV, si no una
+    base de DER/X.509 calibrada + clave pública + firma de la CA,
+  - CertificateVerify: tamaño de la firma,
+  - el resto del handshake (framing, extensiones, Finished...) como constantes
+    calibradas contra handshake_L{1,3,5}_merged_{TLS,QUIC}.csv.
+
+TLS (total_tls, bytes TLS del handshake):
+    base + ks_cliente + ks_servidor + certificado + firma + ajuste_mlkem·[ML-KEM]
+QUIC (total_quic, frame.len de los datagramas con CRYPTO + último 1-RTT):
+    el cliente rellena cada Initial hasta 1200 bytes de UDP, así que sus
+    datagramas son n_c = ceil((ch_base + ks_cliente) / carga) de tamaño fijo;
+    el vuelo del servidor ocupa n_s = ceil(vuelo / carga) datagramas, cada uno
+    con Ethernet/IP/UDP (QUIC_CABECERA_FIJA) y la cabecera QUIC + AEAD
+    calibrada (cabecera), y como mínimo un datagrama completo (su Initial
+    también va relleno). cola = Finished del cliente + último 1-RTT.
+ch_base, sh_base, cabecera y cola se ajustan por búsqueda en rejilla (mínimo
+error absoluto medio); base y ajuste_mlkem de TLS por mínimos cuadrados.
+
+El error en la muestra es casi nulo en TLS porque el certificado de cada SIG
+medido se toma tal cual. Para estimar el de una consulta what-if, calibrate
+también recalibra dejando fuera cada KEM (cada punto: los KEM no se repiten
+entre niveles) y cada SIG_ALG (cuyo certificado pasa a salir de cert_base) y
+guarda ese error fuera de muestra en size_model.json.
+
+Uso:
+    python3 size_model.py calibrate [--csv-dir DIR] [--params size_model.json]
+        Ajusta el modelo, imprime el error por punto (en la muestra y
+        dejando fuera cada KEM / SIG_ALG) y guarda los parámetros.
+    python3 size_model.py predict --sig mldsa65 --kem x25519_mlkem768 [...]
+        Predice TLS y QUIC para cada par (sig, kem) de las listas dadas.
+        Usa los parámetros guardados (calibra si no existen).
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_DIR = os.path.join(BASE_DIR, "output", "csv")
+PARAMS = os.path.join(BASE_DIR, "size_model.json")
+
+# Algoritmo de firma de cada nivel en las capturas (runSizeEvaluation.sh)
+SIG_NIVEL = {"L1": "ed25519", "L3": "secp384r1", "L5": "secp521r1"}
+
+# key_share por grupo: (Client Hello, Server Hello) en bytes
+KEM_SHARES = {
+    "x25519": (32, 32),
+    "x448": (56, 56),
+    "p256": (65, 65),
+    "p384": (97, 97),
+    "p521": (133, 133),
+    "mlkem512": (800, 768),
+    "mlkem768": (1184, 1088),
+    "mlkem1024": (1568, 1568),
+}
+ALIAS_KEM = {"secp256r1": "p256", "secp384r1": "p384", "secp521r1": "p521"}
+
+# Firma: (clave pública, firma) en bytes; ECDSA con la firma DER típica
+SIG_TAMANOS = {
+    "ed25519": (32, 64),
+    "ed448": (57, 114),
+    "secp256r1": (65, 72),
+    "secp384r1": (97, 103),
+    "secp521r1": (133, 139),
+    "rsa2048": (270, 256),
+    "rsa3072": (398, 384),
+    "rsa4096": (526, 512),
+    "mldsa44": (1312, 2420),
+    "mldsa65": (1952, 3309),
+    "mldsa87": (2592, 4627),
+    "falcon512": (897, 666),
+    "falcon1024": (1793, 1280),
+    "slhdsa128s": (32, 7856),
+    "slhdsa128f": (32, 17088),
+}
+ALIAS_SIG = {
+    "p256": "secp256r1", "ecdsap256": "secp256r1",
+    "p384": "secp384r1", "ecdsap384": "secp384r1",
+    "p521": "secp521r1", "ecdsap521": "secp521r1",
+    "dilithium2": "mldsa44", "dilithium3": "mldsa65", "dilithium5": "mldsa87",
+}
+
+# QUIC: datagrama del Initial relleno (frame.len) y carga útil por datagrama
+QUIC_DATAGRAMA = 1262
+QUIC_CABECERA_FIJA = 42            # Ethernet + IPv4 + UDP
+QUIC_CARGA = QUIC_DATAGRAMA - QUIC_CABECERA_FIJA
+
+# Rejillas de la calibración QUIC
+REJILLA_CH = range(200, 701, 2)
+REJILLA_SH = range(0, 601, 2)
+REJILLA_CABECERA = range(0, 121)
+
+
+def normalizar(nombre):
+    return re.sub(r"[-_ ]", "", nombre.strip().lower())
+
+
+def componentes_kem(kem):
+    """Grupos que forman el KEM (x25519_mlkem768, X25519MLKEM768, p-256...)."""
+    nombre = normalizar(kem)
+    for alias, grupo in ALIAS_KEM.items():
+        nombre = nombre.replace(alias, grupo)
+    grupos = sorted(KEM_SHARES, key=len, reverse=True)
+    partes = re.findall("|".join(grupos), nombre)
+    if not partes or "".join(partes) != nombre:
+        raise ValueError(f"unknown KEM '{kem}' (known groups: {', '.join(KEM_SHARES)})")
+    return partes
+
+
+def shares_kem(kem):
+    partes = componentes_kem(kem)
+    cliente = sum(KEM_SHARES[p][0] for p in partes)
+    servidor = sum(KEM_SHARES[p][1] for p in partes)
+    return cliente, servidor, any(p.startswith("mlkem") for p in partes)
+
+
+def nombre_sig(sig):
+    nombre = normalizar(sig)
+    nombre = ALIAS_SIG.get(nombre, nombre)
+    if nombre not in SIG_TAMANOS:
+        raise ValueError(f"unknown SIG_ALG '{sig}' (known: {', '.join(SIG_TAMANOS)})")
+    return nombre
+
+
+# ---------------------------------------------------------------------------
+# Medidas
+# ---------------------------------------------------------------------------
+
+def cargar_medidas(csv_dir):
+    """Une los merged de TLS y QUIC por (nivel, kem) con el SIG_ALG del nivel."""
+    filas = []
+    for nivel, sig in SIG_NIVEL.items():
+        tls = os.path.join(csv_dir, f"handshake_{nivel}_merged_TLS.csv")
+        quic = os.path.join(csv_dir, f"handshake_{nivel}_merged_QUIC.csv")
+        if not (os.path.isfile(tls) and os.path.isfile(quic)):
+            print(f"⚠️ Missing merged CSVs for {nivel} in {csv_dir}, skipping")
+            continue
+        t = pd.read_csv(tls)
+        q = pd.read_csv(quic)[["kem", "certificate", "signature", "total_quic"]]
+        df = t.merge(q, on="kem", suffixes=("", "_quic"))
+        df["nivel"] = nivel
+        df["sig"] = sig
+        filas.append(df)
+    if not filas:
+        sys.exit(f"❌ No handshake_L*_merged_*.csv found in {csv_dir}")
+    df = pd.concat(filas, ignore_index=True)
+    shares = df["kem"].map(shares_kem)
+    df["ks_c"] = [s[0] for s in shares]
+    df["ks_s"] = [s[1] for s in shares]
+    df["pq"] = [int(s[2]) for s in shares]
+    return df
+
+
+# ---------------------------------------------------------------------------
+# Modelo
+# ---------------------------------------------------------------------------
+
+def quic_total(ks_c, servidor, p):
+    """total_quic a partir del key_share del cliente y el vuelo del servidor."""
+    n_c = np.ceil((p["ch_base"] + ks_c) / QUIC_CARGA)
+    vuelo = p["sh_base"] + servidor
+    n_s = np.ceil(vuelo / QUIC_CARGA)
+    servidor_dg = np.maximum(vuelo + p["cabecera"] * n_s, QUIC_CARGA) + QUIC_CABECERA_FIJA * n_s
+    return n_c * QUIC_DATAGRAMA + servidor_dg + p["cola"]
+
+
+def calibrar_tls(df):
+    fijo = (df["ks_c"] + df["ks_s"] + df["certificate"] + df["signature"]).to_numpy(float)
+    y = df["total_tls"].to_numpy(float) - fijo
+    a = np.column_stack([np.ones(len(df)), df["pq"].to_numpy(float)])
+    (base, ajuste), *_ = np.linalg.lstsq(a, y, rcond=None)
+    return {
+        "base": int(round(base)),
+        "ajuste_mlkem": int(round(ajuste)),
+        "total_tcp": int(df["total_tcp"].median()),
+    }
+
+
+def calibrar_quic(df):
+    """Rejilla (ch_base, sh_base, cabecera); la cola es la mediana del resto."""
+    ks_c = df["ks_c"].to_numpy(float)
+    servidor = (df["ks_s"] + df["certificate_quic"] + df["signature_quic"]).to_numpy(float)
+    y = df["total_quic"].to_numpy(float)
+
+    sh = np.array(REJILLA_SH, float)[:, None, None]
+    cab = np.array(REJILLA_CABECERA, float)[None, :, None]
+    vuelo = sh + servidor[None, None, :]
+    n_s = np.ceil(vuelo / QUIC_CARGA)
+    servidor_dg = np.maximum(vuelo + cab * n_s, QUIC_CARGA) + QUIC_CABECERA_FIJA * n_s
+
+    mejor = None
+    for ch in REJILLA_CH:
+        n_c = np.ceil((ch + ks_c) / QUIC_CARGA)
+        resto = y - n_c * QUIC_DATAGRAMA - servidor_dg
+        cola = np.median(resto, axis=2, keepdims=True)
+        mae = np.abs(resto - cola).mean(axis=2)
+        i, j = np.unravel_index(np.argmin(mae), mae.shape)
+        if mejor is None or mae[i, j] < mejor[0]:
+            mejor = (mae[i, j], ch, REJILLA_SH[i], REJILLA_CABECERA[j], cola[i, j, 0])
+    _, ch, sh_base, cabecera, cola = mejor
+    return {
+        "ch_base": int(ch),
+        "sh_base": int(sh_base),
+        "cabecera": int(cabecera),
+        "cola": int(round(cola)),
+    }
+
+
+def calibrar_certificados(df):
+    """Certificado medido por SIG_ALG y base DER para los que no se midieron."""
+    medidos = {}
+    for sig, g in df.groupby("sig"):
+        medidos[sig] = {
+            "certificate": int(g["certificate"].median()),
+            "certificate_quic": int(g["certificate_quic"].median()),
+        }
+    resto = [v["certificate"] - sum(SIG_TAMANOS[s]) for s, v in medidos.items()]
+    return medidos, int(round(float(np.mean(resto))))
+
+
+def calibrar(df):
+    medidos, cert_base = calibrar_certificados(df)
+    return {
+        "tls": calibrar_tls(df),
+        "quic": calibrar_quic(df),
+        "cert_base": cert_base,
+        "certificados": medidos,
+    }
+
+
+def predecir(params, sig, kem):
+    """Bytes TLS/QUIC del handshake (sig, kem) y su desglose."""
+    sig = nombre_sig(sig)
+    ks_c, ks_s, pq = shares_kem(kem)
+    pk, firma = SIG_TAMANOS[sig]
+    medido = params["certificados"].get(sig)
+    if medido:
+        cert_tls, cert_quic = medido["certificate"], medido["certificate_quic"]
+    else:
+        cert_tls = cert_quic = params["cert_base"] + pk + firma
+
+    t = params["tls"]
+    total_tls = t["base"] + ks_c + ks_s + cert_tls + firma + t["ajuste_mlkem"] * pq
+    total_quic = quic_total(ks_c, ks_s + cert_quic + firma, params["quic"])
+    return {
+        "sig": sig,
+        "kem": kem,
+        "ks_client": ks_c,
+        "ks_server": ks_s,
+        "certificate": cert_tls,
+        "signature": firma,
+        "cert_source": "measured" if medido else "model",
+        "total_tcp": t["total_tcp"],
+        "total_tls": int(total_tls),
+        "total_quic": int(total_quic),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Informes
+# ---------------------------------------------------------------------------
+
+def errores(nombre, medido, predicho):
+    err = predicho - medido
+    mae = np.abs(err).mean()
+    mape = (np.abs(err) / medido).mean() * 100
+    i = int(np.argmax(np.abs(err)))
+    print(f"   {nombre}: MAE {mae:.1f} B | max |err| {abs(err[i]):.0f} B | MAPE {mape:.2f}%")
+    return {"mae": round(float(mae), 1), "max_abs": int(abs(err[i])), "mape": round(float(mape), 2)}
+
+
+def informe_calibracion(df, params):
+    pred = pd.DataFrame([predecir(params, s, k) for s, k in zip(df["sig"], df["kem"])])
+    df = df.assign(pred_tls=pred["total_tls"].to_numpy(), pred_quic=pred["total_quic"].to_numpy())
+    df["err_tls"] = df["pred_tls"] - df["total_tls"]
+    df["err_quic"] = df["pred_quic"] - df["total_quic"]
+
+    print(f"{'level':<6}{'kem':<18}{'tls':>7}{'pred':>7}{'err':>6}{'quic':>8}{'pred':>7}{'err':>6}")
+    for _, r in df.iterrows():
+        print(f"{r['nivel']:<6}{r['kem']:<18}{r['total_tls']:>7}{r['pred_tls']:>7}{r['err_tls']:>+6}"
+              f"{r['total_quic']:>8}{r['pred_quic']:>7}{r['err_quic']:>+6}")
+    print("📏 Model error:")
+    return {
+        "points": len(df),
+        "tls": errores("TLS ", df["total_tls"].to_numpy(float), df["pred_tls"].to_numpy(float)),
+        "quic": errores("QUIC", df["total_quic"].to_numpy(float), df["pred_quic"].to_numpy(float)),
+    }
+
+
+def error_fuera_de_muestra(df):
+    """
+    Error de predicción de puntos no usados en el ajuste: para cada valor de
+    `kem` y de `sig` se recalibra sin sus puntos y se predicen esos puntos.
+    """
+    resultado = {}
+    for columna, clave in (("kem", "leave_one_kem_out"), ("sig", "leave_one_sig_out")):
+        pred = {}
+        for valor, fuera in df.groupby(columna):
+            params = calibrar(df[df[columna] != valor])
+            for i, s, k in zip(fuera.index, fuera["sig"], fuera["kem"]):
+                pred[i] = predecir(params, s, k)
+        orden = sorted(pred)
+        print(f"📏 Leave-one-{columna}-out error ({len(df[columna].unique())} fits):")
+        resultado[clave] = {
+            "tls": errores("TLS ", df.loc[orden, "total_tls"].to_numpy(float),
+                           np.array([pred[i]["total_tls"] for i in orden], float)),
+            "quic": errores("QUIC", df.loc[orden, "total_quic"].to_numpy(float),
+                            np.array([pred[i]["total_quic"] for i in orden], float)),
+        }
+    return resultado
+
+
+def cmd_calibrate(args):
+    df = cargar_medidas(args.csv_dir)
+    params = calibrar(df)
+    print(f"🔧 Calibrated on {len(df)} measurements from {args.csv_dir}")
+    print(f"   TLS : base={params['tls']['base']} ajuste_mlkem={params['tls']['ajuste_mlkem']}"
+          f" total_tcp={params['tls']['total_tcp']}")
+    q = params["quic"]
+    print(f"   QUIC: ch_base={q['ch_base']} sh_base={q['sh_base']} cabecera={q['cabecera']}"
+          f" cola={q['cola']}")
+    print(f"   cert_base={params['cert_base']} (unmeasured SIG_ALG)")
+    params["error"] = informe_calibracion(df, params)
+    params["error"].update(error_fuera_de_muestra(df))
+    with open(args.params, "w") as f:
+        json.dump(params, f, indent=2)
+    print(f"💾 Parameters saved to {args.params}")
+    return params
+
+
+def cmd_predict(args):
+    if os.path.isfile(args.params):
+        with open(args.params) as f:
+            params = json.load(f)
+    else:
+        print(f"⚠️ {args.params} not found, calibrating first")
+        params = cmd_calibrate(args)
+
+    try:
+        consultas = [(s, k) for s in args.sig for k in args.kem]
+        filas = [predecir(params, s, k) for s, k in consultas]
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+
+    repeticiones = 10000
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        for s, k in consultas:
+            predecir(params, s, k)
+    us = (time.perf_counter() - t0) / (repeticiones * len(consultas)) * 1e6
+
+    print(f"{'sig':<12}{'kem':<18}{'ks_c':>6}{'ks_s':>6}{'cert':>7}{'sig_b':>7}"
+          f"{'tls':>7}{'quic':>7}")
+    for r in filas:
+        cert = f"{r['certificate']}{'*' if r['cert_source'] == 'model' else ''}"
+        print(f"{r['sig']:<12}{r['kem']:<18}{r['ks_client']:>6}{r['ks_server']:>6}{cert:>7}"
+              f"{r['signature']:>7}{r['total_tls']:>7}{r['total_quic']:>7}")
+    if any(r["cert_source"] == "model" for r in filas):
+        print("   * certificate size from the model (SIG_ALG not in the captures)")
+    err = params.get("error")
+    if err:
+        print(f"📏 Calibration error (in-sample): TLS MAE {err['tls']['mae']} B, "
+              f"QUIC MAE {err['quic']['mae']} B (max {err['quic']['max_abs']} B)")
+        for clave, nombre in (("leave_one_kem_out", "new KEM"), ("leave_one_sig_out", "new SIG_ALG")):
+            if clave in err:
+                e = err[clave]
+                print(f"   expected error for a {nombre}: TLS MAE {e['tls']['mae']} B, "
+                      f"QUIC MAE {e['quic']['mae']} B (max {e['quic']['max_abs']} B)")
+    print(f"⏱️ {us:.1f} µs per query")
+
+    if args.output:
+        pd.DataFrame(filas).to_csv(args.output, index=False)
+        print(f"💾 Predictions saved to {args.output}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Analytical TLS/QUIC handshake size model")
+    ap.add_argument("--csv-dir", default=CSV_DIR, help="folder with handshake_L*_merged_{TLS,QUIC}.csv")
+    ap.add_argument("--params", default=PARAMS, help="JSON with the calibrated parameters")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("calibrate", help="fit the model and report its error")
+    p = sub.add_parser("predict", help="what-if sizes for SIG_ALG x KEM")
+    p.add_argument("--sig", nargs="+", required=True, help="e.g. ed25519 mldsa65 falcon512")
+    p.add_argument("--kem", nargs="+", required=True, help="e.g. x25519 x25519_mlkem768")
+    p.add_argument("--output", help="optional CSV with the predictions")
+    args = ap.parse_args()
+
+    if args.cmd == "calibrate":
+        cmd_calibrate(args)
+    else:
+        cmd_predict(args)
+
+
+if __name__ == "__main__":
+    main()
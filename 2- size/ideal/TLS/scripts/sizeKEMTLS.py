@@ -3,6 +3,8 @@ import os
 import re
 from collections import defaultdict
 
+import pandas as pd
+
 # Ruta al directorio con los CSV de entrada
 directorio_entrada = '.'  # <-- cámbialo por la ruta real si es necesario
 # Ruta donde guardar los CSV de salida (puede ser el mismo)
@@ -41,24 +43,15 @@ for nombre_archivo in os.listdir(directorio_entrada):
         continue
 
     sig_alg, kem_alg = match.groups()
-    suma_tcp = 0
-    suma_tls = 0
 
     ruta_completa = os.path.join(directorio_entrada, nombre_archivo)
 
-    with open(ruta_completa, mode='r', newline='', encoding='utf-8') as f:
-        lector = csv.DictReader(f)
-        for fila in lector:
-            protocolo = fila["Protocol"]
-            try:
-                longitud = int(fila["Length"])
-            except ValueError:
-                continue
-
-            if protocolo == "TCP":
-                suma_tcp += longitud
-            elif protocolo == "TLSv1.3":
-                suma_tls += longitud
+    # Sólo las dos columnas necesarias; suma por protocolo vectorizada
+    tramas = pd.read_csv(ruta_completa, usecols=["Protocol", "Length"], dtype={"Protocol": "string"})
+    longitud = pd.to_numeric(tramas["Length"], errors="coerce")
+    suma_por_protocolo = longitud[longitud.notna()].astype("int64").groupby(tramas["Protocol"]).sum()
+    suma_tcp = int(suma_por_protocolo.get("TCP", 0))
+    suma_tls = int(suma_por_protocolo.get("TLSv1.3", 0))
 
     suma_total = suma_tcp + suma_tls
     agrupado_por_firma[sig_alg].append([kem_alg, suma_tcp, suma_tls, suma_total])
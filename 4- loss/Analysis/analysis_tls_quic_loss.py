@@ -21,6 +21,8 @@ KEM_TYPE = {
     3: ["P-384","x448","p384_mlkem768","x448_mlkem768","mlkem768"],
     5: ["P-521","p521_mlkem1024","mlkem1024"]
 }
+# Per-handshake round trips and HRR/Retry flags (handshake_segment.py), when the merged CSVs carry them
+RTT_COLS = ["Round_Trips", "HRR", "Retry"]
 
 
 def load_merged_csvs(ideal_dir, loss_dirs):
@@ -68,7 +70,8 @@ def reshape(df):
                 "LossPct":    r.LossPct,
                 "KEM":        r.KEM,
                 "Time_ms":    r.Time_ms,
-                "Size_bytes": r.Size_bytes
+                "Size_bytes": r.Size_bytes,
+                **{c: np.nan for c in RTT_COLS}
             })
         else:
             for kem in KEM_TYPE[r.Level]:
@@ -85,7 +88,8 @@ def reshape(df):
                     "LossPct":    r.LossPct,
                     "KEM":        kem,
                     "Time_ms":    r[tcol],
-                    "Size_bytes": size_val
+                    "Size_bytes": size_val,
+                    **{c: r.get(f"{kem}_{c}", np.nan) for c in RTT_COLS}
                 })
     return pd.DataFrame(rows)
 
@@ -125,6 +129,16 @@ def summary_by_kem(df, loss):
                 outliers.append(int(count))
             stats["Outliers"] = outliers
 
+            # 1.2) Round trips per handshake and HRR/Retry count, when captured
+            if sub.Round_Trips.notna().any():
+                rtt = sub.groupby("KEM").agg(
+                    RTTs=("Round_Trips", "mean"),
+                    Max_RTTs=("Round_Trips", "max"),
+                    HRR=("HRR", "sum"),
+                    Retry=("Retry", "sum")
+                ).reset_index()
+                stats = stats.merge(rtt, on="KEM", how="left")
+
             print("\n**Descriptive statistics (with Outlier count):**")
             print(stats.to_markdown(index=False, floatfmt=".2f"))
 
@@ -463,10 +477,12 @@ def print_loss_tables_per_level(df_long, slopes_loss_df):
       | CV_0 CV_5 CV_10 CV_20 
       | O_0% O_5% O_10% O_20% 
       | Size_0 Size_5 Size_10 Size_20 
+      | RTT_0 RTT_5 RTT_10 RTT_20   (mean round trips; only if captured)
       | Slope_ms_per_%loss
     """
     levels     = sorted(df_long.Level.unique())
     loss_levels = [0, 5, 10, 20]
+    with_rtt   = df_long.Round_Trips.notna().any()
 
     for level in levels:
         sub = df_long[(df_long.Level == level) & (df_long.LossPct.isin(loss_levels))]
@@ -480,6 +496,8 @@ def print_loss_tables_per_level(df_long, slopes_loss_df):
         hdr += [f"CV_{L}"   for L in loss_levels]
         hdr += [f"O_{L}%"   for L in loss_levels]
         hdr += [f"Size_{L}" for L in loss_levels]         # one size column per loss
+        if with_rtt:
+            hdr += [f"RTT_{L}" for L in loss_levels]      # mean round trips per handshake
         hdr += ["Slope_ms_per_%loss"]
 
         # Print header
@@ -493,7 +511,7 @@ def print_loss_tables_per_level(df_long, slopes_loss_df):
                 grp = sub[(sub.Protocol == proto) & (sub.KEM == kem)]
 
                 # collect mean times, cvs, outliers
-                means, cvs, outs, sizes = [], [], [], []
+                means, cvs, outs, sizes, rtts = [], [], [], [], []
                 for L in loss_levels:
                     g2 = grp[grp.LossPct == L]
                     times = g2.Time_ms
@@ -504,6 +522,7 @@ def print_loss_tables_per_level(df_long, slopes_loss_df):
                         cvs.append("N/A")
                         outs.append("N/A")
                         sizes.append("N/A")
+                        rtts.append("N/A")
                     else:
                         # time stats
                         mean = times.mean()
@@ -525,6 +544,10 @@ def print_loss_tables_per_level(df_long, slopes_loss_df):
                         sz = g2.Size_bytes.mean()
                         sizes.append(f"{sz:.0f}")
 
+                        # round trips (not captured in the ideal runs)
+                        rt = g2.Round_Trips.mean()
+                        rtts.append(f"{rt:.2f}" if pd.notna(rt) else "N/A")
+
                 # slope lookup
                 m = slopes_loss_df[
                     (slopes_loss_df.Protocol == proto) &
@@ -533,7 +556,7 @@ def print_loss_tables_per_level(df_long, slopes_loss_df):
                 ]['Slope_per_pct_loss']
                 slope = f"{m.iloc[0]:.2f}" if not m.empty else "N/A"
 
-                row += means + cvs + outs + sizes + [slope]
+                row += means + cvs + outs + sizes + (rtts if with_rtt else []) + [slope]
                 print("| " + " | ".join(row) + " |")
 
 
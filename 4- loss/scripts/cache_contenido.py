@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+cache_contenido.py
+Caché en disco direccionada por contenido, común a parse_cache.py (logs y CSV
+de tshark) y a 2- size/SizeDetailed/scripts/decrypt_cache.py (disecciones
+descifradas).
+
+Cada usuario compone su clave a partir de hash_fichero() de sus entradas y de
+lo que identifique el cálculo (etiqueta, campos, código). Para no releer
+ficheros grandes en cada consulta, un índice guarda (tamaño, mtime) → hash.
+Las entradas se escriben de forma atómica y se expulsan por LRU cuando la
+caché supera su tamaño máximo, y el índice se actualiza bajo cerrojo (y se
+poda de ficheros borrados al expulsar), así que varios procesos pueden
+compartirla.
+"""
+
+import os
+import fcntl
+import pickle
+import hashlib
+import tempfile
+
+BLOQUE = 1 << 20
+
+
+def escribir_atomico(ruta, datos):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, ruta)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class CacheContenido:
+    """Directorio de caché con índice de hashes y expulsión LRU."""
+
+    def __init__(self, directorio, max_bytes, variable_activa):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.variable_activa = variable_activa
+
+    def activa(self):
+        return os.environ.get(self.variable_activa, "1") != "0"
+
+    def _leer_indice(self):
+        try:
+            with open(os.path.join(self.directorio, "indice.pkl"), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+
+    def hash_fichero(self, ruta):
+        """blake2b del contenido; reutiliza el del índice si tamaño y mtime no han cambiado."""
+        ruta = os.path.abspath(ruta)
+        st = os.stat(ruta)
+        firma = (st.st_size, st.st_mtime_ns)
+
+        indice = self._leer_indice()
+        previo = indice.get(ruta)
+        if previo and previo[0] == firma:
+            return previo[1]
+
+        h = hashlib.blake2b(digest_size=20)
+        with open(ruta, "rb") as f:
+            for trozo in iter(lambda: f.read(BLOQUE), b""):
+                h.update(trozo)
+        digest = h.hexdigest()
+
+        self._actualizar_indice({ruta: (firma, digest)})
+        return digest
+
+    def _actualizar_indice(self, nuevas=None, podar=False):
+        """
+        Añade `nuevas` al índice y, con podar, quita los ficheros que ya no
+        existen. Relee y reescribe el índice bajo un cerrojo, para no pisar lo
+        que otros procesos hayan añadido mientras tanto.
+        """
+        os.makedirs(self.directorio, exist_ok=True)
+        with open(os.path.join(self.directorio, "indice.lock"), "w") as cerrojo:
+            fcntl.flock(cerrojo, fcntl.LOCK_EX)
+            indice = self._leer_indice()
+            previo = len(indice)
+            if podar:
+                indice = {r: v for r, v in indice.items() if os.path.exists(r)}
+            if not nuevas and len(indice) == previo:
+                return
+            indice.update(nuevas or {})
+            escribir_atomico(os.path.join(self.directorio, "indice.pkl"), pickle.dumps(indice))
+
+    def _dir_entradas(self):
+        dir_entradas = os.path.join(self.directorio, "entradas")
+        os.makedirs(dir_entradas, exist_ok=True)
+        return dir_entradas
+
+    def leer(self, nombre):
+        """Bytes de la entrada `nombre`, o None si no existe."""
+        entrada = os.path.join(self._dir_entradas(), nombre)
+        try:
+            with open(entrada, "rb") as f:
+                datos = f.read()
+            os.utime(entrada)  # marca de uso para el LRU
+            return datos
+        except OSError:
+            return None
+
+    def guardar(self, nombre, datos):
+        escribir_atomico(os.path.join(self._dir_entradas(), nombre), datos)
+        self._expulsar()
+
+    def _expulsar(self):
+        """
+        Borra las entradas menos usadas recientemente hasta quedar bajo max_bytes
+        y quita del índice los ficheros de entrada que ya no existen.
+        """
+        self._actualizar_indice(podar=True)
+
+        dir_entradas = self._dir_entradas()
+        entradas = []
+        for nombre in os.listdir(dir_entradas):
+            if nombre.startswith(".tmp-"):
+                continue
+            try:
+                st = os.stat(os.path.join(dir_entradas, nombre))
+            except FileNotFoundError:
+                # otro proceso la ha expulsado o reemplazado entre listdir y stat
+                continue
+            entradas.append((st.st_mtime, st.st_size, nombre))
+        total = sum(e[1] for e in entradas)
+        for _, tam, nombre in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(dir_entradas, nombre))
+            except FileNotFoundError:
+                pass
+            total -= tam
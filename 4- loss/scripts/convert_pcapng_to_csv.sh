@@ -1,12 +1,19 @@
 #!/bin/bash
 
+# Converts every .pcapng in a directory to CSV, in parallel.
+# The CSVs go next to the captures, or into <output_directory> if given.
+#   JOBS=<n>   number of tshark workers (default: number of cores)
+#   FORCE=1    reconvert even if the CSV is newer than the capture
+#              (a CSV whose header lacks the current fields is always redone)
+
 # Check if a directory was provided as an argument
 if [ $# -eq 0 ]; then
-  echo "❌ Usage: $0 <directory_with_pcapng_files>"
+  echo "❌ Usage: $0 <directory_with_pcapng_files> [output_directory]"
   exit 1
 fi
 
 DIRECTORY="$1"
+OUTPUT_DIRECTORY="${2:-$1}"
 
 # Check if the directory exists
 if [ ! -d "$DIRECTORY" ]; then
@@ -14,41 +21,97 @@ if [ ! -d "$DIRECTORY" ]; then
   exit 1
 fi
 
-# Fields to extract
-FIELDS=(
-  -e frame.number
-  -e frame.time_relative
-  -e frame.len
-  -e eth.src
-  -e eth.dst
-  -e ip.src
-  -e ip.dst
-  -e _ws.col.Protocol
-  -e _ws.col.Info
-)
-
-# Iterate over each .pcapng file in the directory
-for file in "$DIRECTORY"/*.pcapng; do
-  # Check if any .pcapng files exist
-  if [ ! -e "$file" ]; then
-    echo "⚠️  No .pcapng files found in '$DIRECTORY'"
-    exit 0
+mkdir -p "$OUTPUT_DIRECTORY"
+export OUTPUT_DIRECTORY
+
+JOBS="${JOBS:-$(nproc 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 4)}"
+
+# Milliseconds since epoch (EPOCHREALTIME needs bash 5; fallback to seconds)
+now_ms() {
+  if [[ -n "${EPOCHREALTIME:-}" ]]; then
+    local t="${EPOCHREALTIME/[.,]/}"
+    echo $(( t / 1000 ))
+  else
+    echo $(( $(date +%s) * 1000 ))
   fi
+}
 
-  # Get the base name without extension
-  base_name=$(basename "$file" .pcapng)
-  output_csv="${DIRECTORY}/${base_name}.csv"
+# Convert one capture: tshark writes to a temporary file that is renamed into
+# place only on success, so a crash or Ctrl-C never leaves a truncated CSV.
+convert_one() {
+  local file="$1"
+  local output_csv
+  output_csv="${OUTPUT_DIRECTORY}/$(basename "${file%.pcapng}").csv"
+  local tmp_csv
+  tmp_csv="$(dirname "$output_csv")/.$(basename "$output_csv").tmp.$$"
 
-  echo "📥 Converting: $file to csv "
+  # Fields to extract
+  local FIELDS=(
+    -e frame.number
+    -e frame.time_relative
+    -e frame.time_epoch
+    -e frame.len
+    -e eth.src
+    -e eth.dst
+    -e ip.src
+    -e ip.dst
+    -e _ws.col.Protocol
+    -e _ws.col.Info
+    -e tcp.srcport
+    -e tcp.dstport
+    -e udp.srcport
+    -e udp.dstport
+    -e quic.crypto.offset
+  )
 
+  # Up to date only if newer than the capture and written with the same
+  # field list (the header names the fields, case-insensitive across tshark versions)
+  local expected header
+  expected=$(printf '%s\n' "${FIELDS[@]}" | grep -v '^-e$' | paste -sd, - | tr '[:upper:]' '[:lower:]')
+  if [[ "${FORCE:-0}" != "1" && -s "$output_csv" && "$output_csv" -nt "$file" ]]; then
+    header=$(head -n 1 "$output_csv" | tr -d '"\r' | tr '[:upper:]' '[:lower:]')
+    if [[ "$header" == "$expected" ]]; then
+      echo "⏭️  Up to date: $output_csv"
+      return 0
+    fi
+  fi
+
+  local t0 t1
+  t0=$(now_ms)
   # Run tshark to convert to CSV
-  tshark -n -r "$file" \
-    -T fields \
-    "${FIELDS[@]}" \
-    -E header=y \
-    -E separator=, \
-    -E quote=d \
-    -E occurrence=f > "$output_csv"
-done
-
-echo "✅ Conversion completed in directory '$DIRECTORY'."
+  if tshark -n -r "$file" \
+      -T fields \
+      "${FIELDS[@]}" \
+      -E header=y \
+      -E separator=, \
+      -E quote=d \
+      -E occurrence=f > "$tmp_csv"; then
+    mv -f "$tmp_csv" "$output_csv"
+    t1=$(now_ms)
+    echo "📥 Converted: $file to csv ($(( t1 - t0 )) ms)"
+  else
+    rm -f "$tmp_csv"
+    echo "❌ tshark failed on $file"
+    return 1
+  fi
+}
+export -f convert_one now_ms
+
+shopt -s nullglob
+files=("$DIRECTORY"/*.pcapng)
+if [ ${#files[@]} -eq 0 ]; then
+  echo "⚠️  No .pcapng files found in '$DIRECTORY'"
+  exit 0
+fi
+
+echo "⚙️  Converting ${#files[@]} captures with $JOBS workers"
+start=$(now_ms)
+status=0
+printf '%s\0' "${files[@]}" | xargs -0 -n 1 -P "$JOBS" bash -c 'convert_one "$1"' _ || status=$?
+end=$(now_ms)
+
+if [ $status -ne 0 ]; then
+  echo "❌ Some conversions failed in directory '$DIRECTORY'."
+  exit 1
+fi
+echo "✅ Conversion completed in directory '$DIRECTORY' ($(( end - start )) ms)."
@@ -32,7 +32,6 @@ PLOT_SCRIPT="plotAllViolinScattersLog.py"
 
 
 OUTPUT_DIR="${WORKING_DIRECTORY}/output"
-TARGET_DIR="${WORKING_DIRECTORY}/csvs_${PROTOCOL}_${DELAY_TAG}"
 MERGED_DIR="${OUTPUT_DIR}/merged"
 
 # Ensure required scripts exist
@@ -43,22 +42,30 @@ for script in "${PCAP2CSV_SCRIPT}" "${PROCESS_LOG_SCRIPT}" "${HANDSHAKE_SCRIPT}"
     fi
 done
 
-mkdir -p "${TARGET_DIR}"
 mkdir -p "${CAPTURES_CSV_DIRECTORY}"
 mkdir -p "${OUTPUT_DIR}"
 mkdir -p "${MERGED_DIR}"
 
 # Step 1: Convert all .pcapng files to CSV
-echo "[*] Converting PCAPNG to CSV using ${PCAP2CSV_SCRIPT}..."
-./"${PCAP2CSV_SCRIPT}" "${PCAP_DIRECTORY}"
-cp ${PCAP_DIRECTORY}/*.csv "${CAPTURES_CSV_DIRECTORY}/" 2>/dev/null || true
-mv ${PCAP_DIRECTORY}/*.csv "${TARGET_DIR}/" 2>/dev/null || true
+# NATIVE_PCAP=1: skip tshark, handshake_process.py reads the .pcapng files directly
+if [[ "${NATIVE_PCAP:-0}" == "1" ]]; then
+  echo "[*] NATIVE_PCAP=1: reading ${PCAP_DIRECTORY} directly (no tshark CSV)"
+  HANDSHAKE_INPUT="${PCAP_DIRECTORY}"
+else
+  echo "[*] Converting PCAPNG to CSV using ${PCAP2CSV_SCRIPT}..."
+  # The CSVs stay in ${CAPTURES_CSV_DIRECTORY} between runs, so captures whose
+  # CSV is up to date (newer, same fields) are not converted again
+  ./"${PCAP2CSV_SCRIPT}" "${PCAP_DIRECTORY}" "${CAPTURES_CSV_DIRECTORY}"
+  HANDSHAKE_INPUT="${CAPTURES_CSV_DIRECTORY}"
+fi
 
 # Step 2: Process logs if provided
 LOG_FILE="${LOG_DIRECTORY}/${PROTOCOL}_${DELAY_TAG}.log"
 if [[ -f "${LOG_FILE}" ]]; then
   echo "[*] Processing log file ${LOG_FILE}..."
-  python3 "${PROCESS_LOG_SCRIPT}" "${LOG_FILE}" "${DELAY_TAG}" "${OUTPUT_DIR}"
+  # PARQUET_DIR (optional): also write the long-format columnar store (needs pyarrow)
+  python3 "${PROCESS_LOG_SCRIPT}" "${LOG_FILE}" "${DELAY_TAG}" "${OUTPUT_DIR}" --jobs \
+    ${PARQUET_DIR:+--parquet "${PARQUET_DIR}"}
 else
   echo "[!] Log file ${LOG_FILE} not found, skipping log processing."
 fi
@@ -66,15 +73,21 @@ fi
 
 # Step 3: Run handshake analysis
 echo "[*] Executing handshake script"
-python3 "${HANDSHAKE_SCRIPT}" ${TARGET_DIR}  ${OUTPUT_DIR} ${PROTOCOL}
+python3 "${HANDSHAKE_SCRIPT}" "${HANDSHAKE_INPUT}"  ${OUTPUT_DIR} ${PROTOCOL}
 
 # Step 4: Merge metrics per signature algorithm
+# JOIN=time: pair executions and handshakes by timestamp (needs OUTPUT_FORMAT=jsonl
+# logs and frame.time_epoch in the captures) instead of by Handshake_ID order
 echo "[*] Merging handshake metrics for each KEM algorithm"
 for sig in ed25519 secp384r1 secp521r1; do
     BASE="${OUTPUT_DIR}/${sig}_${PROTOCOL}_handshakes.csv"
     LOG_CSV="${OUTPUT_DIR}/${sig}_${PROTOCOL}_${DELAY_TAG}.csv"
     MERGED="${MERGED_DIR}/${sig}_${PROTOCOL}_${DELAY_TAG}_merged.csv"
-    if [[ -f "${BASE}" && -f "${LOG_CSV}" ]]; then
+    if [[ "${JOIN:-id}" == "time" && -f "${BASE}" && -f "${LOG_FILE}" ]]; then
+        echo "    Merging ${BASE} + ${LOG_FILE} by timestamp → ${MERGED}"
+        python3 "${MERGE_SCRIPT}" "${BASE}" "${LOG_FILE}" "${MERGED}" --join time \
+            --sig "${sig}" --protocol "${PROTOCOL}"
+    elif [[ -f "${BASE}" && -f "${LOG_CSV}" ]]; then
         echo "    Merging ${BASE} + ${LOG_CSV} → ${MERGED}"
         python3 "${MERGE_SCRIPT}" "${BASE}" "${LOG_CSV}" "${MERGED}"
     else
@@ -86,8 +99,6 @@ done
 python3 "${PLOT_SCRIPT}" "${OUTPUT_DIR}"
 echo "[+] All plots completed. Plots are in ${OUTPUT_DIR}/"
 
-# Step 5: Finalize outputs
-rm -r "${TARGET_DIR}"
 echo "[+] All steps completed. "
 
 
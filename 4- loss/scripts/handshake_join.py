@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+handshake_join.py
+Unión por marca de tiempo de las ejecuciones del log con los handshakes de
+la captura, en lugar de emparejarlas por número de orden (Handshake_ID).
+
+Con el orden basta un handshake incompleto (Bytes_Total = -1) o una
+ejecución NaN para desplazar todas las parejas siguientes. Aquí cada
+handshake capturado se asigna a la ejecución cuyo intervalo
+[ts_start, ts_end] (registros JSON del cliente, OUTPUT_FORMAT=jsonl)
+contiene su primer Client Hello / Initial (Start_epoch de handshake_process.py).
+
+Las dos tablas se ordenan por tiempo y se cruzan con merge_asof por KEM
+(búsqueda binaria sobre los inicios de ejecución): O(n log n).
+"""
+
+import numpy as np
+import pandas as pd
+
+TOLERANCIA_MS = 50.0   # desfase admitido entre el reloj de la captura y el del cliente
+
+
+def ejecuciones_desde_log(df_log):
+    """Registros de handshake_store.cargar_jsonl → KEM_ALG, Execution, Time_ms, Ini_s, Fin_s."""
+    if df_log.empty:
+        return pd.DataFrame(columns=["KEM_ALG", "Execution", "Time_ms", "Ini_s", "Fin_s"])
+    return pd.DataFrame({
+        "KEM_ALG": df_log["KEM"].astype(str),
+        "Execution": df_log["Execution"].astype(int),
+        # Time_ms llega como float32: vía texto para no arrastrar 8.65999984 en lugar de 8.66
+        "Time_ms": df_log["Time_ms"].astype(str).astype("float64"),
+        "Ini_s": df_log["ts_start_ns"].astype("float64") / 1e9,
+        "Fin_s": df_log["ts_end_ns"].astype("float64") / 1e9,
+    })
+
+
+def unir_por_tiempo(handshakes, ejecuciones, tolerancia_ms=TOLERANCIA_MS):
+    """
+    handshakes : KEM_ALG, Handshake_ID, Bytes_Total, [Wire_ms], Start_epoch
+    ejecuciones: KEM_ALG, Execution, Time_ms, Ini_s, Fin_s
+
+    Devuelve (unidos, handshakes_sin_ejecucion, ejecuciones_sin_handshake).
+    `unidos` tiene una fila por ejecución emparejada con las columnas de ambas
+    tablas. Si varios handshakes caen en la misma ejecución (reconexión del
+    cliente) se queda el primero y el resto se informa como no emparejado.
+    """
+    tol = tolerancia_ms / 1000.0
+
+    hs = handshakes.copy()
+    hs["KEM_ALG"] = hs["KEM_ALG"].astype(str)
+    sin_marca = hs["Start_epoch"].isna()
+    hs = hs[~sin_marca]
+
+    ex = ejecuciones.dropna(subset=["Ini_s", "Fin_s"]).copy()
+    ex["KEM_ALG"] = ex["KEM_ALG"].astype(str)
+
+    # Última ejecución que empezó antes del handshake (más la tolerancia)
+    hs["Clave_s"] = hs["Start_epoch"].astype("float64") + tol
+    candidatos = pd.merge_asof(
+        hs.sort_values("Clave_s"), ex.sort_values("Ini_s"),
+        left_on="Clave_s", right_on="Ini_s", by="KEM_ALG", direction="backward",
+    )
+    # ... y que además no había terminado
+    dentro = candidatos["Execution"].notna() & (candidatos["Start_epoch"] <= candidatos["Fin_s"] + tol)
+    candidatos = candidatos[dentro].sort_values("Start_epoch")
+    primero = ~candidatos.duplicated(["KEM_ALG", "Execution"])
+    unidos = candidatos[primero].drop(columns="Clave_s")
+    unidos["Execution"] = unidos["Execution"].astype(int)
+
+    emparejados = pd.MultiIndex.from_frame(unidos[["KEM_ALG", "Handshake_ID"]])
+    clave_hs = pd.MultiIndex.from_frame(handshakes[["KEM_ALG", "Handshake_ID"]].astype({"KEM_ALG": str}))
+    hs_sueltos = handshakes[~clave_hs.isin(emparejados)]
+
+    usadas = pd.MultiIndex.from_frame(unidos[["KEM_ALG", "Execution"]])
+    clave_ex = pd.MultiIndex.from_frame(ejecuciones[["KEM_ALG", "Execution"]].astype({"KEM_ALG": str}))
+    ex_sueltas = ejecuciones[~clave_ex.isin(usadas)]
+
+    return unidos.sort_values(["KEM_ALG", "Execution"]).reset_index(drop=True), hs_sueltos, ex_sueltas
+
+
+def informe_no_emparejados(hs_sueltos, ex_sueltas):
+    """Tabla única con lo que no se pudo emparejar, para guardarla junto al merged."""
+    lado_hs = pd.DataFrame({
+        "Side": "capture",
+        "KEM_ALG": hs_sueltos["KEM_ALG"].values,
+        "Handshake_ID": hs_sueltos["Handshake_ID"].values,
+        "Execution": np.nan,
+        "Bytes_Total": hs_sueltos["Bytes_Total"].values,
+        "Time_ms": np.nan,
+        "Start_epoch": hs_sueltos["Start_epoch"].values,
+    })
+    lado_ex = pd.DataFrame({
+        "Side": "log",
+        "KEM_ALG": ex_sueltas["KEM_ALG"].values,
+        "Handshake_ID": np.nan,
+        "Execution": ex_sueltas["Execution"].values,
+        "Bytes_Total": np.nan,
+        "Time_ms": ex_sueltas["Time_ms"].values,
+        "Start_epoch": ex_sueltas["Ini_s"].values,
+    })
+    partes = [p for p in (lado_hs, lado_ex) if not p.empty]
+    informe = pd.concat(partes, ignore_index=True) if partes else lado_hs
+    return informe.astype({"Handshake_ID": "Int64", "Execution": "Int64", "Bytes_Total": "Int64"})
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+handshake_live.py
+Segmentación de handshakes en vivo: lee la captura por la entrada estándar
+mientras se está haciendo y escribe cada handshake en cuanto se cierra, sin
+pcapng intermedio en disco ni pasada posterior por tshark.
+
+  dumpcap -i eth0 -q -w - | handshake_live.py quic <SIG> <KEM> -o <salida.csv>
+  tshark -l -n -i eth0 -T fields -E header=y -E separator=, -E quote=d \\
+      -e frame.number ... | handshake_live.py tls <SIG> <KEM> --entrada tshark
+
+Entradas:
+  pcap   : flujo pcapng / pcap clásico (dumpcap, tcpdump -w -), decodificado
+           con el lector nativo pcapng_reader (por defecto).
+  tshark : CSV de tshark -l -T fields con los campos de convert_pcapng_to_csv.sh.
+
+La salida tiene el formato de handshake_process.py (handshake_segment.CABECERA).
+Se añaden filas a un CSV existente, así que un mismo
+<sig>_<proto>_handshakes.csv recoge las corridas de todos los KEM.
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+
+import handshake_segment
+import pcapng_reader
+
+
+def lector_entrada(entrada: str):
+    """Filas con las columnas del CSV de tshark a partir de la entrada estándar."""
+    if entrada == "tshark":
+        return csv.DictReader(io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline=''))
+    return pcapng_reader.filas_flujo(sys.stdin.buffer)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Segmenta handshakes TLS/QUIC de una captura en curso (stdin).")
+    ap.add_argument("protocolo", choices=["quic", "tls"])
+    ap.add_argument("sig_alg")
+    ap.add_argument("kem_alg")
+    ap.add_argument("--entrada", choices=["pcap", "tshark"], default="pcap",
+                    help="formato de stdin: pcapng/pcap (dumpcap -w -) o CSV de tshark -l -T fields")
+    ap.add_argument("-o", "--salida", default=None,
+                    help="CSV de salida (por defecto <sig>_<protocolo>_handshakes.csv)")
+    args = ap.parse_args()
+
+    salida = args.salida or f"{args.sig_alg}_{args.protocolo}_handshakes.csv"
+    nuevo = not os.path.exists(salida) or os.path.getsize(salida) == 0
+    if os.path.dirname(salida):
+        os.makedirs(os.path.dirname(salida), exist_ok=True)
+
+    completos = incompletos = 0
+    with open(salida, 'a', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        if nuevo:
+            w.writerow(handshake_segment.CABECERA)
+            f.flush()
+        try:
+            handshakes = handshake_segment.HANDSHAKES[args.protocolo](lector_entrada(args.entrada))
+            for handshake in handshakes:
+                w.writerow([args.kem_alg, *handshake])
+                f.flush()   # visible para quien siga el fichero mientras dura la captura
+                if handshake[1] == -1:
+                    incompletos += 1
+                else:
+                    completos += 1
+        except KeyboardInterrupt:
+            pass   # corte manual: lo ya escrito queda en el CSV
+
+    print(f"📊 {args.sig_alg} / {args.kem_alg} → {completos} completos, {incompletos} incompletos")
+    print(f"✅ Handshakes añadidos a: {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,22 @@ import re
 import sys
 from collections import defaultdict
 
+import parse_cache
+import pcapng_reader
+import handshake_segment
+
+# Motor de segmentación: "vector" (NumPy/pandas, por defecto) o "python" (fila a fila)
+MOTOR = os.environ.get("HANDSHAKE_ENGINE", "vector").lower()
+if MOTOR == "vector":
+    try:
+        import handshake_vector
+    except ImportError:
+        print("⚠️ pandas/numpy no disponibles: se usa el motor fila a fila")
+        MOTOR = "python"
+
+# Versión del formato de las filas guardadas en la caché: subirla al cambiar las columnas
+ESQUEMA_CACHE = 2
+
 # --- Argumentos ---------------------------------------------------------------------
 if len(sys.argv) != 4:
     print(f"Uso: {sys.argv[0]} <directorio_entrada> <directorio_salida> <protocolo>")
@@ -26,25 +42,8 @@ if not os.path.isdir(directorio_entrada):
 os.makedirs(directorio_salida, exist_ok=True)
 
 # --- RegExp para nombres de archivo --------------------------------------------------
-patron_nombre = re.compile(r"SIG_ALG=(.+?) and KEM_ALG=(.+?)\.csv")
-
-# --- Detección para QUIC -------------------------------------------------------------
-def es_initial_quic(info: str) -> bool:
-    return 'Initial' in info
-
-def es_end_quic(info: str) -> bool:
-    return 'Protected Payload' in info and 'DCID=' not in info
-
-# --- Detección para TLS --------------------------------------------------------------
-def es_client_hello(info: str) -> bool:
-    return 'Client Hello' in info
-
-def es_server_finished(info: str) -> bool:
-    return (
-        'Encrypted Handshake Message' in info
-        or 'Finished' in info
-        or 'Change Cipher Spec' in info
-    )
+# CSV de tshark (convert_pcapng_to_csv.sh) o la captura directamente (lector nativo)
+patron_nombre = re.compile(r"SIG_ALG=(.+?) and KEM_ALG=(.+?)\.(csv|pcapng|pcap)$")
 
 # --- Orden de KEM ---------------------------------------------------------------------
 def orden_kem(kem: str):
@@ -60,12 +59,41 @@ def orden_kem(kem: str):
     else:
         return (4, kem)
 
+# --- Segmentación ---------------------------------------------------------------------
+def segmentar(lector, kem_alg: str):
+    """Motor fila a fila (handshake_segment.py) sobre dicts con las columnas del CSV de tshark."""
+    return handshake_segment.segmentar(lector, kem_alg, protocolo_objetivo)
+
+
+def segmentar_csv(ruta_csv: str, kem_alg: str):
+    if MOTOR == "vector":
+        return handshake_vector.segmentar(handshake_vector.cargar_csv(ruta_csv), kem_alg, protocolo_objetivo)
+    with open(ruta_csv, newline='', encoding='utf-8') as f:
+        return segmentar(csv.DictReader(f), kem_alg)
+
+
+def segmentar_pcap(ruta_pcap: str, kem_alg: str):
+    # Sin tshark ni CSV intermedio: el lector nativo genera las mismas columnas
+    filas = pcapng_reader.filas_tshark(ruta_pcap)
+    if MOTOR == "vector":
+        return handshake_vector.segmentar(handshake_vector.desde_filas(filas), kem_alg, protocolo_objetivo)
+    return segmentar(filas, kem_alg)
+
+
+SEGMENTADORES = {"csv": segmentar_csv, "pcapng": segmentar_pcap, "pcap": segmentar_pcap}
+
 # --- Estructura de datos --------------------------------------------------------------
 agrupado_por_firma = defaultdict(list)
 
 # --- Procesamiento --------------------------------------------------------------------
-for nombre_csv in os.listdir(directorio_entrada):
-    if not nombre_csv.endswith('.csv'):
+nombres = sorted(os.listdir(directorio_entrada))
+capturas = {os.path.splitext(n)[0] for n in nombres if n.endswith(('.pcapng', '.pcap'))}
+
+for nombre_csv in nombres:
+    if not nombre_csv.endswith(('.csv', '.pcapng', '.pcap')):
+        continue
+    # Si está la captura, se lee directamente y se ignora su CSV
+    if nombre_csv.endswith('.csv') and os.path.splitext(nombre_csv)[0] in capturas:
         continue
 
     m = patron_nombre.match(nombre_csv)
@@ -73,88 +101,19 @@ for nombre_csv in os.listdir(directorio_entrada):
         print(f"⚠️ Nombre no coincide con patrón esperado: {nombre_csv}")
         continue
 
-    sig_alg, kem_alg = m.groups()
+    sig_alg, kem_alg, extension = m.groups()
     ruta_csv = os.path.join(directorio_entrada, nombre_csv)
+    segmentador = SEGMENTADORES[extension]
 
-    with open(ruta_csv, newline='', encoding='utf-8') as f:
-        lector = csv.DictReader(f)
-
-        dentro = False
-        handshake_id = 0
-        bytes_total = 0
-        completos = 0
-        incompletos = 0
-
-        # --- Inicialización para QUIC (por archivo) ---
-        VENTANA_REINTENTOS = 2.0  # segundos
-        ultimo_initial_ts = None
-        dcids_vistos = set()
-        pat_dcid = re.compile(r"DCID=([a-fA-F0-9]+)")
-
-        for fila in lector:
-            info  = fila.get('_ws.col.Info', '') or fila.get('_ws.col.info', '')
-            proto = fila.get('_ws.col.Protocol', '') or fila.get('_ws.col.protocol', '')
-            try:
-                length = int(fila.get('frame.len', 0))
-            except ValueError:
-                continue
-
-            if protocolo_objetivo == "quic":
-                try:
-                    ts_actual = float(fila.get("frame.time_relative", 0))
-                except ValueError:
-                    ts_actual = 0
-
-                if proto.lower() == 'quic' and es_initial_quic(info):
-                    match = pat_dcid.search(info)
-                    dcid = match.group(1) if match else None
-
-                    if dcid is None:
-                        continue
-                    if dcid in dcids_vistos:
-                        continue
-                    if ultimo_initial_ts is not None and ts_actual - ultimo_initial_ts < VENTANA_REINTENTOS:
-                        continue
-
-                    dcids_vistos.add(dcid)
-
-                    if dentro:
-                        agrupado_por_firma[sig_alg].append([kem_alg, handshake_id, -1])
-                        incompletos += 1
-
-                    dentro = True
-                    handshake_id += 1
-                    bytes_total = length
-                    ultimo_initial_ts = ts_actual
-                    continue
-
-                if dentro and proto.lower() == 'quic':
-                    bytes_total += length
-                    if es_end_quic(info):
-                        agrupado_por_firma[sig_alg].append([kem_alg, handshake_id, bytes_total])
-                        completos += 1
-                        dentro = False
-                        ultimo_initial_ts = None
-
-            elif protocolo_objetivo == "tls":
-                if not dentro and proto.lower().startswith('tlsv1.') and es_client_hello(info):
-                    dentro = True
-                    handshake_id += 1
-                    bytes_total = length
-                    continue
-
-                if dentro and proto.lower().startswith('tlsv1.'):
-                    bytes_total += length
-                    if es_server_finished(info):
-                        agrupado_por_firma[sig_alg].append([kem_alg, handshake_id, bytes_total])
-                        completos += 1
-                        dentro = False
-
-        if dentro:
-            agrupado_por_firma[sig_alg].append([kem_alg, handshake_id, -1])
-            incompletos += 1
-
-        print(f"📊 {nombre_csv} → {completos} completos, {incompletos} incompletos")
+    # Caché por contenido: un fichero que no ha cambiado no se vuelve a segmentar
+    filas, completos, incompletos = parse_cache.cargar_o_calcular(
+        ruta_csv, lambda: segmentador(ruta_csv, kem_alg),
+        f"handshake_process:v{ESQUEMA_CACHE}:{MOTOR}:{protocolo_objetivo}:{kem_alg}",
+        dependencias=(__file__, pcapng_reader.__file__, handshake_segment.__file__,
+                      os.path.join(os.path.dirname(__file__), "handshake_vector.py")))
+    agrupado_por_firma[sig_alg].extend(filas)
+
+    print(f"📊 {nombre_csv} → {completos} completos, {incompletos} incompletos")
 
 # --- Escritura de archivos de salida --------------------------------------------------
 for sig_alg, filas in agrupado_por_firma.items():
@@ -162,6 +121,6 @@ for sig_alg, filas in agrupado_por_firma.items():
     salida = os.path.join(directorio_salida, f"{sig_alg}_{protocolo_objetivo}_handshakes.csv")
     with open(salida, 'w', newline='', encoding='utf-8') as f:
         w = csv.writer(f)
-        w.writerow(['KEM_ALG', 'Handshake_ID', 'Bytes_Total'])
+        w.writerow(handshake_segment.CABECERA)
         w.writerows(filas_ordenadas)
     print(f"✅ Archivo generado: {salida}")
\ No newline at end of file
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+handshake_segment.py
+Segmentadores fila a fila de handshakes TLS/QUIC sobre tramas con las
+columnas del CSV de tshark (convert_pcapng_to_csv.sh): csv.DictReader, el
+lector nativo pcapng_reader.filas_tshark o un flujo en vivo (handshake_live.py).
+
+Los segmentadores son generadores en línea: cada handshake sale en cuanto se
+cierra, con estado proporcional a las conexiones abiertas, así que sirven
+igual para un fichero que para una captura que todavía está en curso.
+
+Bytes retransmitidos de cada handshake (Retrans_Bytes / Retrans_Pkts):
+  - TLS: tramas de la conexión con la marca de tshark [TCP Retransmission],
+    [TCP Spurious Retransmission] o [TCP Fast Retransmission] entre el Client
+    Hello y el fin. tshark muestra casi todas como protocolo TCP (no entran en
+    Bytes_Total), así que se suman aparte.
+  - QUIC: paquetes que reenvían un offset CRYPTO ya enviado por el mismo
+    extremo en el mismo espacio (Initial/Handshake), según quic.crypto.offset.
+    Sin esa columna (CSV antiguos, lector nativo) no se puede distinguir y
+    las columnas quedan vacías.
+Goodput_Ratio = bytes de primera transmisión / bytes en el cable.
+
+Vuelos y viajes de ida y vuelta de cada handshake (Flights / Round_Trips):
+  - Flights: rachas de paquetes consecutivos del mismo extremo entre el
+    inicio y el último vuelo del handshake del servidor (el que lleva su
+    Finished), con la misma regla en TLS y QUIC. En TLS cuentan todos los
+    segmentos con datos, también los que tshark muestra como TCP
+    (retransmisiones, fuera de orden) o Continuation Data. En QUIC sólo los
+    paquetes con datos del handshake (es_vuelo_quic): los ACK del cliente no
+    parten el vuelo del servidor, y el Finished del cliente y el 1-RTT del
+    servidor (HANDSHAKE_DONE) quedan fuera, como en TLS.
+  - Round_Trips: vuelos del cliente, (Flights + 1) // 2; cada vuelo del
+    cliente después del primero espera la respuesta del servidor. Sin
+    pérdidas vale 1 en ambos protocolos; un HelloRetryRequest, un Retry o un
+    Client Hello / Initial reenviado tras el vuelo del servidor añaden uno.
+    No incluye el SYN / SYN-ACK de TCP (RTT_CONEXION).
+  - HRR: HelloRetryRequest del servidor (o, en TLS, un segundo Client Hello
+    no retransmitido en la misma conexión).
+  - Retry / Version_Neg: paquete Retry o Version Negotiation de QUIC en la
+    conexión; vacías en TLS.
+handshake_process.py los usa como motor "python"; handshake_vector.py
+reproduce la misma semántica con pandas.
+"""
+
+import re
+
+# --- Detección para QUIC -------------------------------------------------------------
+pat_dcid = re.compile(r"DCID=([a-fA-F0-9]+)")
+pat_scid = re.compile(r"SCID=([a-fA-F0-9]+)")
+
+def es_initial_quic(info: str) -> bool:
+    return info.startswith('Initial')
+
+def es_1rtt_quic(info: str) -> bool:
+    return info.startswith('Protected Payload')
+
+def es_handshake_done(info: str) -> bool:
+    # Sólo visible en capturas descifradas (frames listados en la Info)
+    return 'HANDSHAKE_DONE' in info
+
+def es_retry_quic(info: str) -> bool:
+    return info.startswith('Retry')
+
+def es_version_negotiation(info: str) -> bool:
+    return info.startswith('Version Negotiation')
+
+def es_vuelo_quic(info: str, del_servidor: bool) -> bool:
+    """
+    Paquete que cuenta para los vuelos: Retry y Version Negotiation, los
+    Initial con CRYPTO (tshark descifra el espacio Initial y lista sus frames
+    tras "PKN:"; sin esa lista, como en el lector nativo, cuenta cualquier
+    Initial) y los Handshake del servidor. Los Handshake del cliente (ACK o su
+    Finished) y los 1-RTT no cuentan.
+    """
+    if es_retry_quic(info) or es_version_negotiation(info):
+        return True
+    if es_initial_quic(info):
+        return 'CRYPTO' in info or 'PKN:' not in info
+    return del_servidor and info.startswith('Handshake')
+
+# --- Detección para TLS --------------------------------------------------------------
+def es_client_hello(info: str) -> bool:
+    return 'Client Hello' in info
+
+def es_inicio_tls(info: str) -> bool:
+    # Client Hello que no es retransmisión (en la misma trama puede ir un CCS)
+    return es_client_hello(info) and 'Retransmission' not in info
+
+def es_hello_retry_request(info: str) -> bool:
+    return 'Hello Retry Request' in info
+
+def es_server_finished(info: str) -> bool:
+    # El HelloRetryRequest puede ir con un CCS y no cierra el handshake
+    return not es_hello_retry_request(info) and (
+        'Encrypted Handshake Message' in info
+        or 'Finished' in info
+        or 'Change Cipher Spec' in info
+    )
+
+# --- Latencia en el cable -------------------------------------------------------------
+def instante(fila) -> float:
+    """frame.time_relative en segundos (0 si falta)."""
+    try:
+        return float(fila.get('frame.time_relative') or 0)
+    except ValueError:
+        return 0.0
+
+def instante_epoch(fila):
+    """frame.time_epoch en segundos (resolución de µs), o None si el CSV no lo trae."""
+    try:
+        epoch = float(fila.get('frame.time_epoch') or 0)
+    except ValueError:
+        return None
+    return round(epoch, 6) if epoch else None
+
+def wire_ms(t_inicio: float, t_fin: float) -> float:
+    """Latencia del handshake en el cable, en ms (resolución de µs)."""
+    return round((t_fin - t_inicio) * 1000, 3)
+
+# --- Retransmisiones ------------------------------------------------------------------
+def es_retransmision_tcp(info: str) -> bool:
+    # [TCP Retransmission], [TCP Spurious Retransmission], [TCP Fast Retransmission]
+    return 'Retransmission]' in info
+
+pat_len = re.compile(r"\bLen=[1-9]")
+
+def es_datos_tcp(info: str, proto: str) -> bool:
+    # Segmento con datos que tshark no muestra como TLS: Continuation Data (SSL),
+    # [TCP Out-Of-Order], [TCP Previous segment not captured] con Len > 0...
+    return proto.lower() == 'ssl' or pat_len.search(info) is not None
+
+def goodput(bytes_cable: int, bytes_retrans: int) -> float:
+    """Fracción de los bytes en el cable que son primera transmisión (4 decimales)."""
+    return round((bytes_cable - bytes_retrans) / bytes_cable, 4) if bytes_cable else None
+
+# --- Vuelos ---------------------------------------------------------------------------
+# Viajes de ida y vuelta previos al Client Hello / Initial que Round_Trips no
+# cuenta: el SYN / SYN-ACK de TCP
+RTT_CONEXION = {"tls": 1, "quic": 0}
+
+def viajes(vuelos: int) -> int:
+    """
+    Viajes de ida y vuelta del handshake: vuelos del cliente, que lo abre.
+    Sin el SYN de TCP; el total desde el connect() es viajes + RTT_CONEXION.
+    """
+    return (vuelos + 1) // 2
+
+# --- Tabla de flujos TLS --------------------------------------------------------------
+def clave_conexion(fila):
+    """
+    Conexión TCP de la trama, igual en ambos sentidos: el par de extremos
+    (ip, puerto) ordenado. Los CSV antiguos no traen puertos: entonces la clave
+    es el par de IPs y todas las conexiones entre los dos hosts comparten flujo
+    (el comportamiento secuencial de siempre).
+    """
+    a = (fila.get('ip.src', ''), fila.get('tcp.srcport', ''))
+    b = (fila.get('ip.dst', ''), fila.get('tcp.dstport', ''))
+    return (a, b) if a <= b else (b, a)
+
+
+class FlujoTLS:
+    __slots__ = ("handshake_id", "bytes_total", "t_inicio", "epoch", "retrans_bytes", "retrans_pkts",
+                 "fuera", "cliente", "emisor", "vuelos", "hrr", "servidor")
+
+    def __init__(self, handshake_id, length, t_inicio, epoch, cliente):
+        self.handshake_id = handshake_id
+        self.bytes_total = length
+        self.t_inicio = t_inicio
+        self.epoch = epoch
+        self.retrans_bytes = 0
+        self.retrans_pkts = 0
+        self.fuera = 0             # bytes de segmentos que tshark no muestra como TLS
+        self.cliente = cliente     # extremo (ip, puerto) que envió el Client Hello
+        self.emisor = cliente      # emisor de la trama anterior
+        self.vuelos = 1
+        self.hrr = 0
+        self.servidor = None       # métricas en la última trama del servidor
+
+    def metricas(self, t_fin):
+        return (self.bytes_total, t_fin, self.retrans_bytes, self.retrans_pkts, self.fuera, self.vuelos)
+
+
+def handshakes_tls(lector):
+    """
+    Segmentación TLS con una tabla de flujos por conexión (5-tupla): cada
+    conexión lleva su propio handshake (inicio, fin, bytes), de modo que
+    conexiones solapadas de clientes concurrentes no se mezclan y las
+    retransmisiones se suman al handshake de su conexión.
+
+    Un Client Hello abre handshake si la conexión no tiene uno abierto (un
+    segundo Client Hello, p.ej. tras HelloRetryRequest o retransmitido, suma
+    bytes al abierto y, si no es retransmisión, marca HRR); las
+    retransmisiones nunca abren handshake.
+
+    El fin (Change Cipher Spec / Finished / Encrypted Handshake Message) sólo
+    cuenta si lo envía el servidor, el extremo que no mandó el Client Hello.
+    Si tshark no lo etiqueta en el vuelo del servidor (TCP Out-Of-Order,
+    Continuation Data...), el fin del cliente cierra el handshake en la última
+    trama con datos del servidor posterior al último Client Hello: bytes,
+    vuelos y latencia se toman en esa trama, no en la del cliente.
+    La latencia en el cable va del Client Hello a ese fin del servidor; el
+    instante absoluto del Client Hello permite unir el handshake con su
+    ejecución en el log (merge_handshake_metrics.py --join time).
+
+    Las retransmisiones TCP de la conexión mientras el handshake está abierto
+    se cuentan aparte (las que tshark muestra como TCP no suman a bytes_total,
+    como tampoco los segmentos fuera de orden o Continuation Data, que sí
+    cuentan como bytes en el cable para el goodput).
+
+    Los vuelos se cuentan sobre todas las tramas con datos de la conexión
+    (TLS, retransmisiones, fuera de orden, Continuation Data), por cambio de
+    extremo (ip, puerto) emisor, hasta el último vuelo del servidor: un vuelo
+    del servidor que sólo se ve retransmitido o partido por segmentos fuera
+    de orden sigue contando una vez.
+
+    Generador en línea: produce (handshake_id, bytes_total, wire_ms, epoch,
+    retrans_bytes, retrans_pkts, goodput, flights, round_trips, hrr, retry,
+    version_neg) en cuanto se cierra cada handshake y, al agotarse `lector`,
+    los que quedaron abiertos con bytes_total = -1 y el resto de métricas a None.
+    """
+    abiertos = {}   # clave de conexión → FlujoTLS
+    handshake_id = 0
+
+    for fila in lector:
+        info  = fila.get('_ws.col.Info', '') or fila.get('_ws.col.info', '')
+        proto = fila.get('_ws.col.Protocol', '') or fila.get('_ws.col.protocol', '')
+        es_tls = proto.lower().startswith('tlsv1.')
+        retrans = es_retransmision_tcp(info)
+        if not es_tls and not retrans and not es_datos_tcp(info, proto):
+            continue
+        try:
+            length = int(fila.get('frame.len', 0))
+        except ValueError:
+            continue
+
+        clave = clave_conexion(fila)
+        flujo = abiertos.get(clave)
+        emisor = (fila.get('ip.src', ''), fila.get('tcp.srcport', ''))
+
+        if flujo is None:
+            if es_tls and es_inicio_tls(info):
+                handshake_id += 1
+                abiertos[clave] = FlujoTLS(handshake_id, length, instante(fila), instante_epoch(fila), emisor)
+            continue
+
+        if emisor != flujo.emisor:
+            flujo.emisor = emisor
+            flujo.vuelos += 1
+        if retrans:
+            flujo.retrans_bytes += length
+            flujo.retrans_pkts += 1
+        del_servidor = emisor != flujo.cliente
+        if not es_tls:
+            flujo.fuera += length   # segmento (retransmitido o no) que tshark no muestra como TLS
+            if del_servidor:
+                flujo.servidor = flujo.metricas(instante(fila))
+            continue
+
+        flujo.bytes_total += length
+        inicio = es_inicio_tls(info)
+        if inicio or es_hello_retry_request(info):
+            flujo.hrr = 1
+        if inicio:
+            flujo.servidor = None
+        fin = es_server_finished(info) and not inicio
+        if del_servidor:
+            flujo.servidor = flujo.metricas(instante(fila))
+        if fin and flujo.servidor is not None:
+            bytes_total, t_fin, retrans_bytes, retrans_pkts, fuera, vuelos = flujo.servidor
+            yield (flujo.handshake_id, bytes_total, wire_ms(flujo.t_inicio, t_fin), flujo.epoch,
+                   retrans_bytes, retrans_pkts, goodput(bytes_total + fuera, retrans_bytes),
+                   vuelos, viajes(vuelos), flujo.hrr, None, None)
+            del abiertos[clave]
+
+    for flujo in abiertos.values():
+        yield (flujo.handshake_id, -1, None, flujo.epoch) + (None,) * 8
+
+
+# --- Segmentación QUIC por Connection ID ---------------------------------------------
+class ConexionQUIC:
+    __slots__ = ("handshake_id", "bytes_total", "cliente", "cerrada", "t_inicio", "epoch",
+                 "retrans_bytes", "retrans_pkts", "offsets",
+                 "del_servidor", "vuelos", "hrr", "retry", "version_neg")
+
+    def __init__(self, handshake_id, cliente, t_inicio, epoch):
+        self.handshake_id = handshake_id
+        self.bytes_total = 0
+        self.cliente = cliente
+        self.cerrada = False
+        self.t_inicio = t_inicio
+        self.epoch = epoch
+        self.retrans_bytes = 0
+        self.retrans_pkts = 0
+        self.offsets = set()   # (extremo, espacio, offset CRYPTO) ya enviados
+        self.del_servidor = None   # sentido del último paquete que cuenta para los vuelos
+        self.vuelos = 0
+        self.hrr = self.retry = self.version_neg = 0
+
+
+def handshakes_quic(lector):
+    """
+    Segmentación QUIC indexada por Connection ID, en una pasada (coste lineal):
+
+      - Un Initial del cliente con un DCID nuevo abre conexión; ese DCID
+        original identifica los Initial retransmitidos.
+      - Los CID por los que se dirige cada extremo se indexan en cuanto
+        aparecen como SCID (el cambio SCID/DCID tras el primer Initial del
+        servidor, o tras un Retry), así que los paquetes de conexiones
+        concurrentes se atribuyen a la suya.
+      - Los paquetes hacia un CID de longitud cero (MsQUIC cliente) no llevan
+        DCID: se atribuyen por la dirección (ip, puerto) del cliente.
+      - El handshake termina con HANDSHAKE_DONE (capturas descifradas) o con
+        el primer paquete 1-RTT del servidor, que es el que lo transporta.
+      - La latencia en el cable va del primer Initial del cliente a ese fin.
+      - Un paquete cuyo offset CRYPTO ya envió el mismo extremo en el mismo
+        espacio es un reenvío de recuperación de pérdidas.
+      - Los vuelos se cuentan por cambio de sentido cliente/servidor entre
+        los paquetes con datos del handshake (es_vuelo_quic): los ACK del
+        cliente intercalados en el vuelo del servidor no lo parten y el
+        recuento acaba en el último vuelo del servidor, como en TLS.
+
+    Generador en línea, como handshakes_tls.
+    """
+    por_cid = {}       # CID por el que se dirige un extremo → conexión
+    por_odcid = {}     # DCID original del primer Initial del cliente → conexión
+    por_cliente = {}   # (ip, puerto) del cliente → última conexión abierta
+    conexiones = []
+    con_offsets = False   # el CSV trae quic.crypto.offset
+
+    for fila in lector:
+        con_offsets = con_offsets or 'quic.crypto.offset' in fila
+        info  = fila.get('_ws.col.Info', '') or fila.get('_ws.col.info', '')
+        proto = fila.get('_ws.col.Protocol', '') or fila.get('_ws.col.protocol', '')
+        if proto.lower() != 'quic':
+            continue
+        try:
+            length = int(fila.get('frame.len', 0))
+        except ValueError:
+            continue
+
+        origen = (fila.get('ip.src', ''), fila.get('udp.srcport', ''))
+        destino = (fila.get('ip.dst', ''), fila.get('udp.dstport', ''))
+        m = pat_dcid.search(info)
+        dcid = m.group(1) if m else None
+        m = pat_scid.search(info)
+        scid = m.group(1) if m else None
+
+        if dcid is not None and dcid in por_cid:
+            conexion = por_cid[dcid]
+        elif dcid is not None and es_initial_quic(info):
+            conexion = por_odcid.get(dcid)
+            if conexion is None:
+                conexion = ConexionQUIC(len(conexiones) + 1, origen, instante(fila), instante_epoch(fila))
+                conexiones.append(conexion)
+                por_odcid[dcid] = conexion
+                por_cliente[origen] = conexion
+        elif dcid is None:
+            conexion = por_cliente.get(destino)
+        else:
+            conexion = None
+
+        if conexion is None or conexion.cerrada:
+            continue
+
+        conexion.bytes_total += length
+        if scid is not None:
+            por_cid[scid] = conexion
+
+        offset = fila.get('quic.crypto.offset')
+        if offset:
+            enviado = (origen, info.split(',', 1)[0], offset)
+            if enviado in conexion.offsets:
+                conexion.retrans_bytes += length
+                conexion.retrans_pkts += 1
+            else:
+                conexion.offsets.add(enviado)
+
+        del_servidor = origen != conexion.cliente
+        if es_vuelo_quic(info, del_servidor) and del_servidor != conexion.del_servidor:
+            conexion.del_servidor = del_servidor
+            conexion.vuelos += 1
+        conexion.hrr |= es_hello_retry_request(info)
+        conexion.retry |= es_retry_quic(info)
+        conexion.version_neg |= es_version_negotiation(info)
+
+        if es_handshake_done(info) or (del_servidor and es_1rtt_quic(info)):
+            conexion.cerrada = True
+            if con_offsets:
+                retrans = (conexion.retrans_bytes, conexion.retrans_pkts,
+                           goodput(conexion.bytes_total, conexion.retrans_bytes))
+            else:
+                retrans = (None, None, None)
+            yield (conexion.handshake_id, conexion.bytes_total, wire_ms(conexion.t_inicio, instante(fila)),
+                   conexion.epoch) + retrans + (conexion.vuelos, viajes(conexion.vuelos),
+                                                conexion.hrr, conexion.retry, conexion.version_neg)
+            conexion.offsets = None
+
+    for c in conexiones:
+        if not c.cerrada:
+            yield (c.handshake_id, -1, None, c.epoch) + (None,) * 8
+
+
+HANDSHAKES = {"tls": handshakes_tls, "quic": handshakes_quic}
+
+# Cabecera de <sig>_<protocolo>_handshakes.csv (handshake_process.py, handshake_live.py)
+CABECERA = ['KEM_ALG', 'Handshake_ID', 'Bytes_Total', 'Wire_ms', 'Start_epoch',
+            'Retrans_Bytes', 'Retrans_Pkts', 'Goodput_Ratio',
+            'Flights', 'Round_Trips', 'HRR', 'Retry', 'Version_Neg']
+
+
+def segmentar(lector, kem_alg: str, protocolo: str):
+    """
+    Segmenta todas las tramas de `lector`.
+    Devuelve ([[kem, handshake_id, bytes_total, wire_ms, start_epoch, retrans_bytes,
+    retrans_pkts, goodput_ratio, flights, round_trips, hrr, retry, version_neg], ...],
+    completos, incompletos); wire_ms, retransmisiones y vuelos son None en los
+    handshakes incompletos y start_epoch
+    (instante absoluto del primer Client Hello / Initial) si no hay frame.time_epoch.
+    """
+    filas = [[kem_alg, *handshake] for handshake in HANDSHAKES[protocolo](lector)]
+    incompletos = sum(1 for f in filas if f[2] == -1)
+    return filas, len(filas) - incompletos, incompletos
@@ -0,0 +1,685 @@
+#!/usr/bin/env python3
+"""
+handshake_sim.py
+Simulador de eventos discretos de la latencia del handshake TLS/QUIC con
+retardo y pérdidas, para barrer rejillas de parámetros que no se pueden medir
+con Docker (cada punto de 3- delays / 4- loss son 100–500 handshakes por KEM).
+
+Entradas por KEM:
+  - tamaño de los vuelos: el Client Hello / Initial del cliente y el vuelo
+    del servidor (ServerHello … Finished), del modelo de tamaños de
+    "2- size/SizeDetailed/scripts/size_model.py" o, con --vuelos, de la
+    mediana de flight_bytes de un CSV por handshake de handshake_bytes.py;
+  - tiempo de CPU: se remuestrea la distribución medida sin impairments
+    (*_ideal.csv, ms). Esos tiempos son el handshake completo, no sólo el
+    cómputo: en TLS quedan 5–20 % por encima de la ordenada en el origen de
+    las medianas de 3- delays frente al RTT (pendiente 2 en TLS, 1 en QUIC).
+    Como el simulador ya recorre las rondas de red, a cada KEM se le resta
+    ese exceso (mediana ideal − ordenada con pendiente = RONDAS) desplazando
+    la distribución; sin datos de 3- delays se usa el ideal tal cual. Por
+    eso los escenarios delay* de `validar` no son independientes del ajuste.
+Red, como la configura Launcherv3.sh con Pumba:
+  - retardo fijo en la salida de cliente y servidor (RTT = 2 × retardo);
+  - pérdida Bernoulli o Gilbert–Elliott (pg, pb, 1-h, 1-k en %, como
+    `pumba netem loss-gemodel`) sólo en la salida del servidor
+    (--perdida-en ambos la aplica también al cliente). El estado GE se
+    conserva entre paquetes y handshakes de la misma serie.
+
+Cada vuelo es un bucle de eventos (llegadas, ACKs, temporizadores,
+sondeos del receptor) entre emisor y receptor. Recuperación:
+  - TCP (Linux): SYN / SYN-ACK con RTO inicial de 1 s; con muestra de RTT,
+    RACK (umbral RTT + min_rtt/4, o 3 paquetes), TLP a 2·SRTT (+200 ms con
+    un solo segmento en vuelo, mínimo 10 ms) y RTO = SRTT + max(4·RTTVAR,
+    200 ms), con backoff exponencial y ventana inicial de 10 segmentos.
+  - QUIC (RFC 9002): PTO = SRTT + max(4·RTTVAR, 1 ms), 999 ms sin muestra
+    (kInitialRtt 333 ms), umbral de tiempo 9/8·RTT o de 3 paquetes,
+    límite anti-amplificación 3× hasta que el cliente valida la dirección,
+    y el cliente no puede confirmar los paquetes Handshake sin el Initial
+    del servidor: si éste se pierde, sólo lo recuperan los PTO (el del
+    cliente reenvía su Initial).
+TLS = SYN, SYN-ACK, Client Hello, CPU, vuelo del servidor; QUIC = Initial
+del cliente, CPU, vuelo del servidor. La CPU se suma entera antes del vuelo
+del servidor (en la medida ideal no se separa cliente y servidor).
+Los handshakes que no terminan en TIEMPO_MAX cuentan como fallidos y no
+entran en la distribución.
+
+Uso:
+    python3 handshake_sim.py simular tls ed25519 --kem x25519 mlkem512 --retardo 10 --perdida 5
+                            [--ge 10 50 70 10 | --perfil estable] [-n 500] [-o latencias.csv]
+    python3 handshake_sim.py rejilla quic ed25519 --kem x25519 --retardo 0 5 10 --perdida 0 5 10 20
+                            [-o rejilla.csv]
+    python3 handshake_sim.py validar [-n 500] [-o validacion.csv]
+Las latencias se escriben en segundos.
+"""
+
+import os
+import sys
+import json
+import math
+import heapq
+import argparse
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+SIZE_SCRIPTS = os.path.join(REPO, "2- size", "SizeDetailed", "scripts")
+sys.path.insert(0, SIZE_SCRIPTS)
+import size_model  # noqa: E402
+import handshake_segment  # noqa: E402
+
+IDEAL_LOSS = os.path.join(REPO, "4- loss", "Analysis", "ideal")
+DATOS_LOSS = os.path.join(REPO, "4- loss", "Analysis")
+DATOS_DELAYS = os.path.join(REPO, "3- delays", "Analysis", "handshake_data")
+
+# Perfiles Gilbert–Elliott de Launcherv3.sh (pg pb 1-h 1-k, en %)
+PERFILES_GE = {"estable": (10, 50, 70, 10), "inestable": (20, 40, 90, 20)}
+
+KEMS_NIVEL = {
+    "ed25519": ["P-256", "x25519", "p256_mlkem512", "x25519_mlkem512", "mlkem512"],
+    "secp384r1": ["P-384", "x448", "p384_mlkem768", "x448_mlkem768", "mlkem768"],
+    "secp521r1": ["P-521", "p521_mlkem1024", "mlkem1024"],
+}
+
+TIEMPO_MAX = 60.0            # s; más allá el handshake se da por fallido
+MSS = 1448                   # TCP con timestamps sobre MTU 1500
+INITCWND = 10
+TCP_RTO_INICIAL = 1.0        # SYN / SYN-ACK sin muestra de RTT
+TCP_RTO_MIN = 0.200
+TCP_DELACK_MAX = 0.200
+TLP_MIN = 0.010
+QUIC_RTT_INICIAL = 0.333     # kInitialRtt
+QUIC_GRANULARIDAD = 0.001
+QUIC_DATAGRAMA = size_model.QUIC_DATAGRAMA
+QUIC_CARGA = size_model.QUIC_CARGA
+AMPLIFICACION = 3
+UMBRAL_PAQUETES = 3
+# RTT por handshake sin pérdidas desde el connect(): el Round_Trips de
+# handshake_segment.py (1 en TLS 1.3 y QUIC) más el SYN / SYN-ACK de TCP
+RONDAS = {p: 1 + n for p, n in handshake_segment.RTT_CONEXION.items()}
+RETARDOS_DELAYS = (1, 5, 10, 20)
+
+
+# ---------------------------------------------------------------------------
+# Red
+# ---------------------------------------------------------------------------
+
+class PerdidaBernoulli:
+    def __init__(self, pct):
+        self.p = pct / 100.0
+
+    def perdido(self, rng):
+        return self.p > 0 and rng.random() < self.p
+
+
+class PerdidaGE:
+    """Gilbert–Elliott de netem: pérdida según el estado y después transición."""
+
+    def __init__(self, pg, pb, uno_h, uno_k):
+        self.pg, self.pb = pg / 100.0, pb / 100.0
+        self.p_malo, self.p_bueno = uno_h / 100.0, uno_k / 100.0
+        self.malo = False
+
+    def perdido(self, rng):
+        perdido = rng.random() < (self.p_malo if self.malo else self.p_bueno)
+        if rng.random() < (self.pb if self.malo else self.pg):
+            self.malo = not self.malo
+        return perdido
+
+
+class Canal:
+    """Un sentido de la red: retardo fijo (s) y proceso de pérdida."""
+
+    def __init__(self, retardo, perdida=None):
+        self.retardo = retardo
+        self.perdida = perdida
+
+    def transmitir(self, t, rng):
+        if self.perdida is not None and self.perdida.perdido(rng):
+            return None
+        return t + self.retardo
+
+
+# ---------------------------------------------------------------------------
+# Emisor y vuelo
+# ---------------------------------------------------------------------------
+
+class Emisor:
+    """Estado de recuperación de un extremo, que se conserva entre vuelos."""
+
+    def __init__(self, protocolo):
+        self.quic = protocolo == "quic"
+        self.srtt = None
+        self.rttvar = None
+        self.min_rtt = None
+        self.ultimo_rtt = None
+        self.cwnd = INITCWND
+
+    def muestra_rtt(self, r):
+        self.ultimo_rtt = r
+        self.min_rtt = r if self.min_rtt is None else min(self.min_rtt, r)
+        if self.srtt is None:
+            self.srtt, self.rttvar = r, r / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - r)
+            self.srtt = 0.875 * self.srtt + 0.125 * r
+
+    def pto(self):
+        if self.srtt is None:
+            return QUIC_RTT_INICIAL + 4 * QUIC_RTT_INICIAL / 2
+        return self.srtt + max(4 * self.rttvar, QUIC_GRANULARIDAD)
+
+    def rto(self):
+        if self.srtt is None:
+            return TCP_RTO_INICIAL
+        return self.srtt + max(4 * self.rttvar, TCP_RTO_MIN)
+
+    def tlp(self, en_vuelo):
+        t = 2 * self.srtt + (TCP_DELACK_MAX if en_vuelo == 1 else 0.0)
+        return min(max(t, TLP_MIN), self.rto())
+
+    def umbral_tiempo(self):
+        if self.quic:
+            return max(9 / 8 * max(self.srtt, self.ultimo_rtt), QUIC_GRANULARIDAD)
+        return self.ultimo_rtt + self.min_rtt / 4
+
+
+def transferir(n, t0, ida, vuelta, emisor, rng, tam=QUIC_DATAGRAMA,
+               presupuesto=math.inf, bloqueo=False, sondeo=None, pto_receptor=None):
+    """
+    Entrega n paquetes del emisor al receptor a partir de t0 y devuelve el
+    instante en que el receptor los tiene todos (math.inf si no llega).
+
+    presupuesto: bytes que el emisor puede enviar antes de validar la
+    dirección (anti-amplificación QUIC); cada ACK sólo-Initial lo amplía y
+    un ACK de Handshake lo levanta.
+    bloqueo: el receptor no confirma los paquetes 1..n-1 hasta tener el 0
+    (QUIC: sin el Initial del servidor no hay claves de Handshake).
+    sondeo: instante del primer PTO del receptor mientras no tenga el
+    paquete 0; el sondeo que llega al emisor amplía el presupuesto y
+    provoca la retransmisión de lo no confirmado. Los siguientes se
+    repiten cada pto_receptor * 2^(k+1), con la misma PTO del receptor
+    que fijó el primero.
+    """
+    if math.isinf(t0):
+        return math.inf
+    eventos = []
+    orden = [0]
+
+    def programar(t, tipo, dato=None):
+        orden[0] += 1
+        heapq.heappush(eventos, (t, orden[0], tipo, dato))
+
+    enviado = [None] * n            # instante del último envío
+    secuencia = [0] * n             # número de envío (crece con cada transmisión)
+    confirmado = [False] * n
+    recibido = [False] * n
+    cola = list(range(n))           # pendientes de (re)enviar, por orden
+    en_vuelo = set()
+    n_envios = [0]
+    n_recibidos = [0]
+    temporizador = [0, 0]           # generación, reintentos (backoff)
+    tlp_hecho = [False]
+    presupuesto = [presupuesto]
+
+    def transmitir(i, t):
+        n_envios[0] += 1
+        enviado[i], secuencia[i] = t, n_envios[0]
+        en_vuelo.add(i)
+        presupuesto[0] -= tam
+        llegada = ida.transmitir(t, rng)
+        if llegada is not None:
+            programar(llegada, "llegada", i)
+
+    def vaciar_cola(t):
+        cola.sort()
+        while cola:
+            if not emisor.quic and len(en_vuelo) >= emisor.cwnd:
+                break
+            if presupuesto[0] < tam:
+                break
+            i = cola.pop(0)
+            if not confirmado[i]:
+                transmitir(i, t)
+        armar(t)
+
+    def armar(t):
+        temporizador[0] += 1
+        if not en_vuelo:
+            return
+        if emisor.quic:
+            espera = emisor.pto() * 2 ** temporizador[1]
+        elif emisor.srtt is not None and not tlp_hecho[0]:
+            espera = emisor.tlp(len(en_vuelo))
+        else:
+            espera = emisor.rto() * 2 ** temporizador[1]
+        ultimo = max(enviado[i] for i in en_vuelo)
+        programar(max(ultimo + espera, t), "temporizador", temporizador[0])
+
+    def reenviar(paquetes, t):
+        for i in paquetes:
+            en_vuelo.discard(i)
+            if i not in cola:
+                cola.append(i)
+        vaciar_cola(t)
+
+    def detectar_perdidas(t):
+        if emisor.ultimo_rtt is None:
+            return
+        mayor = max((secuencia[i] for i in range(n) if confirmado[i]), default=0)
+        umbral = emisor.umbral_tiempo()
+        perdidos = []
+        for i in sorted(en_vuelo):
+            if secuencia[i] >= mayor:
+                continue
+            if mayor - secuencia[i] >= UMBRAL_PAQUETES or t - enviado[i] >= umbral:
+                perdidos.append(i)
+            else:
+                programar(enviado[i] + umbral, "umbral", (i, secuencia[i]))
+        if perdidos:
+            reenviar(perdidos, t)
+
+    vaciar_cola(t0)
+    if sondeo is not None:
+        programar(sondeo, "sondeo_receptor", 0)
+
+    while eventos:
+        t, _, tipo, dato = heapq.heappop(eventos)
+        if t - t0 > TIEMPO_MAX:
+            return math.inf
+
+        if tipo == "llegada":
+            if recibido[dato]:
+                continue
+            recibido[dato] = True
+            n_recibidos[0] += 1
+            if n_recibidos[0] == n:
+                return t
+            if bloqueo and not recibido[0]:
+                continue
+            confirmables = frozenset(i for i in range(n) if recibido[i])
+            llegada = vuelta.transmitir(t, rng)
+            if llegada is not None:
+                programar(llegada, "ack", confirmables)
+
+        elif tipo == "ack":
+            nuevos = [i for i in dato if not confirmado[i]]
+            if bloqueo:
+                if any(i > 0 for i in dato):
+                    presupuesto[0] = math.inf
+                else:
+                    presupuesto[0] += AMPLIFICACION * QUIC_DATAGRAMA
+            if not nuevos:
+                vaciar_cola(t)
+                continue
+            mayor = max(nuevos, key=lambda i: secuencia[i])
+            emisor.muestra_rtt(t - enviado[mayor])
+            for i in nuevos:
+                confirmado[i] = True
+                en_vuelo.discard(i)
+                if i in cola:
+                    cola.remove(i)
+            if not emisor.quic:
+                emisor.cwnd += len(nuevos)
+            temporizador[1] = 0
+            tlp_hecho[0] = False
+            detectar_perdidas(t)
+            vaciar_cola(t)
+
+        elif tipo == "umbral":
+            i, sec = dato
+            if i in en_vuelo and secuencia[i] == sec and not confirmado[i]:
+                reenviar([i], t)
+
+        elif tipo == "temporizador":
+            if dato != temporizador[0] or not en_vuelo:
+                continue
+            pendientes = sorted(en_vuelo, key=lambda i: secuencia[i])
+            if emisor.quic:
+                temporizador[1] += 1
+                for i in pendientes[:2]:
+                    transmitir(i, t)
+                armar(t)
+            elif emisor.srtt is not None and not tlp_hecho[0]:
+                tlp_hecho[0] = True
+                transmitir(pendientes[-1], t)
+                armar(t)
+            else:
+                temporizador[1] += 1
+                emisor.cwnd = 1
+                en_vuelo.clear()
+                cola.extend(i for i in pendientes if i not in cola)
+                vaciar_cola(t)
+
+        elif tipo == "sondeo_receptor":
+            if recibido[0]:
+                continue
+            llegada = vuelta.transmitir(t, rng)
+            if llegada is not None:
+                programar(llegada, "sondeo", None)
+            espera = pto_receptor * 2 ** (dato + 1)
+            programar(t + espera, "sondeo_receptor", dato + 1)
+
+        elif tipo == "sondeo":
+            presupuesto[0] += AMPLIFICACION * QUIC_DATAGRAMA
+            pendientes = sorted((i for i in range(n) if not confirmado[i]),
+                                key=lambda i: secuencia[i])
+            for i in pendientes[:2]:
+                if presupuesto[0] >= tam:
+                    transmitir(i, t)
+            armar(t)
+
+    return math.inf
+
+
+# ---------------------------------------------------------------------------
+# Handshakes
+# ---------------------------------------------------------------------------
+
+def handshake_tls(vuelos, cpu, cliente_srv, srv_cliente, rng):
+    """SYN, SYN-ACK, Client Hello y, tras la CPU, el vuelo del servidor."""
+    cliente, servidor = Emisor("tls"), Emisor("tls")
+    t = transferir(1, 0.0, cliente_srv, srv_cliente, cliente, rng)
+    t = transferir(1, t, srv_cliente, cliente_srv, servidor, rng)
+    rtt = cliente_srv.retardo + srv_cliente.retardo
+    for e in (cliente, servidor):
+        e.muestra_rtt(max(rtt, 1e-5))
+    t = transferir(math.ceil(vuelos[0] / MSS), t, cliente_srv, srv_cliente, cliente, rng)
+    return transferir(math.ceil(vuelos[1] / MSS), t + cpu, srv_cliente, cliente_srv, servidor, rng)
+
+
+def handshake_quic(vuelos, cpu, cliente_srv, srv_cliente, rng):
+    """Initial del cliente y, tras la CPU, el vuelo del servidor."""
+    cliente, servidor = Emisor("quic"), Emisor("quic")
+    n_c = math.ceil(vuelos[0] / QUIC_CARGA)
+    t = transferir(n_c, 0.0, cliente_srv, srv_cliente, cliente, rng)
+    pto = cliente.pto()
+    return transferir(math.ceil(vuelos[1] / QUIC_CARGA), t + cpu, srv_cliente, cliente_srv,
+                      servidor, rng, presupuesto=AMPLIFICACION * n_c * QUIC_DATAGRAMA,
+                      bloqueo=True, sondeo=pto, pto_receptor=pto)
+
+
+HANDSHAKES = {"tls": handshake_tls, "quic": handshake_quic}
+
+
+# ---------------------------------------------------------------------------
+# Entradas
+# ---------------------------------------------------------------------------
+
+def cargar_parametros_tamano():
+    ruta = size_model.PARAMS
+    if os.path.isfile(ruta):
+        with open(ruta) as f:
+            return json.load(f)
+    return size_model.calibrar(size_model.cargar_medidas(size_model.CSV_DIR))
+
+
+def vuelos_modelo(params, sig, kem):
+    """(bytes del cliente, bytes del servidor) del modelo de tamaños."""
+    p = size_model.predecir(params, sig, kem)
+    q = params["quic"]
+    cliente = q["ch_base"] + p["ks_client"]
+    servidor = q["sh_base"] + p["ks_server"] + p["certificate"] + p["signature"]
+    return cliente, servidor
+
+
+def vuelos_medidos(csv):
+    """Mediana de flight_bytes por KEM de los CSV por handshake de handshake_bytes.py."""
+    df = pd.read_csv(csv)
+    df = df[df["flight_bytes"].notna() & (df["flight_bytes"] > 0)]
+    return df.groupby("kem")["flight_bytes"].median().to_dict()
+
+
+def exceso_ideal(sig, protocolo):
+    """
+    Parte no computacional de la mediana ideal por KEM (s): mediana ideal menos
+    la ordenada en el origen de las medianas de 3- delays con pendiente RONDAS.
+    """
+    ideal = os.path.join(DATOS_DELAYS, f"{sig}_{protocolo}_ideal.csv")
+    rutas = {d: os.path.join(DATOS_DELAYS, f"{sig}_{protocolo}_delay{d}.csv") for d in RETARDOS_DELAYS}
+    if not os.path.isfile(ideal) or not all(os.path.isfile(r) for r in rutas.values()):
+        return {}
+    df_ideal = pd.read_csv(ideal)
+    delays = {d: pd.read_csv(r) for d, r in rutas.items()}
+    exceso = {}
+    for kem in df_ideal.columns:
+        if not all(kem in df.columns for df in delays.values()):
+            continue
+        ordenada = np.mean([df[kem].median() - RONDAS[protocolo] * 2 * d for d, df in delays.items()])
+        exceso[kem] = max(df_ideal[kem].median() - ordenada, 0.0) / 1000.0
+    return exceso
+
+
+def cargar_cpu(ideal_dir, sig, protocolo):
+    """
+    Tiempo de CPU por KEM (s): los tiempos sin impairments de *_ideal.csv
+    (columnas = KEMs) menos su parte de red (exceso_ideal), que el simulador
+    ya recorre.
+    """
+    ruta = os.path.join(ideal_dir, f"{sig}_{protocolo}_ideal.csv")
+    if not os.path.isfile(ruta):
+        return {}
+    df = pd.read_csv(ruta)
+    exceso = exceso_ideal(sig, protocolo)
+    return {k: np.maximum(df[k].dropna().to_numpy() / 1000.0 - exceso.get(k, 0.0), 0.0)
+            for k in df.columns}
+
+
+def red(retardo_ms, perdida, perdida_en="servidor"):
+    """Canales cliente→servidor y servidor→cliente con el perfil de Pumba."""
+    d = retardo_ms / 1000.0
+
+    def proceso():
+        if perdida is None:
+            return None
+        if isinstance(perdida, tuple):
+            return PerdidaGE(*perdida)
+        return PerdidaBernoulli(perdida) if perdida > 0 else None
+
+    cliente_srv = Canal(d, proceso() if perdida_en == "ambos" else None)
+    srv_cliente = Canal(d, proceso())
+    return cliente_srv, srv_cliente
+
+
+def simular(protocolo, vuelos, cpu, n, retardo_ms, perdida, rng, perdida_en="servidor"):
+    """n latencias (s) de handshakes consecutivos; math.inf si no terminan."""
+    cliente_srv, srv_cliente = red(retardo_ms, perdida, perdida_en)
+    handshake = HANDSHAKES[protocolo]
+    cpus = rng.choice(cpu, size=n)
+    return np.array([handshake(vuelos, c, cliente_srv, srv_cliente, rng) for c in cpus])
+
+
+def resumen(lat):
+    ok = lat[np.isfinite(lat)]
+    if not len(ok):
+        return {"n": 0, "fallidos": len(lat)}
+    return {
+        "n": len(ok),
+        "fallidos": int(len(lat) - len(ok)),
+        "media_s": float(ok.mean()),
+        "mediana_s": float(np.median(ok)),
+        "p90_s": float(np.percentile(ok, 90)),
+        "p99_s": float(np.percentile(ok, 99)),
+    }
+
+
+def distancia_ks(a, b):
+    """Estadístico de Kolmogorov–Smirnov entre dos muestras."""
+    a, b = np.sort(a), np.sort(b)
+    x = np.concatenate([a, b])
+    fa = np.searchsorted(a, x, side="right") / len(a)
+    fb = np.searchsorted(b, x, side="right") / len(b)
+    return float(np.abs(fa - fb).max())
+
+
+# ---------------------------------------------------------------------------
+# Comandos
+# ---------------------------------------------------------------------------
+
+def perdida_args(args):
+    if args.perfil:
+        return PERFILES_GE[args.perfil]
+    if args.ge:
+        return tuple(args.ge)
+    return args.perdida
+
+
+def entradas_kem(args, params, kem, cpu, medidos):
+    if kem not in cpu and args.cpu_ms is None:
+        sys.exit(f"❌ {kem}: sin {args.sig}_{args.protocolo}_ideal.csv en {args.ideal_dir}; usa --cpu-ms")
+    cpu_kem = np.array([args.cpu_ms / 1000.0]) if args.cpu_ms is not None else cpu[kem]
+    cliente, servidor = vuelos_modelo(params, args.sig, kem)
+    servidor = medidos.get(kem, servidor)
+    return (cliente, servidor), cpu_kem
+
+
+def cmd_simular(args):
+    params = cargar_parametros_tamano()
+    cpu = cargar_cpu(args.ideal_dir, args.sig, args.protocolo)
+    medidos = vuelos_medidos(args.vuelos) if args.vuelos else {}
+    rng = np.random.default_rng(args.semilla)
+    perdida = perdida_args(args)
+    filas = []
+    for kem in args.kem:
+        vuelos, cpu_kem = entradas_kem(args, params, kem, cpu, medidos)
+        lat = simular(args.protocolo, vuelos, cpu_kem, args.n, args.retardo[0], perdida, rng,
+                      args.perdida_en)
+        r = resumen(lat)
+        print(f"📊 {args.protocolo.upper()} {args.sig} / {kem}: {r['n']} completos, "
+              f"{r['fallidos']} fallidos, mediana {r.get('mediana_s', math.nan):.4f} s, "
+              f"p90 {r.get('p90_s', math.nan):.4f} s")
+        filas += [{"Handshake_ID": i + 1, "kem": kem, "latency_s": v}
+                  for i, v in enumerate(lat) if np.isfinite(v)]
+    if args.salida:
+        pd.DataFrame(filas).to_csv(args.salida, index=False)
+        print(f"✅ Latencias guardadas en: {args.salida}")
+
+
+def cmd_rejilla(args):
+    params = cargar_parametros_tamano()
+    cpu = cargar_cpu(args.ideal_dir, args.sig, args.protocolo)
+    medidos = vuelos_medidos(args.vuelos) if args.vuelos else {}
+    rng = np.random.default_rng(args.semilla)
+    perdidas = [PERFILES_GE[args.perfil]] if args.perfil else \
+        [tuple(args.ge)] if args.ge else args.perdida
+    filas = []
+    for kem in args.kem:
+        vuelos, cpu_kem = entradas_kem(args, params, kem, cpu, medidos)
+        for retardo in args.retardo:
+            for perdida in perdidas:
+                lat = simular(args.protocolo, vuelos, cpu_kem, args.n, retardo, perdida, rng,
+                              args.perdida_en)
+                etiqueta = " ".join(map(str, perdida)) if isinstance(perdida, tuple) else perdida
+                filas.append({"kem": kem, "delay_ms": retardo, "loss": etiqueta, **resumen(lat)})
+    df = pd.DataFrame(filas)
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.salida:
+        df.to_csv(args.salida, index=False)
+        print(f"✅ Rejilla guardada en: {args.salida}")
+
+
+def escenarios_validacion():
+    """(nombre, protocolo, sig, retardo_ms, pérdida, ideal_dir, {kem: muestras ms})."""
+    for sig in KEMS_NIVEL:
+        for proto in ("tls", "quic"):
+            for retardo in (1, 5, 10, 20):
+                ruta = os.path.join(DATOS_DELAYS, f"{sig}_{proto}_delay{retardo}.csv")
+                if os.path.isfile(ruta):
+                    df = pd.read_csv(ruta)
+                    yield (f"delay{retardo}", proto, sig, retardo, 0, DATOS_DELAYS,
+                           {k: df[k].dropna().to_numpy() for k in df.columns})
+            carpetas = [(f"loss{p}", f"loss{p}", p) for p in (5, 10, 20)] + \
+                       [(c, f"M{c}", PERFILES_GE[c]) for c in PERFILES_GE]
+            for carpeta, sufijo, perdida in carpetas:
+                ruta = os.path.join(DATOS_LOSS, carpeta, f"{sig}_{proto}_handshakes_merged_{sufijo}.csv")
+                if os.path.isfile(ruta):
+                    df = pd.read_csv(ruta)
+                    yield (carpeta, proto, sig, 0, perdida, IDEAL_LOSS,
+                           {c[:-len("_Time_ms")]: df[c].dropna().to_numpy()
+                            for c in df.columns if c.endswith("_Time_ms")})
+
+
+def cmd_validar(args):
+    params = cargar_parametros_tamano()
+    rng = np.random.default_rng(args.semilla)
+    filas = []
+    for nombre, proto, sig, retardo, perdida, ideal_dir, medidas in escenarios_validacion():
+        cpu = cargar_cpu(ideal_dir, sig, proto)
+        for kem, medido in medidas.items():
+            if kem not in cpu or not len(medido):
+                continue
+            vuelos = vuelos_modelo(params, sig, kem)
+            lat = simular(proto, vuelos, cpu[kem], args.n, retardo, perdida, rng)
+            ok = lat[np.isfinite(lat)] * 1000.0
+            umbral = 100.0 + 4 * retardo      # más de 100 ms sobre el camino sin pérdidas
+            filas.append({
+                "scenario": nombre, "protocol": proto.upper(), "sig": sig, "kem": kem,
+                "n_meas": len(medido), "n_sim": len(ok),
+                "median_meas_ms": np.median(medido), "median_sim_ms": np.median(ok),
+                "p90_meas_ms": np.percentile(medido, 90), "p90_sim_ms": np.percentile(ok, 90),
+                "mean_meas_ms": medido.mean(), "mean_sim_ms": ok.mean(),
+                "recovery_meas": (medido > umbral).mean(), "recovery_sim": (ok > umbral).mean(),
+                "ks": distancia_ks(medido, ok),
+            })
+    df = pd.DataFrame(filas)
+    if df.empty:
+        sys.exit("❌ No hay datos de 3- delays / 4- loss para validar")
+    agg = df.groupby(["scenario", "protocol"]).agg(
+        kems=("kem", "count"),
+        median_meas_ms=("median_meas_ms", "mean"), median_sim_ms=("median_sim_ms", "mean"),
+        mean_meas_ms=("mean_meas_ms", "mean"), mean_sim_ms=("mean_sim_ms", "mean"),
+        recovery_meas=("recovery_meas", "mean"), recovery_sim=("recovery_sim", "mean"),
+        ks=("ks", "median"),
+    ).reset_index()
+    print("📏 Validación (medias por escenario; ks = mediana de la distancia KS por KEM):")
+    print(agg.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    if args.salida:
+        df.to_csv(args.salida, index=False)
+        print(f"✅ Validación por KEM guardada en: {args.salida}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulador de latencia del handshake TLS/QUIC con retardo y pérdidas.")
+    ap.add_argument("--semilla", type=int, default=1, help="semilla del generador aleatorio")
+    ap.add_argument("-n", type=int, default=500, help="handshakes por KEM y punto")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    for nombre, ayuda in (("simular", "latencias por handshake de un punto"),
+                          ("rejilla", "resumen para una rejilla de retardos y pérdidas")):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("protocolo", choices=["tls", "quic"])
+        p.add_argument("sig", help="SIG_ALG (ed25519, secp384r1, mldsa65...)")
+        p.add_argument("--kem", nargs="+", required=True)
+        p.add_argument("--retardo", type=float, nargs="+", default=[0.0],
+                       help="ms en la salida de cada contenedor (RTT = 2 × retardo)")
+        grupo = p.add_mutually_exclusive_group()
+        grupo.add_argument("--perdida", type=float, nargs="+", default=[0.0],
+                           help="%% de pérdida Bernoulli")
+        grupo.add_argument("--ge", type=float, nargs=4, metavar=("PG", "PB", "1-H", "1-K"),
+                           help="Gilbert–Elliott en %%, como pumba loss-gemodel")
+        grupo.add_argument("--perfil", choices=sorted(PERFILES_GE), help="perfil GE de Launcherv3.sh")
+        p.add_argument("--perdida-en", choices=["servidor", "ambos"], default="servidor",
+                       help="salida con pérdidas (Launcherv3.sh sólo la aplica al servidor)")
+        p.add_argument("--ideal-dir", default=IDEAL_LOSS, help="carpeta con <sig>_<proto>_ideal.csv")
+        p.add_argument("--cpu-ms", type=float, help="tiempo de CPU fijo si el KEM no tiene medida ideal")
+        p.add_argument("--vuelos", help="CSV por handshake de handshake_bytes.py con flight_bytes")
+        p.add_argument("-o", "--salida", default=None)
+
+    p = sub.add_parser("validar", help="compara con 3- delays y 4- loss")
+    p.add_argument("-o", "--salida", default=None)
+    args = ap.parse_args()
+
+    if args.cmd == "simular":
+        if len(args.retardo) > 1 or (args.perdida and len(args.perdida) > 1):
+            sys.exit("❌ simular acepta un solo punto; usa rejilla para varios")
+        if not (args.perfil or args.ge):
+            args.perdida = args.perdida[0]
+        cmd_simular(args)
+    elif args.cmd == "rejilla":
+        cmd_rejilla(args)
+    else:
+        cmd_validar(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+handshake_store.py
+Almacén columnar (Parquet) de tiempos de handshake en formato largo.
+
+Una fila por ejecución con columnas tipadas:
+    Protocol, SIG, Level, KEM, Scenario, Execution, Time_ms (float32), Status
+
+Se escribe como dataset particionado estilo Hive:
+    <dir>/Protocol=TLS/Scenario=Loss20/<sig>.parquet
+de modo que los análisis pueden leer sólo las columnas y particiones que
+necesitan, sin volver a hacer melt de los CSV anchos.
+
+Requiere pyarrow (pip install pyarrow).
+"""
+
+import os
+import json
+import math
+
+LEVEL_MAP = {"ed25519": 1, "secp384r1": 3, "secp521r1": 5}
+PARTICIONES = ["Protocol", "Scenario"]
+COMPRESION = "zstd"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ La salida Parquet requiere pyarrow: pip install pyarrow")
+    return pa, pq
+
+
+def esquema():
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ("SIG",       pa.dictionary(pa.int8(), pa.string())),
+        ("Level",     pa.int8()),
+        ("KEM",       pa.dictionary(pa.int8(), pa.string())),
+        ("Execution", pa.int32()),
+        ("Time_ms",   pa.float32()),
+        ("Status",    pa.dictionary(pa.int8(), pa.string())),
+    ])
+
+
+def ruta_particion(dir_parquet, protocolo, escenario, sig_alg):
+    return os.path.join(dir_parquet, f"Protocol={protocolo.upper()}",
+                        f"Scenario={escenario}", f"{sig_alg}.parquet")
+
+
+def escribir_bloque(dir_parquet, protocolo, escenario, sig_alg, kem_dict, kems):
+    """
+    Escribe un bloque (protocolo, SIG) del parser de logs. kem_dict[kem] es una
+    columna array('d') indexada por ejecución, con NaN para fallos/ausentes.
+    """
+    pa, pq = _pyarrow()
+
+    kem_col, exec_col, time_col, status_col = [], [], [], []
+    for kem in kems:
+        columna = kem_dict[kem]
+        kem_col.extend([kem] * len(columna))
+        exec_col.extend(range(1, len(columna) + 1))
+        time_col.extend(columna)
+        status_col.extend("failed" if math.isnan(x) else "ok" for x in columna)
+
+    n = len(kem_col)
+    tipos = esquema()
+    tabla = pa.table({
+        "SIG":       pa.array([sig_alg] * n, tipos.field("SIG").type),
+        "Level":     pa.array([LEVEL_MAP.get(sig_alg)] * n, tipos.field("Level").type),
+        "KEM":       pa.array(kem_col, tipos.field("KEM").type),
+        "Execution": pa.array(exec_col, tipos.field("Execution").type),
+        "Time_ms":   pa.array(time_col, pa.float64(), from_pandas=True).cast(tipos.field("Time_ms").type),
+        "Status":    pa.array(status_col, tipos.field("Status").type),
+    }, schema=tipos)
+
+    salida = ruta_particion(dir_parquet, protocolo, escenario, sig_alg)
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    pq.write_table(tabla, salida, compression=COMPRESION)
+    return salida
+
+
+def cargar_tiempos(dir_parquet, columnas=None, **filtros):
+    """
+    Carga el dataset como DataFrame leyendo sólo `columnas` y las particiones /
+    filas que cumplan `filtros` (igualdad, o pertenencia si el valor es lista).
+
+        cargar_tiempos("store", ["KEM", "Time_ms"], Protocol="QUIC", Scenario=["Loss10", "Loss20"])
+    """
+    _pyarrow()
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(dir_parquet, format="parquet", partitioning="hive")
+    expr = None
+    for campo, valor in filtros.items():
+        cond = ds.field(campo).isin(valor) if isinstance(valor, (list, tuple, set)) else ds.field(campo) == valor
+        expr = cond if expr is None else expr & cond
+    return dataset.to_table(columns=columnas, filter=expr).to_pandas()
+
+
+def cargar_jsonl(ruta):
+    """
+    Carga los registros del cliente con OUTPUT_FORMAT=jsonl (las demás líneas
+    del log se ignoran) en un DataFrame con las mismas columnas que el almacén
+    Parquet más las marcas de tiempo, el código de salida y la configuración netem.
+    """
+    import pandas as pd
+
+    with open(ruta, encoding="utf-8", errors="replace") as f:
+        registros = [json.loads(linea) for linea in f if linea.startswith('{"')]
+
+    df = pd.json_normalize(registros, sep="_")
+    if df.empty:
+        return df
+    df = df.rename(columns={"protocol": "Protocol", "auth": "Auth", "sig": "SIG", "kem": "KEM",
+                            "run": "Execution", "duration_ms": "Time_ms", "exit": "Exit"})
+    df["Protocol"] = df["Protocol"].str.upper()
+    df["Level"] = df["SIG"].map(LEVEL_MAP)
+    df["Time_ms"] = df["Time_ms"].astype("float32")
+    df["Status"] = df["Time_ms"].isna().map({True: "failed", False: "ok"})
+    return df
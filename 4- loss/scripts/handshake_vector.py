@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+handshake_vector.py
+Motor vectorizado (NumPy/pandas) de segmentación de handshakes sobre las
+tramas de tshark: misma semántica que handshakes_tls / handshakes_quic de
+handshake_segment.py, sin bucles por fila.
+
+  - Se cargan sólo las columnas necesarias, con dtypes fijos.
+  - Inicio y fin de handshake son máscaras booleanas calculadas con
+    operaciones de cadena vectorizadas sobre _ws.col.Info.
+  - Los bytes de cada handshake salen de un cumsum por conexión y de los
+    índices de inicio/fin.
+
+TLS: en cada conexión la máquina abierto/cerrado sólo depende del último
+evento (un Client Hello deja la conexión abierta, un fin la deja cerrada),
+así que un Client Hello abre handshake si el evento anterior de su conexión
+no era otro Client Hello, y un fin lo cierra si el anterior sí lo era. Un fin
+sólo es evento si lo envía el servidor o, si lo envía el cliente, cuando hay
+una trama con datos del servidor después del último Client Hello (ffill por
+conexión); las métricas se toman en esa última trama del servidor.
+
+QUIC: la conexión de cada paquete se resuelve con joins en lugar de un
+diccionario que se va llenando:
+  DCID == DCID original de un Initial del cliente → esa conexión;
+  sin DCID (hacia un CID de longitud cero)        → última conexión abierta
+                                                     por esa dirección (merge_asof);
+  DCID == SCID anunciado por el servidor          → conexión de ese SCID.
+
+Retransmisiones: en TLS, cumsum por conexión de las tramas marcadas por tshark
+como retransmisión; en QUIC, duplicated() sobre (conexión, extremo, espacio,
+offset CRYPTO).
+
+Vuelos: cambio de emisor respecto al paquete anterior con datos de la misma
+conexión (shift por grupo), sumado entre inicio y la última trama del servidor;
+en QUIC sólo sobre los paquetes de es_vuelo_quic. HRR/Retry/Version_Neg son
+máscaras de la Info acumuladas igual.
+"""
+
+import numpy as np
+import pandas as pd
+
+from handshake_segment import goodput, viajes
+
+try:
+    import pyarrow  # noqa: F401  (lector CSV multihilo de pandas)
+    MOTOR_CSV = "pyarrow"
+except ImportError:
+    MOTOR_CSV = "c"
+
+COLUMNAS = {
+    "frame.len": "float64",
+    "frame.time_relative": "float64",
+    "frame.time_epoch": "float64",
+    "ip.src": "string",
+    "ip.dst": "string",
+    "_ws.col.Protocol": "string",
+    "_ws.col.Info": "string",
+    "tcp.srcport": "string",
+    "tcp.dstport": "string",
+    "udp.srcport": "string",
+    "udp.dstport": "string",
+    "quic.crypto.offset": "string",
+}
+# tshark escribe la cabecera de las columnas _ws.col.* en minúsculas según versión
+ALIAS = {"_ws.col.protocol": "_ws.col.Protocol", "_ws.col.info": "_ws.col.Info"}
+TEXTO = [c for c, d in COLUMNAS.items() if d == "string"]
+
+PAT_DCID = r"DCID=([a-fA-F0-9]+)"
+PAT_SCID = r"SCID=([a-fA-F0-9]+)"
+PAT_LEN = r"\bLen=[1-9]"
+
+
+def _a_float(columna):
+    """Conversión exacta (como float() del segmentador por filas); lo no numérico queda NaN."""
+    try:
+        return columna.replace("", np.nan).astype("float64")
+    except (ValueError, TypeError):
+        return pd.to_numeric(columna, errors="coerce")
+
+
+def _normalizar(df):
+    df = df.rename(columns=ALIAS)
+    # sin quic.crypto.offset los reenvíos QUIC no se pueden distinguir (columnas vacías)
+    con_offsets = "quic.crypto.offset" in df.columns
+    for columna, dtype in COLUMNAS.items():
+        if columna not in df.columns:
+            df[columna] = pd.Series(pd.NA if dtype == "string" else np.nan, index=df.index, dtype=dtype)
+        elif df[columna].dtype != dtype:
+            df[columna] = _a_float(df[columna]) if dtype == "float64" else df[columna].astype(dtype)
+    df[TEXTO] = df[TEXTO].fillna("")
+    df["frame.time_relative"] = df["frame.time_relative"].fillna(0.0)
+    # frame.len no numérico: la fila se descarta (como el `continue` del segmentador)
+    df = df[df["frame.len"].notna()].reset_index(drop=True)
+    df["frame.len"] = df["frame.len"].astype("int64")
+    df.attrs["con_offsets"] = con_offsets
+    return df
+
+
+def cargar_csv(ruta_csv):
+    """Sólo las columnas que usa la segmentación, con dtypes fijos."""
+    cabecera = pd.read_csv(ruta_csv, nrows=0).columns
+    tipos = {c: COLUMNAS[ALIAS.get(c, c)] for c in cabecera if ALIAS.get(c, c) in COLUMNAS}
+    try:
+        df = pd.read_csv(ruta_csv, usecols=list(tipos), dtype=tipos, engine=MOTOR_CSV)
+    except (ValueError, TypeError):
+        # algún frame.len / time_relative no numérico: se convierte fila a fila
+        df = pd.read_csv(ruta_csv, usecols=list(tipos), dtype="string")
+    return _normalizar(df)
+
+
+def desde_filas(filas):
+    """DataFrame a partir de dicts con las columnas del CSV (p.ej. pcapng_reader.filas_tshark)."""
+    return _normalizar(pd.DataFrame.from_records(list(filas)))
+
+
+def _wire_ms(t_inicio, t_fin):
+    """Latencia en el cable en ms, redondeada igual que handshake_segment.wire_ms."""
+    return [round((f - i) * 1000, 3) for i, f in zip(t_inicio.tolist(), t_fin.tolist())]
+
+
+def _epoch(valores):
+    """frame.time_epoch redondeado a µs; None si falta (igual que handshake_segment.instante_epoch)."""
+    return [round(v, 6) if v == v and v else None for v in valores.tolist()]
+
+
+def _clave_extremos(ip_a, puerto_a, ip_b, puerto_b):
+    a = ip_a + "|" + puerto_a
+    b = ip_b + "|" + puerto_b
+    return a.where(a <= b, b) + "↔" + b.where(a <= b, a)
+
+
+# ======================================================================================
+#  TLS
+# ======================================================================================
+def segmentar_tls(df, kem_alg):
+    proto = df["_ws.col.Protocol"].str.lower()
+    es_tls = proto.str.startswith("tlsv1.")
+    retrans = df["_ws.col.Info"].str.contains("Retransmission]", regex=False)
+    datos = (proto == "ssl") | df["_ws.col.Info"].str.contains(PAT_LEN, regex=True)
+    tls = df[es_tls | retrans | datos].reset_index(drop=True)
+    if not es_tls.any():
+        return [], 0, 0
+    info = tls["_ws.col.Info"]
+    es_tls = tls["_ws.col.Protocol"].str.lower().str.startswith("tlsv1.")
+    retrans = info.str.contains("Retransmission]", regex=False)
+
+    es_ch = (es_tls & info.str.contains("Client Hello", regex=False)
+             & ~info.str.contains("Retransmission", regex=False))
+    es_hrr = es_tls & info.str.contains("Hello Retry Request", regex=False)
+    es_fin = es_tls & ~es_hrr & (info.str.contains("Encrypted Handshake Message", regex=False)
+                                 | info.str.contains("Finished", regex=False)
+                                 | info.str.contains("Change Cipher Spec", regex=False))
+    conexion = _clave_extremos(tls["ip.src"], tls["tcp.srcport"], tls["ip.dst"], tls["tcp.dstport"])
+    emisor = tls["ip.src"] + "|" + tls["tcp.srcport"]
+    pos = pd.Series(np.arange(len(tls), dtype="float64"))
+    # Cliente: emisor del último Client Hello de la conexión. El fin sólo vale del
+    # servidor; el del cliente cierra en la última trama del servidor posterior al
+    # último Client Hello (si no la hay, no cierra).
+    cliente = emisor.where(es_ch).groupby(conexion.values).ffill()
+    del_servidor = (cliente.notna() & (emisor != cliente)).fillna(False).astype(bool)
+    ultimo_srv = pos.where(del_servidor).groupby(conexion.values).ffill()
+    ultimo_ch = pos.where(es_ch).groupby(conexion.values).ffill()
+    es_fin = es_fin & ~es_ch & (del_servidor | (ultimo_srv > ultimo_ch))
+    # Un Client Hello cuenta como inicio aunque la Info liste también un fin: en
+    # TLS 1.3 el primer vuelo del cliente nunca lleva Finished ni CCS.
+    evento = np.select([es_ch, es_fin], [1, 2], 0)
+    tls = tls.assign(conexion=conexion, evento=evento)
+
+    eventos = tls[tls["evento"] > 0]
+    previo = eventos.groupby("conexion", sort=False)["evento"].shift(fill_value=2)
+    inicios = eventos.index[(eventos["evento"] == 1) & (previo == 2)]
+    finales = eventos.index[(eventos["evento"] == 2) & (previo == 1)]
+    # segundo Client Hello con el handshake abierto (tras HelloRetryRequest)
+    es_hrr = es_hrr.copy()
+    es_hrr[eventos.index[(eventos["evento"] == 1) & (previo == 1)]] = True
+
+    # Vuelos: trama con datos cuyo emisor no es el de la anterior de la conexión
+    cambio = (emisor != emisor.groupby(conexion.values).shift()).fillna(True)
+
+    # Bytes: cumsum por conexión; cada fin se empareja con el inicio anterior de su conexión.
+    # Los segmentos que tshark no muestra como TLS (retransmisiones, fuera de orden,
+    # Continuation Data) van sólo a retrans/fuera.
+    longitud = tls["frame.len"]
+    cuentas = pd.DataFrame({
+        "tls": longitud.where(es_tls, 0),
+        "retrans": longitud.where(retrans, 0),
+        "retrans_pkts": retrans.astype("int64"),
+        "fuera": longitud.where(~es_tls, 0),
+        "vuelos": cambio.astype("int64"),
+        "hrr": es_hrr.astype("int64"),
+    })
+    acumulado = cuentas.groupby(tls["conexion"].values, sort=False).cumsum()
+    hs = pd.DataFrame({"inicio": inicios, "conexion": tls.loc[inicios, "conexion"].values})
+    hs["handshake_id"] = np.arange(1, len(hs) + 1)
+    fin = pd.DataFrame({"fin": finales, "conexion": tls.loc[finales, "conexion"].values})
+
+    hs = pd.merge_asof(fin.sort_values("fin"), hs.sort_values("inicio"),
+                       left_on="fin", right_on="inicio", by="conexion", direction="backward")
+    # las métricas se toman en la última trama del servidor (la propia del fin si la envía él)
+    i, f = hs["inicio"].values, ultimo_srv.values[hs["fin"].values].astype("int64")
+    for columna, destino in (("tls", "bytes"), ("retrans", "retrans"),
+                             ("retrans_pkts", "retrans_pkts"), ("fuera", "fuera"), ("hrr", "hrr")):
+        hs[destino] = (acumulado[columna].values[f] - acumulado[columna].values[i]
+                       + cuentas[columna].values[i])
+    # el Client Hello siempre abre vuelo, cambie o no de emisor
+    hs["vuelos"] = acumulado["vuelos"].values[f] - acumulado["vuelos"].values[i] + 1
+    tiempo = tls["frame.time_relative"].values
+    hs["wire_ms"] = _wire_ms(tiempo[i], tiempo[f])
+    epoch = np.asarray(_epoch(tls.loc[inicios, "frame.time_epoch"]), dtype=object)
+
+    cerrados = hs.sort_values("fin")
+    completos_ids = set(cerrados["handshake_id"])
+    abiertos = [hid for hid in range(1, len(inicios) + 1) if hid not in completos_ids]
+
+    filas = [[kem_alg, int(h), int(b), float(w), epoch[h - 1], int(rb), int(rp), goodput(int(b + fu), int(rb)),
+              int(v), viajes(int(v)), int(hr > 0), None, None]
+             for h, b, w, rb, rp, fu, v, hr in zip(cerrados["handshake_id"], cerrados["bytes"], cerrados["wire_ms"],
+                                                   cerrados["retrans"], cerrados["retrans_pkts"], cerrados["fuera"],
+                                                   cerrados["vuelos"], cerrados["hrr"])]
+    filas += [[kem_alg, hid, -1, None, epoch[hid - 1]] + [None] * 8 for hid in abiertos]
+    return filas, len(cerrados), len(abiertos)
+
+
+# ======================================================================================
+#  QUIC
+# ======================================================================================
+def segmentar_quic(df, kem_alg):
+    con_offsets = df.attrs.get("con_offsets", False)
+    q = df[df["_ws.col.Protocol"].str.lower() == "quic"].reset_index(drop=True)
+    if q.empty:
+        return [], 0, 0
+    info = q["_ws.col.Info"]
+    q["pos"] = np.arange(len(q))
+    q["dcid"] = info.str.extract(PAT_DCID, expand=False)
+    q["scid"] = info.str.extract(PAT_SCID, expand=False)
+    q["origen"] = q["ip.src"] + "|" + q["udp.srcport"]
+    q["destino"] = q["ip.dst"] + "|" + q["udp.dstport"]
+
+    # 1) Conexiones: primer Initial del cliente con cada DCID original
+    es_initial = info.str.startswith("Initial") & q["dcid"].notna()
+    aperturas = q[es_initial].drop_duplicates("dcid")
+    # un DCID que ya es SCID anunciado antes (Retry) no abre conexión nueva
+    scid_previo = q[q["scid"].notna()].groupby("scid")["pos"].min()
+    anunciado = aperturas["dcid"].map(scid_previo)
+    aperturas = aperturas[~(anunciado < aperturas["pos"])]
+    conexiones = pd.DataFrame({
+        "conexion": np.arange(1, len(aperturas) + 1),
+        "odcid": aperturas["dcid"].values,
+        "cliente": aperturas["origen"].values,
+        "pos": aperturas["pos"].values,
+        "t_inicio": aperturas["frame.time_relative"].values,
+    })
+    epoch = _epoch(aperturas["frame.time_epoch"])
+
+    # Initial (original o retransmitido) con el DCID original de su conexión
+    odcid = conexiones.set_index("odcid")["conexion"].astype("float64")
+    q["conexion"] = q["dcid"].where(es_initial).map(odcid)
+
+    # 2) Paquetes sin DCID: última conexión abierta por su dirección destino
+    sin_dcid = q[q["dcid"].isna()][["pos", "destino"]]
+    por_cliente = pd.merge_asof(sin_dcid, conexiones[["pos", "cliente", "conexion"]],
+                                on="pos", left_by="destino", right_by="cliente", direction="backward")
+    q.loc[sin_dcid.index, "conexion"] = por_cliente["conexion"].values
+
+    # 3) DCID == SCID anunciado por un paquete ya atribuido; se repite mientras
+    #    haya atribuciones nuevas (el SCID de un Retry lo anuncia un paquete que
+    #    a su vez se atribuye por el SCID del cliente)
+    while True:
+        scid_conexion = (q[q["scid"].notna() & q["conexion"].notna()]
+                         .drop_duplicates("scid").set_index("scid")["conexion"])
+        pendiente = q["conexion"].isna() & q["dcid"].notna()
+        nuevas = q.loc[pendiente, "dcid"].map(scid_conexion)
+        if nuevas.isna().all():
+            break
+        q.loc[pendiente, "conexion"] = nuevas
+
+    q = q[q["conexion"].notna()].copy()
+    q["conexion"] = q["conexion"].astype("int64")
+    q = q.merge(conexiones[["conexion", "cliente"]], on="conexion", how="left").sort_values("pos")
+
+    # 4) Fin: HANDSHAKE_DONE o primer 1-RTT del servidor; se descarta lo posterior
+    info = q["_ws.col.Info"]
+    es_fin = (info.str.contains("HANDSHAKE_DONE", regex=False)
+              | (info.str.startswith("Protected Payload") & (q["origen"] != q["cliente"])))
+    fin_previo = es_fin.astype("int64").groupby(q["conexion"]).cumsum() - es_fin.astype("int64")
+    q = q[fin_previo.values == 0]
+    es_fin = es_fin[fin_previo.values == 0]
+
+    bytes_total = q.groupby("conexion")["frame.len"].sum()
+    fin = q[es_fin.values].sort_values("pos")
+    cerradas = fin["conexion"]
+    t_inicio = conexiones.set_index("conexion")["t_inicio"]
+    wire = _wire_ms(cerradas.map(t_inicio).values, fin["frame.time_relative"].values)
+
+    # 5) Reenvíos: offset CRYPTO repetido por el mismo extremo y espacio en la conexión
+    if con_offsets:
+        q = q.assign(espacio=q["_ws.col.Info"].str.split(",", n=1).str[0])
+        reenvio = (q["quic.crypto.offset"] != "") & q.duplicated(
+            ["conexion", "origen", "espacio", "quic.crypto.offset"])
+        por_conexion = q[reenvio.values].groupby("conexion")["frame.len"]
+        retrans_bytes, retrans_pkts = por_conexion.sum(), por_conexion.size()
+        retrans = [(rb, rp, goodput(int(bytes_total[c]), rb))
+                   for c in cerradas
+                   for rb, rp in [(int(retrans_bytes.get(c, 0)), int(retrans_pkts.get(c, 0)))]]
+    else:
+        retrans = [(None, None, None)] * len(cerradas)
+
+    # 6) Vuelos por cambio de sentido cliente/servidor entre los paquetes con datos
+    #    del handshake (es_vuelo_quic); HRR, Retry y Version Negotiation
+    info = q["_ws.col.Info"]
+    del_servidor = q["origen"] != q["cliente"]
+    es_initial = info.str.startswith("Initial")
+    cuenta = (info.str.startswith("Retry") | info.str.startswith("Version Negotiation")
+              | (es_initial & (info.str.contains("CRYPTO", regex=False)
+                               | ~info.str.contains("PKN:", regex=False)))
+              | (del_servidor & info.str.startswith("Handshake")))
+    sentido = del_servidor[cuenta.values].astype("int64")
+    conexion_vuelo = q["conexion"][cuenta.values]
+    cambio = sentido != sentido.groupby(conexion_vuelo).shift(fill_value=-1)
+    por_vuelos = cambio.astype("int64").groupby(conexion_vuelo).sum()
+    marcas = pd.DataFrame({
+        "vuelos": 0,
+        "hrr": info.str.contains("Hello Retry Request", regex=False).astype("int64"),
+        "retry": info.str.startswith("Retry").astype("int64"),
+        "version_neg": info.str.startswith("Version Negotiation").astype("int64"),
+    }, index=q.index).groupby(q["conexion"]).agg({"vuelos": "sum", "hrr": "max", "retry": "max",
+                                                   "version_neg": "max"})
+    marcas["vuelos"] = por_vuelos.reindex(marcas.index, fill_value=0)
+    vuelos = [(int(v), viajes(int(v)), int(h), int(r), int(vn))
+              for v, h, r, vn in marcas.loc[cerradas].itertuples(index=False)]
+
+    filas = [[kem_alg, int(c), int(bytes_total[c]), float(w), epoch[c - 1], *r, *v]
+             for c, w, r, v in zip(cerradas, wire, retrans, vuelos)]
+    abiertas = sorted(set(conexiones["conexion"]) - set(cerradas))
+    filas += [[kem_alg, int(c), -1, None, epoch[c - 1]] + [None] * 8 for c in abiertas]
+    return filas, len(cerradas), len(abiertas)
+
+
+SEGMENTADORES = {"tls": segmentar_tls, "quic": segmentar_quic}
+
+
+def segmentar(df, kem_alg, protocolo):
+    """Mismas filas que handshake_segment.segmentar: (filas, completos, incompletos)."""
+    return SEGMENTADORES[protocolo](df, kem_alg)
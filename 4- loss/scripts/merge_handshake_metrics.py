@@ -4,23 +4,53 @@ merge_handshake_metrics.py  (v3, corrige KeyError)
 Une tamaños y tiempos de handshakes y deja, opcionalmente, una columna
 vacía entre KEMs para facilitar la inspección visual en Excel/LibreOffice.
 
+Si el CSV de tamaños trae Wire_ms (latencia ClientHello/Initial → Finished/
+HANDSHAKE_DONE medida en la captura), se añaden también Wire_ms y
+Residual_ms = Time_ms - Wire_ms: el tiempo que el cliente mide fuera del
+cable (cómputo criptográfico, pila TCP/UDP y planificación del proceso).
+En TLS el residual incluye además el establecimiento TCP previo al
+ClientHello (un SYN perdido aparece aquí como ~1 s de RTO).
+
+Si trae también Retrans_Bytes / Retrans_Pkts / Goodput_Ratio (bytes
+retransmitidos por handshake, handshake_segment.py) se añaden por KEM, para
+cruzar la inflación de latencia con los bytes desperdiciados. Igual con
+Flights / Round_Trips / HRR / Retry / Version_Neg (vuelos y viajes de ida y
+vuelta de cada handshake): la latencia de un KEM se puede explicar por el
+número de RTT en lugar de suponerlo. Las que vienen vacías (Retry y
+Version_Neg en TLS) no se añaden.
+
+Por defecto tamaños y tiempos se emparejan por Handshake_ID (orden). Con el
+log del cliente en JSON lines (OUTPUT_FORMAT=jsonl) y Start_epoch en el CSV
+de tamaños, --join time empareja por marca de tiempo (handshake_join.py) y
+guarda lo no emparejado en <salida>_unmatched.csv. El log del cliente lleva
+todas las SIG_ALG (y puede acumular varios protocolos), así que sus registros
+se filtran por SIG_ALG y protocolo: los de --sig/--protocol o, si no se dan,
+los del nombre del CSV de tamaños (<sig>_<protocolo>_handshakes.csv).
+
 Uso:
     python merge_handshake_metrics.py sizes_csv times_csv [output_csv]
+    python merge_handshake_metrics.py sizes_csv client.log [output_csv] --join time [--tolerance-ms 50]
+                                      [--sig ed25519] [--protocol tls]
 """
 
-import sys
+import argparse
 import pathlib
 import pandas as pd
 
+import handshake_join
+import handshake_store
+
 # ----- ajustes personalizables -----
 METRICS        = ["Time_ms", "Bytes_Total"]
+WIRE_METRICS   = ["Wire_ms", "Residual_ms"]   # sólo si el CSV de tamaños trae Wire_ms
+RETRANS_METRICS = ["Retrans_Bytes", "Retrans_Pkts", "Goodput_Ratio"]   # ídem con Retrans_*
+FLIGHT_METRICS = ["Flights", "Round_Trips", "HRR", "Retry", "Version_Neg"]   # ídem con Flights
 INSERT_SPACERS = True          # crea una columna vacía "" tras cada KEM
 SPACER_HEADER  = ""            # cabecera de esa columna ("" o " ")
 # -----------------------------------
 
-def merge_csvs(sizes_csv: str, times_csv: str, out_csv: str | None = None) -> str:
-    # 1) cargar datos
-    sizes_df = pd.read_csv(sizes_csv)      # KEM_ALG, Handshake_ID, Bytes_*
+def unir_por_id(sizes_df: pd.DataFrame, times_csv: str):
+    """Emparejamiento por número de orden: Handshake_ID de la captura = fila del log."""
     times_df = pd.read_csv(times_csv)      # columnas = KEMs (+ Handshake_ID)
 
     # 2) asegurar Handshake_ID
@@ -44,12 +74,101 @@ def merge_csvs(sizes_csv: str, times_csv: str, out_csv: str | None = None) -> st
         on=["Handshake_ID", "KEM_ALG"],
         how="inner", validate="one_to_one"
     )
+    return merged, kem_cols
+
+
+def sig_protocolo_desde_nombre(sizes_csv: str):
+    """(sig, protocolo) de <sig>_<protocolo>_handshakes.csv; None donde no encaje."""
+    partes = pathlib.Path(sizes_csv).stem.split("_")
+    if len(partes) >= 3 and partes[-1] == "handshakes":
+        return partes[-3], partes[-2]
+    return None, None
+
+
+def unir_por_tiempo(sizes_df: pd.DataFrame, log_file: str, out_csv: str,
+                    tolerancia_ms: float = handshake_join.TOLERANCIA_MS,
+                    sig: str | None = None, protocolo: str | None = None):
+    """
+    Emparejamiento por marca de tiempo (log con OUTPUT_FORMAT=jsonl y CSV de
+    tamaños con Start_epoch). Handshake_ID pasa a ser el número de ejecución;
+    lo que no se empareja se informa y se guarda en <salida>_unmatched.csv.
+    Del log sólo se usan los registros de `sig` y `protocolo`.
+    """
+    if "Start_epoch" not in sizes_df.columns:
+        raise SystemExit(f"❌ {log_file}: la unión por tiempo necesita Start_epoch en el CSV de tamaños")
+
+    kems_capturados = list(dict.fromkeys(sizes_df["KEM_ALG"].astype(str)))
+    registros = handshake_store.cargar_jsonl(log_file)
+    if not registros.empty:
+        if sig is not None:
+            registros = registros[registros["SIG"] == sig]
+        if protocolo is not None:
+            registros = registros[registros["Protocol"] == protocolo.upper()]
+        # Sin filtro, la misma (KEM, ejecución) de otra SIG_ALG o protocolo se repetiría
+        for columna, opcion in (("SIG", "--sig"), ("Protocol", "--protocol")):
+            if registros[columna].nunique() > 1:
+                raise SystemExit(f"❌ {log_file}: varios {columna} en el log; indica {opcion}")
+    ejecuciones = handshake_join.ejecuciones_desde_log(registros)
+    ejecuciones = ejecuciones[ejecuciones["KEM_ALG"].isin(kems_capturados)]
+    if ejecuciones.empty:
+        raise SystemExit(f"❌ {log_file}: sin registros JSON (OUTPUT_FORMAT=jsonl) de estos KEM"
+                         f" ({sig or '?'}, {protocolo or '?'})")
+
+    unidos, hs_sueltos, ex_sueltas = handshake_join.unir_por_tiempo(sizes_df, ejecuciones, tolerancia_ms)
+
+    # Todas las ejecuciones del log; Bytes_* vacíos si su handshake no se capturó
+    columnas_captura = [c for c in sizes_df.columns if c not in ("KEM_ALG", "Handshake_ID", "Start_epoch")]
+    merged = ejecuciones[["KEM_ALG", "Execution", "Time_ms"]].merge(
+        unidos[["KEM_ALG", "Execution"] + columnas_captura],
+        on=["KEM_ALG", "Execution"], how="left", validate="one_to_one",
+    ).rename(columns={"Execution": "Handshake_ID"})
+
+    kem_cols = [k for k in kems_capturados if k in set(ejecuciones["KEM_ALG"])]
+    for kem in kem_cols:
+        n_hs = (hs_sueltos["KEM_ALG"].astype(str) == kem).sum()
+        n_ex = (ex_sueltas["KEM_ALG"] == kem).sum()
+        if n_hs or n_ex:
+            print(f"⚠️ {kem}: {n_hs} handshakes sin ejecución, {n_ex} ejecuciones sin handshake")
+
+    sueltos = handshake_join.informe_no_emparejados(hs_sueltos, ex_sueltas)
+    if not sueltos.empty:
+        ruta = pathlib.Path(out_csv)
+        ruta = ruta.with_name(ruta.stem + "_unmatched.csv")
+        sueltos.to_csv(ruta, index=False)
+        print(f"📄 No emparejados: {ruta}")
+    return merged, kem_cols
+
+
+def merge_csvs(sizes_csv: str, times_csv: str, out_csv: str | None = None,
+               join: str = "id", tolerancia_ms: float = handshake_join.TOLERANCIA_MS,
+               sig: str | None = None, protocolo: str | None = None) -> str:
+    if out_csv is None:
+        out_csv = pathlib.Path(sizes_csv).with_suffix("").name + "_merged.csv"
+
+    # 1) cargar datos
+    sizes_df = pd.read_csv(sizes_csv)      # KEM_ALG, Handshake_ID, Bytes_*
+    if join == "time":
+        sig_nombre, protocolo_nombre = sig_protocolo_desde_nombre(sizes_csv)
+        merged, kem_cols = unir_por_tiempo(sizes_df, times_csv, out_csv, tolerancia_ms,
+                                           sig or sig_nombre, protocolo or protocolo_nombre)
+    else:
+        merged, kem_cols = unir_por_id(sizes_df, times_csv)
+    merged = merged.drop(columns="Start_epoch", errors="ignore")
+
+    metrics = list(METRICS)
+    if "Wire_ms" in merged.columns:
+        merged["Residual_ms"] = (merged["Time_ms"] - merged["Wire_ms"]).round(3)
+        metrics += WIRE_METRICS
+    if "Retrans_Bytes" in merged.columns:
+        metrics += RETRANS_METRICS
+    if "Flights" in merged.columns:
+        metrics += [m for m in FLIGHT_METRICS if merged[m].notna().any()]
 
     # 5) pivotar (métrica, KEM)  -> índice = Handshake_ID
     wide = merged.pivot(
         index="Handshake_ID",
         columns="KEM_ALG",
-        values=METRICS
+        values=metrics
     )
 
     # 6) aplanar MultiIndex a "KEM_Métrica"
@@ -58,7 +177,7 @@ def merge_csvs(sizes_csv: str, times_csv: str, out_csv: str | None = None) -> st
     # 7) reordenar columnas KEM-a-KEM con separadores
     ordered_cols = []
     for kem in kem_cols:                     # respeta orden original
-        for metric in METRICS:
+        for metric in metrics:
             ordered_cols.append(f"{kem}_{metric}")
         if INSERT_SPACERS:
             ordered_cols.append(SPACER_HEADER)
@@ -82,23 +201,27 @@ def merge_csvs(sizes_csv: str, times_csv: str, out_csv: str | None = None) -> st
     wide = wide[ordered_cols].reset_index()
 
     # 8) guardar
-    if out_csv is None:
-        out_csv = pathlib.Path(sizes_csv).with_suffix("").name + "_merged.csv"
-
     wide.to_csv(out_csv, index=False)
     return out_csv
 
 
 def main() -> None:
-    if len(sys.argv) < 3:
-        print("Uso: python merge_handshake_metrics.py sizes_csv times_csv [output_csv]")
-        sys.exit(1)
-
-    sizes_csv = sys.argv[1]
-    times_csv = sys.argv[2]
-    out_csv   = sys.argv[3] if len(sys.argv) >= 4 else None
-
-    output = merge_csvs(sizes_csv, times_csv, out_csv)
+    ap = argparse.ArgumentParser(description="Une tamaños y tiempos de handshakes")
+    ap.add_argument("sizes_csv")
+    ap.add_argument("times_csv", help="CSV ancho del parser de logs o, con --join time, el log JSON lines")
+    ap.add_argument("output_csv", nargs="?")
+    ap.add_argument("--join", choices=("id", "time"), default=None,
+                    help="id: por Handshake_ID (por defecto con CSV); time: por marca de tiempo "
+                         "(por defecto si times_csv no es .csv)")
+    ap.add_argument("--tolerance-ms", type=float, default=handshake_join.TOLERANCIA_MS,
+                    help="desfase admitido entre reloj de captura y de cliente (unión por tiempo)")
+    ap.add_argument("--sig", help="SIG_ALG de los registros del log (por defecto, del nombre de sizes_csv)")
+    ap.add_argument("--protocol", help="protocolo de los registros del log (por defecto, del nombre de sizes_csv)")
+    args = ap.parse_args()
+
+    join = args.join or ("id" if args.times_csv.endswith(".csv") else "time")
+    output = merge_csvs(args.sizes_csv, args.times_csv, args.output_csv, join, args.tolerance_ms,
+                        args.sig, args.protocol)
     print(f"Fichero combinado guardado en: {output}")
 
 
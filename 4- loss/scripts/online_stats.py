@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+online_stats.py
+Estadísticas incrementales en memoria constante para seguir un barrido en vivo:
+media/varianza de Welford y cuantiles con el algoritmo P² (Jain & Chlamtac, 1985).
+"""
+
+import math
+
+CUANTILES = (0.5, 0.9, 0.99)
+
+
+class CuantilP2:
+    """Estimador P² de un cuantil: 5 marcadores, O(1) por muestra."""
+
+    def __init__(self, p):
+        self.p = p
+        self.q = []                               # alturas de los marcadores
+        self.n = [0, 1, 2, 3, 4]                  # posiciones reales
+        self.np = [0, 2 * p, 4 * p, 2 + 2 * p, 4]  # posiciones deseadas
+        self.dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def actualizar(self, x):
+        q, n = self.q, self.n
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.np[i] += self.dn[i]
+
+        for i in (1, 2, 3):
+            d = self.np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def valor(self):
+        if not self.q:
+            return math.nan
+        if len(self.q) < 5:
+            return self.q[min(len(self.q) - 1, int(round(self.p * (len(self.q) - 1))))]
+        return self.q[2]
+
+
+class EstadisticasKEM:
+    """Contadores de un KEM: válidos, fallos (NaN), Welford y cuantiles P²."""
+
+    def __init__(self, cuantiles=CUANTILES):
+        self.n = 0
+        self.fallos = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.cuantiles = {p: CuantilP2(p) for p in cuantiles}
+
+    def actualizar(self, x):
+        if x is None or math.isnan(x):
+            self.fallos += 1
+            return
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (x - self.media)
+        for est in self.cuantiles.values():
+            est.actualizar(x)
+
+    @property
+    def varianza(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else math.nan
+
+    @property
+    def desviacion(self):
+        return math.sqrt(self.varianza)
+
+    @property
+    def tasa_fallos(self):
+        total = self.n + self.fallos
+        return self.fallos / total if total else 0.0
+
+
+def tabla(estadisticas):
+    """Texto con una fila por clave (p.ej. (protocolo, sig, kem)) → EstadisticasKEM."""
+    etiquetas = {clave: "/".join(clave) if isinstance(clave, tuple) else str(clave)
+                 for clave in estadisticas}
+    ancho = max([20] + [len(e) for e in etiquetas.values()])
+    cab = f"  {'Protocol/SIG/KEM':{ancho}} {'ok':>7} {'fail%':>6} {'mean':>9} {'std':>9}" + "".join(
+        f" {'p' + format(p * 100, 'g'):>9}" for p in CUANTILES)
+    lineas = [cab]
+    for clave, est in estadisticas.items():
+        lineas.append(
+            f"  {etiquetas[clave]:{ancho}} {est.n:7d} {100 * est.tasa_fallos:6.1f} {est.media:9.2f} {est.desviacion:9.2f}"
+            + "".join(f" {est.cuantiles[p].valor():9.2f}" for p in CUANTILES))
+    return "\n".join(lineas)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+parse_cache.py
+Caché en disco de resultados de parseo (logs del cliente, CSV de tshark).
+
+Cada entrada se identifica por el hash del contenido del fichero de entrada,
+una etiqueta del parser y el hash del código del parser, de modo que cambiar
+el script invalida sus entradas. El almacenamiento (índice de hashes,
+escritura atómica, expulsión LRU) es el de cache_contenido.py.
+
+Variables de entorno:
+    HANDSHAKE_CACHE=0            desactiva la caché
+    HANDSHAKE_CACHE_DIR=<dir>    directorio (por defecto ~/.cache/tls-quic-handshakes)
+    HANDSHAKE_CACHE_MAX_MB=<n>   tamaño máximo en MB (por defecto 1024)
+"""
+
+import os
+import pickle
+import hashlib
+
+from cache_contenido import CacheContenido
+
+CACHE_DIR = os.environ.get("HANDSHAKE_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "tls-quic-handshakes"))
+MAX_BYTES = int(float(os.environ.get("HANDSHAKE_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+
+CACHE = CacheContenido(CACHE_DIR, MAX_BYTES, "HANDSHAKE_CACHE")
+
+
+def activa():
+    return CACHE.activa()
+
+
+def _clave(ruta, etiqueta, dependencias):
+    h = hashlib.blake2b(digest_size=20)
+    h.update(CACHE.hash_fichero(ruta).encode())
+    h.update(etiqueta.encode())
+    for dep in dependencias:
+        with open(dep, "rb") as f:
+            h.update(hashlib.blake2b(f.read(), digest_size=20).digest())
+    return h.hexdigest()
+
+
+def cargar_o_calcular(ruta, calcular, etiqueta, dependencias=()):
+    """
+    Devuelve calcular() para el fichero `ruta`, usando la caché si el contenido
+    (y el código en `dependencias`) no ha cambiado desde la última vez.
+    """
+    if not activa():
+        return calcular()
+
+    nombre = _clave(ruta, etiqueta, dependencias) + ".pkl"
+    datos = CACHE.leer(nombre)
+    if datos is not None:
+        try:
+            return pickle.loads(datos)
+        except (pickle.UnpicklingError, EOFError):
+            pass
+
+    resultado = calcular()
+    CACHE.guardar(nombre, pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL))
+    return resultado
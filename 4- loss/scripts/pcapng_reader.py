@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""
+pcapng_reader.py
+Lector nativo (Python puro, mmap) de capturas pcapng/pcap para contar bytes y
+paquetes sin pasar por tshark ni por CSV intermedios.
+
+Por trama devuelve frame.len, tiempo relativo, 5-tupla, flags TCP y la carga
+útil L4; encima de eso se decodifican las cabeceras QUIC (tipo de paquete long
+header, DCID/SCID) y los registros TLS de cada flujo TCP. No descifra nada: es
+lo que necesita la contabilidad de bytes del handshake.
+
+Bloques pcapng soportados: SHB, IDB (if_tsresol), EPB, SPB y el obsoleto PB.
+Enlaces: Ethernet (+VLAN), Linux cooked (SLL/SLL2), loopback BSD y IP en crudo.
+"""
+
+import os
+import mmap
+import struct
+from collections import namedtuple
+
+# --- pcapng ---------------------------------------------------------------------------
+SHB = 0x0A0D0D0A
+IDB = 0x00000001
+PB = 0x00000002
+SPB = 0x00000003
+EPB = 0x00000006
+BYTE_ORDER_MAGIC = 0x1A2B3C4D
+OPT_TSRESOL = 9
+
+# --- pcap clásico (magic → orden de bytes, resolución) --------------------------------
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6), b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9), b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+
+# --- Tipos de enlace -------------------------------------------------------------------
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETH_IPV4 = 0x0800
+ETH_IPV6 = 0x86DD
+ETH_VLAN = (0x8100, 0x88A8)
+
+TCP_FIN, TCP_SYN, TCP_RST, TCP_PSH, TCP_ACK = 0x01, 0x02, 0x04, 0x08, 0x10
+
+QUIC_TIPOS_LONG = ("Initial", "0-RTT", "Handshake", "Retry")
+
+Trama = namedtuple("Trama", [
+    "numero",     # frame.number (1-based)
+    "tiempo",     # frame.time_relative (s)
+    "epoch",      # frame.time_epoch (s desde 1970; 0 si la captura no trae marca)
+    "longitud",   # frame.len (longitud original en el cable)
+    "ip_src", "ip_dst",
+    "proto",      # "tcp" | "udp" | None (ARP, MDNS sobre otro L4, ...)
+    "sport", "dport",
+    "flags",      # flags TCP (0 si no es TCP)
+    "seq",        # número de secuencia TCP (0 si no es TCP)
+    "datos",      # carga útil L4 (bytes)
+])
+
+
+# ======================================================================================
+#  Lectura de bloques
+# ======================================================================================
+def _bloques_pcapng(mm):
+    """(tipo, orden, buffer, inicio_cuerpo, fin_cuerpo) para cada bloque del fichero."""
+    pos, fin_fichero = 0, len(mm)
+    orden = "<"
+    while pos + 12 <= fin_fichero:
+        if mm[pos:pos + 4] == b"\x0a\x0d\x0d\x0a":
+            magic = mm[pos + 8:pos + 12]
+            orden = "<" if struct.unpack("<I", magic)[0] == BYTE_ORDER_MAGIC else ">"
+        tipo, total = struct.unpack_from(orden + "II", mm, pos)
+        if total < 12 or pos + total > fin_fichero:
+            break  # bloque truncado (captura en curso o cortada)
+        yield tipo, orden, mm, pos + 8, pos + total - 4
+        pos += total
+
+
+def _leer_exacto(f, n):
+    """n bytes de un flujo (tubería) o menos si se cierra antes."""
+    partes, falta = [], n
+    while falta:
+        trozo = f.read(falta)
+        if not trozo:
+            break
+        partes.append(trozo)
+        falta -= len(trozo)
+    return b"".join(partes)
+
+
+def _bloques_pcapng_flujo(f, inicio=b""):
+    """Como _bloques_pcapng pero leyendo bloque a bloque de un flujo (dumpcap -w -)."""
+    orden = "<"
+    cabecera = inicio + _leer_exacto(f, 12 - len(inicio))
+    while len(cabecera) == 12:
+        if cabecera[:4] == b"\x0a\x0d\x0d\x0a":
+            orden = "<" if struct.unpack("<I", cabecera[8:12])[0] == BYTE_ORDER_MAGIC else ">"
+        tipo, total = struct.unpack_from(orden + "II", cabecera, 0)
+        if total < 12:
+            break
+        bloque = cabecera + _leer_exacto(f, total - 12)
+        if len(bloque) < total:
+            break  # la captura terminó a mitad de bloque
+        yield tipo, orden, bloque, 8, total - 4
+        cabecera = _leer_exacto(f, 12)
+
+
+def _tsresol(buf, orden, inicio, fin):
+    """Resolución del timestamp de un IDB (opción if_tsresol; por defecto µs)."""
+    pos = inicio + 8
+    while pos + 4 <= fin:
+        codigo, longitud = struct.unpack_from(orden + "HH", buf, pos)
+        if codigo == 0:
+            break
+        if codigo == OPT_TSRESOL and longitud >= 1:
+            v = buf[pos + 4]
+            return 2.0 ** -(v & 0x7F) if v & 0x80 else 10.0 ** -v
+        pos += 4 + ((longitud + 3) & ~3)
+    return 1e-6
+
+
+def _paquetes_pcapng(bloques):
+    """(linktype, timestamp_s | None, longitud_original, datos) por paquete."""
+    interfaces = []
+    for tipo, orden, buf, inicio, fin in bloques:
+        if tipo == SHB:
+            interfaces = []
+        elif tipo == IDB:
+            linktype, _, snaplen = struct.unpack_from(orden + "HHI", buf, inicio)
+            interfaces.append((linktype, _tsresol(buf, orden, inicio, fin), snaplen))
+        elif tipo == EPB:
+            iface, ts_alto, ts_bajo, cap, orig = struct.unpack_from(orden + "IIIII", buf, inicio)
+            linktype, resol, _ = interfaces[iface]
+            ts = ((ts_alto << 32) | ts_bajo) * resol
+            yield linktype, ts, orig, buf[inicio + 20:inicio + 20 + cap]
+        elif tipo == SPB:
+            (orig,) = struct.unpack_from(orden + "I", buf, inicio)
+            linktype, _, snaplen = interfaces[0]
+            cap = min(orig, snaplen or orig, fin - inicio - 4)
+            yield linktype, None, orig, buf[inicio + 4:inicio + 4 + cap]
+        elif tipo == PB:
+            iface, _, ts_alto, ts_bajo, cap, orig = struct.unpack_from(orden + "HHIIII", buf, inicio)
+            linktype, resol, _ = interfaces[iface]
+            ts = ((ts_alto << 32) | ts_bajo) * resol
+            yield linktype, ts, orig, buf[inicio + 20:inicio + 20 + cap]
+
+
+def _paquetes_pcap(mm):
+    orden, resol = PCAP_MAGIC[mm[:4]]
+    (linktype,) = struct.unpack_from(orden + "I", mm, 20)
+    linktype &= 0x0FFFFFFF
+    pos = 24
+    while pos + 16 <= len(mm):
+        seg, sub, cap, orig = struct.unpack_from(orden + "IIII", mm, pos)
+        if pos + 16 + cap > len(mm):
+            break
+        yield linktype, seg + sub * resol, orig, mm[pos + 16:pos + 16 + cap]
+        pos += 16 + cap
+
+
+def _paquetes_pcap_flujo(f, magic):
+    """Como _paquetes_pcap leyendo registro a registro de un flujo (tcpdump -w -)."""
+    orden, resol = PCAP_MAGIC[magic]
+    cabecera = magic + _leer_exacto(f, 20)
+    if len(cabecera) < 24:
+        return
+    (linktype,) = struct.unpack_from(orden + "I", cabecera, 20)
+    linktype &= 0x0FFFFFFF
+    while True:
+        registro = _leer_exacto(f, 16)
+        if len(registro) < 16:
+            return
+        seg, sub, cap, orig = struct.unpack(orden + "IIII", registro)
+        datos = _leer_exacto(f, cap)
+        if len(datos) < cap:
+            return
+        yield linktype, seg + sub * resol, orig, datos
+
+
+# ======================================================================================
+#  Decodificación L2 → L4
+# ======================================================================================
+def _l3(linktype, datos):
+    """(ethertype, offset de la cabecera IP) o (None, None)."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(datos) < 14:
+            return None, None
+        ethertype, off = struct.unpack_from("!H", datos, 12)[0], 14
+        while ethertype in ETH_VLAN and len(datos) >= off + 4:
+            ethertype, off = struct.unpack_from("!H", datos, off + 2)[0], off + 4
+        return ethertype, off
+    if linktype == LINKTYPE_LINUX_SLL:
+        return (struct.unpack_from("!H", datos, 14)[0], 16) if len(datos) >= 16 else (None, None)
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return (struct.unpack_from("!H", datos, 0)[0], 20) if len(datos) >= 20 else (None, None)
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        familia = struct.unpack_from("<I", datos, 0)[0] if len(datos) >= 4 else None
+        if familia in (0x02000000, 0x18000000, 0x1C000000, 0x1E000000):
+            familia = struct.unpack_from(">I", datos, 0)[0]
+        return (ETH_IPV4 if familia == 2 else ETH_IPV6), 4
+    if linktype == LINKTYPE_RAW and datos:
+        return (ETH_IPV4 if datos[0] >> 4 == 4 else ETH_IPV6), 0
+    return None, None
+
+
+def _ip(datos, ethertype, off):
+    """(ip_src, ip_dst, protocolo L4, offset L4, fin L4) o None."""
+    if ethertype == ETH_IPV4 and len(datos) >= off + 20:
+        ihl = (datos[off] & 0x0F) * 4
+        total = struct.unpack_from("!H", datos, off + 2)[0]
+        src = ".".join(map(str, datos[off + 12:off + 16]))
+        dst = ".".join(map(str, datos[off + 16:off + 20]))
+        return src, dst, datos[off + 9], off + ihl, min(len(datos), off + total)
+    if ethertype == ETH_IPV6 and len(datos) >= off + 40:
+        longitud = struct.unpack_from("!H", datos, off + 4)[0]
+        src = datos[off + 8:off + 24].hex()
+        dst = datos[off + 24:off + 40].hex()
+        return src, dst, datos[off + 6], off + 40, min(len(datos), off + 40 + longitud)
+    return None
+
+
+def _tramas(paquetes):
+    """Decodifica L2 → L4 cada (linktype, ts, longitud, datos) en una Trama."""
+    t0 = None
+    for numero, (linktype, ts, longitud, datos) in enumerate(paquetes, 1):
+        if ts is not None and t0 is None:
+            t0 = ts
+        tiempo = ts - t0 if ts is not None else 0.0
+        epoch = ts if ts is not None else 0.0
+
+        ethertype, off = _l3(linktype, datos)
+        ip = _ip(datos, ethertype, off) if ethertype else None
+        if ip is None:
+            yield Trama(numero, tiempo, epoch, longitud, None, None, None, 0, 0, 0, 0, b"")
+            continue
+
+        src, dst, l4, ini, fin = ip
+        if l4 == 6 and fin >= ini + 20:
+            sport, dport, seq = struct.unpack_from("!HHI", datos, ini)
+            cabecera = (datos[ini + 12] >> 4) * 4
+            yield Trama(numero, tiempo, epoch, longitud, src, dst, "tcp", sport, dport,
+                        datos[ini + 13], seq, datos[ini + cabecera:fin])
+        elif l4 == 17 and fin >= ini + 8:
+            sport, dport = struct.unpack_from("!HH", datos, ini)
+            yield Trama(numero, tiempo, epoch, longitud, src, dst, "udp", sport, dport, 0, 0,
+                        datos[ini + 8:fin])
+        else:
+            yield Trama(numero, tiempo, epoch, longitud, src, dst, None, 0, 0, 0, 0, b"")
+
+
+def leer_tramas(ruta):
+    """Genera una Trama por paquete de la captura (pcapng o pcap clásico)."""
+    with open(ruta, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            paquetes = _paquetes_pcap(mm) if mm[:4] in PCAP_MAGIC else _paquetes_pcapng(_bloques_pcapng(mm))
+            yield from _tramas(paquetes)
+
+
+def leer_tramas_flujo(f):
+    """
+    Genera una Trama por paquete leyendo de un flujo binario sin posicionamiento
+    (p.ej. sys.stdin.buffer con `dumpcap -w -` o `tcpdump -w -`): cada paquete
+    sale en cuanto llega, sin fichero intermedio.
+    """
+    magic = _leer_exacto(f, 4)
+    if len(magic) < 4:
+        return
+    if magic in PCAP_MAGIC:
+        yield from _tramas(_paquetes_pcap_flujo(f, magic))
+    else:
+        yield from _tramas(_paquetes_pcapng(_bloques_pcapng_flujo(f, magic)))
+
+
+# ======================================================================================
+#  QUIC: cabeceras (sin descifrar)
+# ======================================================================================
+def _varint(datos, pos):
+    """(valor, posición siguiente), o None si el datagrama se corta antes."""
+    if pos >= len(datos):
+        return None
+    primero = datos[pos]
+    n = 1 << (primero >> 6)
+    if pos + n > len(datos):
+        return None
+    valor = primero & 0x3F
+    for b in datos[pos + 1:pos + n]:
+        valor = (valor << 8) | b
+    return valor, pos + n
+
+
+def paquetes_quic(datos, long_dcid_corto=0):
+    """
+    Recorre los paquetes QUIC coalescidos de un datagrama y devuelve
+    [(tipo, dcid, scid, longitud), ...], con tipo en QUIC_TIPOS_LONG,
+    "Version Negotiation" o "1-RTT". Los short header no llevan la longitud
+    del DCID: se pasa la del CID que el extremo anunció (long_dcid_corto).
+
+    Un long header cortado (snaplen, o UDP que no es QUIC y pasa la prueba de
+    versión) hace el datagrama no interpretable: se devuelve [].
+    """
+    paquetes, pos = [], 0
+    while pos < len(datos):
+        primero = datos[pos]
+        if not primero & 0x80:
+            dcid = datos[pos + 1:pos + 1 + long_dcid_corto].hex()
+            paquetes.append(("1-RTT", dcid, "", len(datos) - pos))
+            break
+        if pos + 7 > len(datos):
+            return []
+        version = struct.unpack_from("!I", datos, pos + 1)[0]
+        p = pos + 5
+        if p + 1 + datos[p] >= len(datos):
+            return []
+        dcid = datos[p + 1:p + 1 + datos[p]].hex()
+        p += 1 + datos[p]
+        if p + 1 + datos[p] > len(datos):
+            return []
+        scid = datos[p + 1:p + 1 + datos[p]].hex()
+        p += 1 + datos[p]
+
+        if version == 0:
+            paquetes.append(("Version Negotiation", dcid, scid, len(datos) - pos))
+            break
+        tipo = QUIC_TIPOS_LONG[(primero >> 4) & 0x03]
+        if tipo == "Retry":
+            paquetes.append((tipo, dcid, scid, len(datos) - pos))
+            break
+        if tipo == "Initial":
+            token = _varint(datos, p)
+            if token is None:
+                return []
+            p = token[1] + token[0]
+        longitud = _varint(datos, p)
+        if longitud is None:
+            return []
+        longitud, p = longitud
+        fin = min(len(datos), p + longitud)
+        paquetes.append((tipo, dcid, scid, fin - pos))
+        pos = fin
+    return paquetes
+
+
+# ======================================================================================
+#  TLS sobre TCP: registros por flujo
+# ======================================================================================
+# Random de un ServerHello que es en realidad HelloRetryRequest (RFC 8446, 4.1.3)
+HRR_RANDOM = bytes.fromhex("cf21ad74e59a6111be1d8c021e65b891c2a211167abb8c5e079e09e2c8a8339c")
+TIPO_HRR = 6                # tipo de HelloRetryRequest en los borradores de TLS 1.3
+LONG_INICIO_HS = 4 + 2 + 32  # tipo, longitud, legacy_version y random
+
+
+def _tipo_handshake(cuerpo):
+    """Tipo del mensaje de handshake a partir del inicio del registro (None si vacío)."""
+    if not cuerpo:
+        return None
+    if cuerpo[0] == 2 and cuerpo[6:LONG_INICIO_HS] == HRR_RANDOM:
+        return TIPO_HRR
+    return cuerpo[0]
+
+
+class FlujosTLS:
+    """
+    Sigue la secuencia de registros TLS de cada sentido de cada conexión TCP
+    (en orden de llegada; no reordena, y las retransmisiones llegan ya
+    recortadas por _datos_nuevos). Como en Wireshark, un registro se atribuye
+    a la trama en la que se completa.
+    """
+
+    def __init__(self):
+        self.estado = {}  # (src, sport, dst, dport) → [cabecera parcial, bytes pendientes, tipo, cuerpo]
+
+    def registros(self, trama):
+        """[(content_type, handshake_type | None), ...] completados en esta trama."""
+        datos = trama.datos
+        if not datos:
+            return []
+        clave = (trama.ip_src, trama.sport, trama.ip_dst, trama.dport)
+        parcial, pendientes, tipo, cuerpo = self.estado.get(clave, (b"", 0, None, b""))
+        completos, pos = [], 0
+
+        while pos < len(datos):
+            if pendientes:
+                toma = min(pendientes, len(datos) - pos)
+                if tipo == 22 and len(cuerpo) < LONG_INICIO_HS:
+                    cuerpo += datos[pos:pos + min(toma, LONG_INICIO_HS - len(cuerpo))]
+                pendientes -= toma
+                pos += toma
+                if not pendientes:
+                    completos.append((tipo, _tipo_handshake(cuerpo)))
+                continue
+
+            cabecera = parcial + datos[pos:pos + 5 - len(parcial)]
+            pos += 5 - len(parcial)
+            if len(cabecera) < 5:
+                parcial = cabecera
+                break
+            parcial = b""
+            tipo = cabecera[0]
+            if tipo not in (20, 21, 22, 23) or cabecera[1] != 3:
+                # no es TLS (o se perdió la sincronía): se descarta el resto del segmento
+                tipo, pendientes = None, 0
+                break
+            pendientes = struct.unpack_from("!H", cabecera, 3)[0]
+            cuerpo = b""
+            if not pendientes:
+                completos.append((tipo, None))
+
+        self.estado[clave] = (parcial, pendientes, tipo, cuerpo)
+        return completos
+
+
+def _datos_nuevos(trama, siguiente):
+    """
+    Quita de la carga TCP lo que ya se envió en ese sentido (`siguiente`:
+    sentido → siguiente número de secuencia esperado). Devuelve (trama, True)
+    si no queda nada nuevo: una retransmisión, que tshark marca como
+    [TCP Retransmission] y no vuelve a disecar como TLS.
+    """
+    if not trama.datos:
+        return trama, False
+    sentido = (trama.ip_src, trama.sport, trama.ip_dst, trama.dport)
+    fin = (trama.seq + len(trama.datos)) & 0xFFFFFFFF
+    esperado = siguiente.get(sentido)
+    repetidos = (esperado - trama.seq) & 0xFFFFFFFF if esperado is not None else 0
+    if repetidos >= 1 << 31:
+        repetidos = 0   # hueco: falta un segmento anterior, todo es nuevo
+    if repetidos >= len(trama.datos):
+        return trama, True
+    siguiente[sentido] = fin
+    return (trama._replace(datos=trama.datos[repetidos:]) if repetidos else trama), False
+
+
+# ======================================================================================
+#  Filas equivalentes a convert_pcapng_to_csv.sh
+# ======================================================================================
+TLS_CONTENT = {20: "Change Cipher Spec", 21: "Alert", 23: "Application Data"}
+TLS_HANDSHAKE = {1: "Client Hello", 2: "Server Hello", 4: "New Session Ticket",
+                 TIPO_HRR: "Hello Retry Request", 8: "Encrypted Extensions", 11: "Certificate",
+                 13: "Certificate Request", 15: "Certificate Verify", 20: "Finished"}
+
+
+def _version_quic_valida(datos):
+    if len(datos) < 5 or not datos[0] & 0x80:
+        return False
+    version = struct.unpack_from("!I", datos, 1)[0]
+    return version in (0, 1, 0x6B3343CF) or version >> 8 == 0xFF0000
+
+
+def _info_quic(tipo, dcid, scid):
+    partes = ["Protected Payload (KP0)" if tipo == "1-RTT" else tipo]
+    if dcid:
+        partes.append(f"DCID={dcid}")
+    if scid:
+        partes.append(f"SCID={scid}")
+    return ", ".join(partes)
+
+
+def _info_tls(registros):
+    partes = []
+    for tipo, hs in registros:
+        if tipo == 22:
+            partes.append(TLS_HANDSHAKE.get(hs, "Encrypted Handshake Message"))
+        else:
+            partes.append(TLS_CONTENT.get(tipo, "Ignored Unknown Record"))
+    return ", ".join(partes)
+
+
+def filas_tshark(ruta):
+    """
+    Genera por trama un dict con las mismas claves que las filas del CSV de
+    convert_pcapng_to_csv.sh (frame.number, frame.time_relative, frame.time_epoch,
+    frame.len, ip.src, ip.dst, _ws.col.Protocol, _ws.col.Info, puertos TCP/UDP)
+    para alimentar directamente al segmentador de handshake_process.py.
+
+    Las columnas Protocol/Info se reconstruyen como las muestra tshark sin
+    claves para lo que usa el segmentador:
+      - QUIC: un paquete por parte ("Initial, DCID=...", "Handshake, SCID=...",
+        "Protected Payload (KP0), DCID=..."); un datagrama con paquetes
+        coalescidos los une en orden como tshark, así que empieza por el primero
+        ("Handshake, SCID=..., Protected Payload (KP0)" sigue siendo Handshake).
+      - TLS: "TLSv1.3" y la lista de registros completados en la trama
+        ("Client Hello", "Server Hello, Change Cipher Spec, Application Data", ...).
+    Los segmentos TCP con datos que no completan un registro llevan Protocol
+    "TCP" e Info "<sport> → <dport> Len=<n>", y los que sólo repiten datos ya
+    vistos "[TCP Retransmission] <sport> → <dport> Len=<n>", como en tshark
+    (Len= es lo que usa handshake_segment.es_datos_tcp). El resto de tramas
+    (TCP sin datos, ARP, MDNS...) llevan Protocol "TCP"/"UDP"/"" e Info vacía.
+    """
+    return filas_desde_tramas(leer_tramas(ruta))
+
+
+def filas_flujo(f):
+    """Como filas_tshark pero sobre un flujo (stdout de dumpcap/tcpdump): fila a fila según llegan."""
+    return filas_desde_tramas(leer_tramas_flujo(f))
+
+
+def filas_desde_tramas(tramas):
+    flujos_tls = FlujosTLS()
+    siguiente_seq = {}      # sentido TCP → siguiente número de secuencia esperado
+    extremos_quic = set()   # (ip, puerto) que han enviado un long header QUIC válido
+    cid_anunciado = {}      # (ip, puerto) → SCID que anunció (DCID de sus short headers)
+
+    for t in tramas:
+        proto, info = "", ""
+        if t.proto == "tcp":
+            nueva, retransmitida = _datos_nuevos(t, siguiente_seq)
+            segmento = f"{t.sport} → {t.dport} Len={len(t.datos)}"
+            if retransmitida:
+                proto, info = "TCP", f"[TCP Retransmission] {segmento}"
+            else:
+                registros = flujos_tls.registros(nueva)
+                if registros:
+                    proto, info = "TLSv1.3", _info_tls(registros)
+                else:
+                    proto, info = "TCP", segmento if t.datos else ""
+        elif t.proto == "udp":
+            origen, destino = (t.ip_src, t.sport), (t.ip_dst, t.dport)
+            es_quic = _version_quic_valida(t.datos) or (
+                t.datos and t.datos[0] & 0x40 and (origen in extremos_quic or destino in extremos_quic))
+            proto = "UDP"
+            if es_quic:
+                paquetes = paquetes_quic(t.datos, len(cid_anunciado.get(destino, "")) // 2)
+                for tipo, _, scid, _ in paquetes:
+                    if tipo != "1-RTT":
+                        extremos_quic.add(origen)
+                        cid_anunciado[origen] = scid
+                if paquetes:
+                    proto, info = "QUIC", ", ".join(_info_quic(*p[:3]) for p in paquetes)
+
+        yield {
+            "frame.number": str(t.numero),
+            "frame.time_relative": f"{t.tiempo:.9f}",
+            "frame.time_epoch": f"{t.epoch:.9f}",
+            "frame.len": str(t.longitud),
+            "ip.src": t.ip_src or "",
+            "ip.dst": t.ip_dst or "",
+            "_ws.col.Protocol": proto,
+            "_ws.col.Info": info,
+            "tcp.srcport": str(t.sport) if t.proto == "tcp" else "",
+            "tcp.dstport": str(t.dport) if t.proto == "tcp" else "",
+            "udp.srcport": str(t.sport) if t.proto == "udp" else "",
+            "udp.dstport": str(t.dport) if t.proto == "udp" else "",
+        }
@@ -1,80 +1,433 @@
 import re
 import csv
-import sys
 import os
+import json
+import mmap
+import math
+import time
+import argparse
+from array import array
 from collections import defaultdict
-
-if len(sys.argv) != 4:
-    print(f"Uso: {sys.argv[0]} <archivo_logs> <tag> <dir_output>")
-    sys.exit(1)
-
-log_file    = sys.argv[1]
-tag         = sys.argv[2]
-dir_output  = sys.argv[3]
-
-os.makedirs(dir_output, exist_ok=True)
-
-# Leer archivo completo
-with open(log_file, 'r') as f:
-    content = f.read()
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 
 # Expresiones regulares
-pattern = re.compile(
-    r"Running .*?with SIG_ALG=(\w+) and KEM_ALG=([-\w]+)\s+(.*?)(?=Running|\Z)",
-    re.DOTALL
-)
+running_pattern = re.compile(r"Running .*?with SIG_ALG=(\w+) and KEM_ALG=([-\w]+)")
 execution_pattern = re.compile(r"Execution (\d+) - (TLS|QUIC)", re.IGNORECASE)
 handshake_pattern = re.compile(r"Handshake duration: ([\d.]+|NaN) ms", re.IGNORECASE)
 
-# Estructuras de datos
-resultados = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: [""] * 500)))
-orden_kems = defaultdict(lambda: defaultdict(list))
 
-# Parsear el contenido
-for match in pattern.finditer(content):
-    sig_alg = match.group(1)
-    kem_alg = match.group(2)
-    block = match.group(3)
+def iter_handshakes(lineas, sig_alg=None, kem_alg=None):
+    """
+    Recorre el log línea a línea (sin cargarlo en memoria) y devuelve cada
+    handshake como (protocolo, sig_alg, kem_alg, ejecucion, duracion).
+
+    Misma máquina de estados que la antigua regex DOTALL:
+    Running ... SIG_ALG/KEM_ALG → Execution N → Handshake duration.
+    Cualquier otra línea con "Running" (p.ej. doCert.sh) cierra el bloque.
+    La duración es None cuando el cliente imprime NaN.
 
+    Las líneas JSON del cliente (OUTPUT_FORMAT=jsonl) traen protocolo, SIG,
+    KEM, ejecución y duración en el propio registro: se cargan con json.loads,
+    sin regex ni estado.
+
+    sig_alg/kem_alg permiten arrancar a mitad de un bloque (modo paralelo).
+    """
     current_protocolo = None
     current_exec = None
 
-    for line in block.splitlines():
+    for line in lineas:
+        if line.startswith('{"'):
+            registro = json.loads(line)
+            duracion = registro["duration_ms"]
+            yield (registro["protocol"].upper(), registro["sig"], registro["kem"],
+                   int(registro["run"]) - 1, None if duracion is None else float(duracion))
+            continue
+
+        if "Running" in line:
+            m = running_pattern.search(line)
+            sig_alg, kem_alg = m.groups() if m else (None, None)
+            current_protocolo = current_exec = None
+            continue
+
+        if kem_alg is None:
+            continue
+
         exec_match = execution_pattern.search(line)
         if exec_match:
-            current_exec = int(exec_match.group(1)) - 1  # index 0–499
+            current_exec = int(exec_match.group(1)) - 1  # index 0-based
             current_protocolo = exec_match.group(2).upper()
             continue
 
         hs_match = handshake_pattern.search(line)
         if hs_match and current_protocolo and current_exec is not None:
             valor = hs_match.group(1)
-            duration = "" if valor.upper() == "NAN" else float(valor)
-            resultados[current_protocolo][sig_alg][kem_alg][current_exec] = duration
-
-            if kem_alg not in orden_kems[current_protocolo][sig_alg]:
-                orden_kems[current_protocolo][sig_alg].append(kem_alg)
-
-# Guardar los CSVs
-for protocolo, firmas in resultados.items():
-    for sig_alg, kem_dict in firmas.items():
-        kems = orden_kems[protocolo][sig_alg]
-        columnas = [kem_dict[kem] for kem in kems]
-        filas = list(zip(*columnas))
-
-        filename = os.path.join(dir_output, f"{sig_alg}_{protocolo.lower()}_{tag}.csv")
-
-        print(f"\n📁 File generated: {filename}")
-        with open(filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(kems)
-            writer.writerows(filas)
-
-        # Resumen por KEM
-        for i, kem in enumerate(kems):
-            col = columnas[i]
-            vacios = sum(1 for x in col if x == "")
-            validos = 500 - vacios
-            print(f"  → {kem:20} ✓ {validos:3} valid   ✗ {vacios:3} empty")
-
-print("\n✅ CSVs generated.")
+            duracion = None if valor.upper() == "NAN" else float(valor)
+            yield current_protocolo, sig_alg, kem_alg, current_exec, duracion
+
+
+def nuevo_bloque():
+    # Una columna array('d') por KEM (8 bytes por ejecución); NaN = fallo o ausente
+    return defaultdict(lambda: array('d')), []
+
+
+def guardar(columna, ejecucion, duracion):
+    """Guarda la duración de la ejecución (0-based), ampliando la columna con NaN si hace falta."""
+    if ejecucion < 0:
+        return
+    if ejecucion >= len(columna):
+        columna.extend(repeat(math.nan, ejecucion + 1 - len(columna)))
+    columna[ejecucion] = math.nan if duracion is None else duracion
+
+
+def cargar_csv(filename):
+    """Recupera un CSV ya escrito si su bloque (protocolo, SIG) reaparece en el log."""
+    kem_dict, kems = nuevo_bloque()
+    with open(filename, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        kems.extend(next(reader, []))
+        for i, fila in enumerate(reader):
+            for kem, valor in zip(kems, fila):
+                guardar(kem_dict[kem], i, float(valor) if valor else None)
+    return kem_dict, kems
+
+
+def escribir_csv(filename, kem_dict, kems):
+    columnas = [kem_dict[kem] for kem in kems]
+    total = max((len(col) for col in columnas), default=0)
+    filas = (
+        ["" if i >= len(col) or math.isnan(col[i]) else col[i] for col in columnas]
+        for i in range(total)
+    )
+
+    print(f"\n📁 File generated: {filename}")
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(kems)
+        writer.writerows(filas)
+
+    # Resumen por KEM
+    for i, kem in enumerate(kems):
+        col = columnas[i]
+        validos = sum(1 for x in col if not math.isnan(x))
+        vacios = total - validos
+        print(f"  → {kem:20} ✓ {validos:3} valid   ✗ {vacios:3} empty")
+
+
+def volcar_bloque(filename, kem_dict, kems, protocolo, sig_alg, tag, dir_parquet=None):
+    """Escribe el CSV ancho del bloque y, si se pide, su versión larga en Parquet."""
+    escribir_csv(filename, kem_dict, kems)
+    if dir_parquet:
+        import handshake_store
+        salida = handshake_store.escribir_bloque(dir_parquet, protocolo, tag, sig_alg, kem_dict, kems)
+        print(f"  🧱 Parquet: {salida}")
+
+
+def ruta_csv(dir_output, protocolo, sig_alg, tag):
+    return os.path.join(dir_output, f"{sig_alg}_{protocolo.lower()}_{tag}.csv")
+
+
+def procesar_log(log_file, tag, dir_output, dir_parquet=None):
+    with open(log_file, 'r') as f:
+        return procesar_lineas(f, tag, dir_output, dir_parquet)
+
+
+def procesar_lineas(lineas, tag, dir_output, dir_parquet=None, al_handshake=None):
+    """
+    Parsea el log en streaming y escribe un CSV por (protocolo, SIG) en cuanto
+    termina su bloque, de modo que sólo se mantiene en memoria el bloque actual.
+    al_handshake(protocolo, sig, kem, ejecucion, duracion) se llama por cada handshake.
+    Devuelve los (protocolo, sig_alg) escritos.
+    """
+    os.makedirs(dir_output, exist_ok=True)
+
+    def ruta(protocolo, sig_alg):
+        return ruta_csv(dir_output, protocolo, sig_alg, tag)
+
+    def volcar(clave):
+        volcar_bloque(ruta(*clave), kem_dict, kems, *clave, tag, dir_parquet)
+
+    escritos = set()
+    actual = None
+    kem_dict, kems = nuevo_bloque()
+
+    try:
+        for protocolo, sig_alg, kem_alg, ejecucion, duracion in iter_handshakes(lineas):
+            if al_handshake:
+                al_handshake(protocolo, sig_alg, kem_alg, ejecucion, duracion)
+
+            clave = (protocolo, sig_alg)
+            if clave != actual:
+                if actual is not None:
+                    volcar(actual)
+                    escritos.add(actual)
+                actual = clave
+                if clave in escritos:
+                    kem_dict, kems = cargar_csv(ruta(*clave))
+                else:
+                    kem_dict, kems = nuevo_bloque()
+
+            guardar(kem_dict[kem_alg], ejecucion, duracion)
+            if kem_alg not in kems:
+                kems.append(kem_alg)
+    finally:
+        # también al interrumpir un seguimiento en vivo: el bloque en curso no se pierde
+        if actual is not None:
+            volcar(actual)
+            escritos.add(actual)
+    return escritos
+
+
+# --- Modo paralelo ------------------------------------------------------------------
+# El log se mapea en memoria y se trocea en las líneas "Running ...". Cada trozo
+# empieza con el estado de la máquina conocido, así que se puede parsear en un
+# proceso independiente y luego unir los resultados en el orden del fichero.
+running_bytes = re.compile(rb"Running[^\n]*")
+running_kem_bytes = re.compile(rb"Running .*?with SIG_ALG=(\w+) and KEM_ALG=([-\w]+)")
+
+TAM_TROZO = 8 * 1024 * 1024  # bytes; los bloques de un KEM más grandes se subdividen
+
+
+def dividir_log(log_file, tam_trozo=TAM_TROZO):
+    """
+    Devuelve [(inicio, fin, sig_alg, kem_alg), ...] en orden de fichero.
+    Los bloques de un KEM mayores que tam_trozo se cortan en líneas
+    "Execution", arrastrando SIG/KEM como estado inicial.
+    """
+    with open(log_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            cortes = []
+            for m in running_bytes.finditer(mm):
+                inicio = mm.rfind(b"\n", 0, m.start()) + 1
+                kem_match = running_kem_bytes.search(m.group(0))
+                sig_kem = tuple(g.decode() for g in kem_match.groups()) if kem_match else (None, None)
+                cortes.append((inicio, *sig_kem))
+
+            # Un .jsonl sin líneas "Running" (o lo que preceda a la primera)
+            # puede contener registros JSON: se parsea como un trozo más.
+            primero = cortes[0][0] if cortes else len(mm)
+            trozos = [(0, primero, None, None)] if primero > 0 else []
+            for i, (inicio, sig_alg, kem_alg) in enumerate(cortes):
+                if kem_alg is None:
+                    continue
+                fin = cortes[i + 1][0] if i + 1 < len(cortes) else len(mm)
+                while fin - inicio > tam_trozo:
+                    corte = mm.find(b"\nExecution ", inicio + tam_trozo, fin)
+                    if corte < 0:
+                        break
+                    trozos.append((inicio, corte + 1, sig_alg, kem_alg))
+                    inicio = corte + 1
+                trozos.append((inicio, fin, sig_alg, kem_alg))
+            return trozos
+
+
+def parsear_trozo(args):
+    """Parsea [inicio, fin) del log. Devuelve [(protocolo, sig, kem, ejecuciones, duraciones), ...]."""
+    log_file, inicio, fin, sig_alg, kem_alg = args
+    with open(log_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            texto = mm[inicio:fin].decode('utf-8', errors='replace')
+
+    grupos = []
+    clave = None
+    for protocolo, sig, kem, ejecucion, duracion in iter_handshakes(texto.splitlines(), sig_alg, kem_alg):
+        if (protocolo, sig, kem) != clave:
+            clave = (protocolo, sig, kem)
+            grupos.append((protocolo, sig, kem, array('l'), array('d')))
+        grupos[-1][3].append(ejecucion)
+        grupos[-1][4].append(math.nan if duracion is None else duracion)
+    return grupos
+
+
+def recoger_bloques(log_file, jobs=None):
+    """
+    Parsea el log completo en {(protocolo, sig_alg): (kem_dict, kems)}.
+    Con jobs=None los trozos se parsean en este proceso; con jobs >= 0 se
+    reparten en un pool de procesos (0 = un proceso por núcleo). Los resultados
+    se unen en el orden original, de modo que el orden de los KEM (orden_kems)
+    y de los ficheros es el mismo que en modo secuencial.
+    """
+    trozos = [(log_file, *t) for t in dividir_log(log_file)]
+    bloques = {}
+
+    def unir(grupos):
+        for protocolo, sig_alg, kem_alg, ejecuciones, duraciones in grupos:
+            kem_dict, kems = bloques.setdefault((protocolo, sig_alg), nuevo_bloque())
+            if kem_alg not in kems:
+                kems.append(kem_alg)
+            columna = kem_dict[kem_alg]
+            for ejecucion, duracion in zip(ejecuciones, duraciones):
+                guardar(columna, ejecucion, duracion)
+
+    if jobs is None:
+        for grupos in map(parsear_trozo, trozos):
+            unir(grupos)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+            for grupos in pool.map(parsear_trozo, trozos):
+                unir(grupos)
+
+    # dict normal (no defaultdict con lambda) para poder guardarlo en la caché
+    return {clave: (dict(kem_dict), kems) for clave, (kem_dict, kems) in bloques.items()}
+
+
+def escribir_bloques(bloques, tag, dir_output, dir_parquet=None):
+    os.makedirs(dir_output, exist_ok=True)
+    for (protocolo, sig_alg), (kem_dict, kems) in bloques.items():
+        filename = ruta_csv(dir_output, protocolo, sig_alg, tag)
+        volcar_bloque(filename, kem_dict, kems, protocolo, sig_alg, tag, dir_parquet)
+    return set(bloques)
+
+
+def procesar_log_paralelo(log_file, tag, dir_output, jobs=0, dir_parquet=None):
+    """Igual que procesar_log, pero repartiendo los trozos del log en un pool de procesos."""
+    return escribir_bloques(recoger_bloques(log_file, jobs), tag, dir_output, dir_parquet)
+
+
+def procesar_log_cache(log_file, tag, dir_output, jobs=None, dir_parquet=None):
+    """
+    Reutiliza el resultado de un parseo anterior si el log (tamaño, mtime y hash)
+    y este script no han cambiado; si no, lo parsea como siempre (en streaming,
+    o en paralelo con --jobs) y guarda en la caché sólo los CSV terminados, de
+    modo que la caché no añade memoria al parseo.
+    """
+    import parse_cache
+    calculado = []
+
+    def calcular():
+        if jobs is None:
+            escritos = procesar_log(log_file, tag, dir_output, dir_parquet)
+        else:
+            escritos = procesar_log_paralelo(log_file, tag, dir_output, jobs, dir_parquet)
+        calculado.append(True)
+        csvs = {}
+        for protocolo, sig_alg in escritos:
+            with open(ruta_csv(dir_output, protocolo, sig_alg, tag), 'rb') as f:
+                csvs[(protocolo, sig_alg)] = f.read()
+        return csvs
+
+    csvs = parse_cache.cargar_o_calcular(log_file, calcular, "processLogTimeHandshake:csv",
+                                         dependencias=(__file__,))
+    if calculado:
+        return
+    # acierto: se restauran los CSV (y el Parquet, que se regenera desde ellos)
+    os.makedirs(dir_output, exist_ok=True)
+    for (protocolo, sig_alg), contenido in csvs.items():
+        filename = ruta_csv(dir_output, protocolo, sig_alg, tag)
+        with open(filename, 'wb') as f:
+            f.write(contenido)
+        print(f"\n📁 File restored from cache: {filename}")
+        if dir_parquet:
+            import handshake_store
+            kem_dict, kems = cargar_csv(filename)
+            salida = handshake_store.escribir_bloque(dir_parquet, protocolo, tag, sig_alg, kem_dict, kems)
+            print(f"  🧱 Parquet: {salida}")
+
+
+# --- Modo seguimiento (--follow) ----------------------------------------------------
+# Lee el log mientras el barrido sigue escribiéndolo (como `tail -F`), vuelca
+# cada handshake a un CSV largo en vivo y mantiene estadísticas por KEM, para
+# poder vigilar un barrido largo y pararlo antes si algo va mal.
+def seguir(log_file, intervalo=1.0, inactividad=None):
+    """
+    Devuelve las líneas completas del log según se escriben. Termina tras
+    `inactividad` segundos sin datos nuevos (None = nunca, hasta Ctrl-C).
+    """
+    while not os.path.exists(log_file):
+        time.sleep(intervalo)
+
+    pendiente = ""
+    ultimo = time.monotonic()
+    with open(log_file, 'r') as f:
+        while True:
+            trozo = f.readline()
+            if trozo:
+                ultimo = time.monotonic()
+                pendiente += trozo
+                if pendiente.endswith("\n"):
+                    yield pendiente
+                    pendiente = ""
+                continue
+
+            if inactividad is not None and time.monotonic() - ultimo > inactividad:
+                break
+            if os.stat(log_file).st_size < f.tell():  # log truncado/reiniciado
+                f.seek(0)
+                pendiente = ""
+            time.sleep(intervalo)
+
+    if pendiente:
+        yield pendiente
+
+
+def seguir_log(log_file, tag, dir_output, dir_parquet=None, intervalo=1.0, inactividad=None, informe=10.0):
+    from online_stats import EstadisticasKEM, tabla
+
+    os.makedirs(dir_output, exist_ok=True)
+    ruta_live = os.path.join(dir_output, f"live_{tag}.csv")
+    estadisticas = {}
+    ultimo_informe = time.monotonic()
+
+    print(f"👀 Following {log_file} → {ruta_live} (Ctrl-C to stop)")
+    with open(ruta_live, 'w', newline='') as live:
+        writer = csv.writer(live)
+        writer.writerow(["Protocol", "SIG", "KEM", "Execution", "Time_ms", "Status"])
+
+        def al_handshake(protocolo, sig_alg, kem_alg, ejecucion, duracion):
+            nonlocal ultimo_informe
+            writer.writerow([protocolo, sig_alg, kem_alg, ejecucion + 1,
+                             "" if duracion is None else duracion,
+                             "failed" if duracion is None else "ok"])
+            live.flush()
+
+            clave = (protocolo, sig_alg, kem_alg)
+            estadisticas.setdefault(clave, EstadisticasKEM()).actualizar(duracion)
+            if time.monotonic() - ultimo_informe >= informe:
+                ultimo_informe = time.monotonic()
+                print(f"\n⏱  {protocolo} {sig_alg} — execution {ejecucion + 1} of {kem_alg}")
+                print(tabla(estadisticas), flush=True)
+
+        try:
+            procesar_lineas(seguir(log_file, intervalo, inactividad), tag, dir_output, dir_parquet, al_handshake)
+        except KeyboardInterrupt:
+            print("\n⏹  Follow stopped.")
+
+    print("\n📈 Summary")
+    print(tabla(estadisticas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrae los tiempos de handshake de un log del cliente a CSV por SIG/protocolo.")
+    parser.add_argument("log_file", metavar="archivo_logs")
+    parser.add_argument("tag")
+    parser.add_argument("dir_output")
+    parser.add_argument("-j", "--jobs", type=int, default=None, nargs="?", const=0,
+                        help="Parseo en paralelo (mmap + pool de procesos). Sin valor: un proceso por núcleo.")
+    parser.add_argument("--parquet", metavar="DIR", default=None,
+                        help="Escribe además un dataset Parquet en formato largo (ver handshake_store.py).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="No usar la caché de resultados (ver parse_cache.py; también HANDSHAKE_CACHE=0).")
+    parser.add_argument("-f", "--follow", action="store_true",
+                        help="Sigue el log mientras se escribe, con estadísticas en vivo por KEM.")
+    parser.add_argument("--idle", type=float, default=None, metavar="SEG",
+                        help="Con --follow: termina tras SEG segundos sin líneas nuevas.")
+    parser.add_argument("--report", type=float, default=10.0, metavar="SEG",
+                        help="Con --follow: cada cuántos segundos se imprimen las estadísticas.")
+    args = parser.parse_args()
+
+    if args.follow:
+        seguir_log(args.log_file, args.tag, args.dir_output, args.parquet,
+                   inactividad=args.idle, informe=args.report)
+    elif not args.no_cache and os.environ.get("HANDSHAKE_CACHE", "1") != "0":
+        procesar_log_cache(args.log_file, args.tag, args.dir_output, args.jobs, args.parquet)
+    elif args.jobs is None:
+        procesar_log(args.log_file, args.tag, args.dir_output, args.parquet)
+    else:
+        procesar_log_paralelo(args.log_file, args.tag, args.dir_output, args.jobs, args.parquet)
+    print("\n✅ CSVs generated.")
+
+
+if __name__ == "__main__":
+    main()
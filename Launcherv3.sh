@@ -6,7 +6,29 @@ set -euo pipefail
 ###############################################################################
 #  COMMAND LINE PARAMETERS
 #
-#  Usage: ./Launcher.sh [tls|quic] [mutual|single] [capture|captureKey|nocapture] [none|simple|stable|unstable] [loss-percent] [delay-ms]
+#  Usage: ./Launcher.sh [tls|quic] [mutual|single] [capture|captureKey|headless|headlessKey|live|nocapture] [none|simple|stable|unstable] [loss-percent] [delay-ms]
+#
+#  capture / captureKey   : interactive (edgeshark + Wireshark), 1 execution per KEM
+#  headless / headlessKey : unattended dumpcap/tcpdump in the server's network
+#                           namespace, one ring buffer per KEM, NUM_RUNS executions
+#  live                   : dumpcap in the server's network namespace streams
+#                           straight into "4- loss/scripts/handshake_live.py";
+#                           handshakes are segmented as they close and no
+#                           pcapng is written to disk
+#  *Key variants also save the TLS/QUIC key log to $HOME/captures/sslkeys
+#
+#  Headless capture settings (environment):
+#    NUM_RUNS=<n>              executions per KEM (default 100)
+#    CAPTURE_DIR=<dir>         output .pcapng files (default $HOME/captures/pcap)
+#    CAPTURE_TOOL=dumpcap|tcpdump
+#    CAPTURE_IMAGE=<image>     image providing the tool (default nicolaka/netshoot)
+#    CAPTURE_RING_MB=<n>       size of each ring file in MB (default 100)
+#    CAPTURE_RING_FILES=<n>    number of ring files kept (default 20)
+#
+#  Live segmentation settings (environment):
+#    LIVE_DIR=<dir>            <sig>_<protocol>_handshakes.csv (default $HOME/captures/live)
+#    LIVE_READER=pcap|tshark   pcap: raw dumpcap stream decoded by pcapng_reader
+#                              tshark: tshark -l field output (needs tshark in CAPTURE_IMAGE)
 ###############################################################################
 
 PROTOCOL=${1:-tls}
@@ -16,9 +38,11 @@ NETWORK_PROFILE=${4:-none}
 LOSS_PERC=${5:-0}
 DELAY_MS=${6:-0}
 
-USAGE="Usage: $0 [tls|quic] [mutual|single] [capture|captureKey|nocapture] [none|simple|stable|unstable] [loss-percent] [delay-ms]"
+USAGE="Usage: $0 [tls|quic] [mutual|single] [capture|captureKey|headless|headlessKey|live|nocapture] [none|simple|stable|unstable] [loss-percent] [delay-ms]"
 
 NETIF="eth0"
+CLIENT_LOG=${CLIENT_LOG:-}   # optional: append client output to this file (see --follow)
+OUTPUT_FORMAT=${OUTPUT_FORMAT:-text}   # text | jsonl (one JSON object per handshake)
 MUTUAL_AUTHENTICATION=false
 IMAGE=uma-tls-quic-pq-34
 os=""
@@ -40,11 +64,18 @@ if [[ "$AUTH_MODE" != "mutual" && "$AUTH_MODE" != "single" ]]; then
 fi
 
 # 3) Packet capture mode
-if [[ "$CAPTURE_MODE" != "capture" && "$CAPTURE_MODE" != "captureKey" && "$CAPTURE_MODE" != "nocapture" ]]; then
-    echo "Invalid capture mode: must be 'capture', 'captureKey', or 'nocapture'."
+LIVE_CAPTURE=false
+case "$CAPTURE_MODE" in
+  capture|captureKey)     INTERACTIVE_CAPTURE=true;  HEADLESS_CAPTURE=false ;;
+  headless|headlessKey)   INTERACTIVE_CAPTURE=false; HEADLESS_CAPTURE=true ;;
+  live)                   INTERACTIVE_CAPTURE=false; HEADLESS_CAPTURE=false; LIVE_CAPTURE=true ;;
+  nocapture)              INTERACTIVE_CAPTURE=false; HEADLESS_CAPTURE=false ;;
+  *)
+    echo "Invalid capture mode: must be 'capture', 'captureKey', 'headless', 'headlessKey', 'live', or 'nocapture'."
     echo "$USAGE"
-    exit 1
-fi
+    exit 1 ;;
+esac
+KEYLOG=$([[ "$CAPTURE_MODE" == *Key ]] && echo true || echo false)
 
 # 4) Network profile
 if [[ "$NETWORK_PROFILE" != "none" && "$NETWORK_PROFILE" != "simple" && "$NETWORK_PROFILE" != "stable" && "$NETWORK_PROFILE" != "unstable" ]]; then
@@ -73,12 +104,36 @@ fi
 #  CONFIGURATION
 ###############################################################################
 
- NUM_RUNS=100
+ NUM_RUNS=${NUM_RUNS:-100}
 
-if [[ "$CAPTURE_MODE" == "capture" || "$CAPTURE_MODE" == "captureKey" ]]; then
+# Interactive capture needs a human per KEM: a single execution
+if [[ "$INTERACTIVE_CAPTURE" == true ]]; then
   NUM_RUNS=1
 fi
 
+CAPTURE_DIR=${CAPTURE_DIR:-$HOME/captures/pcap}
+CAPTURE_TOOL=${CAPTURE_TOOL:-dumpcap}
+CAPTURE_IMAGE=${CAPTURE_IMAGE:-nicolaka/netshoot}
+CAPTURE_RING_MB=${CAPTURE_RING_MB:-100}
+CAPTURE_RING_FILES=${CAPTURE_RING_FILES:-20}
+OQS_CAPTURE="capturador"
+LIVE_DIR=${LIVE_DIR:-$HOME/captures/live}
+LIVE_READER=${LIVE_READER:-pcap}
+LIVE_SCRIPT="$(cd "$(dirname "$0")" && pwd)/4- loss/scripts/handshake_live.py"
+LIVE_PID=""
+
+if [[ "$LIVE_CAPTURE" == true ]]; then
+  if [[ "$LIVE_READER" != "pcap" && "$LIVE_READER" != "tshark" ]]; then
+    echo "Invalid LIVE_READER: must be 'pcap' or 'tshark'."
+    exit 1
+  fi
+  # handshake_live.py appends: refuse to mix with the results of a previous run
+  if compgen -G "$LIVE_DIR/*_${PROTOCOL}_handshakes.csv" >/dev/null; then
+    echo "⚠️  Previous live results in $LIVE_DIR: move them away first"
+    exit 1
+  fi
+fi
+
 if [[ "$AUTH_MODE" == "mutual" ]]; then
    MUTUAL_AUTHENTICATION=true  
 fi
@@ -95,6 +150,14 @@ fi
 STABLE_GEMODEL=(10 50 70 10)    # pg10 pb50 h70 k10
 UNSTABLE_GEMODEL=(20 40 90 20)  # pg20 pb40 h90 k20
 
+# Impairment description recorded in each JSONL record (Pumba runs outside the client)
+case "$NETWORK_PROFILE" in
+  simple)   NETEM_PROFILE="simple loss=${LOSS_PERC}% delay=${DELAY_MS}ms" ;;
+  stable)   NETEM_PROFILE="stable gemodel pg${STABLE_GEMODEL[0]} pb${STABLE_GEMODEL[1]} h${STABLE_GEMODEL[2]} k${STABLE_GEMODEL[3]}" ;;
+  unstable) NETEM_PROFILE="unstable gemodel pg${UNSTABLE_GEMODEL[0]} pb${UNSTABLE_GEMODEL[1]} h${UNSTABLE_GEMODEL[2]} k${UNSTABLE_GEMODEL[3]}" ;;
+  *)        NETEM_PROFILE="none" ;;
+esac
+
 
 echo "*************************************"
 echo "Parameters valid. Starting with:"
@@ -105,6 +168,13 @@ echo "  Network Profile: $NETWORK_PROFILE"
 echo "  Loss %:          $LOSS_PERC"
 echo "  Delay (ms):      $DELAY_MS"
 echo "  Executions:      $NUM_RUNS"
+if [[ "$HEADLESS_CAPTURE" == true ]]; then
+echo "  Capture:         $CAPTURE_TOOL ($CAPTURE_IMAGE) → $CAPTURE_DIR, ring ${CAPTURE_RING_FILES}x${CAPTURE_RING_MB} MB"
+fi
+if [[ "$LIVE_CAPTURE" == true ]]; then
+echo "  Live handshakes: $LIVE_READER stream ($CAPTURE_IMAGE) → $LIVE_DIR"
+fi
+echo "  Output format:   $OUTPUT_FORMAT"
 
 echo "  Signature:       ${SUPPORTED_SIG_ALGS[*]}"
 echo "  KEMS Level 1:    ${KEMS_L1[*]}"
@@ -215,12 +285,139 @@ launch_wireshark_linux() {
         exit 1
     fi
 }
+###############################################################################
+#  Function: start_capture / stop_capture
+#    Headless capture: a sidecar container sharing the server's network
+#    namespace (--network container:...) runs dumpcap or tcpdump on its
+#    interface, writing a ring buffer of pcapng files. stop_capture stops it
+#    (SIGTERM, so the last file is flushed) and merges the ring into
+#    "SIG_ALG=<sig> and KEM_ALG=<kem>.pcapng", the name the analysis expects.
+###############################################################################
+
+start_capture() {
+    local ring="$1"
+    mkdir -p "$CAPTURE_DIR"
+    if compgen -G "$CAPTURE_DIR/${ring}_*" >/dev/null; then
+        echo "⚠️  Leftover ring files for $ring in $CAPTURE_DIR: remove them first"
+        exit 1
+    fi
+
+    local cmd
+    if [[ "$CAPTURE_TOOL" == "tcpdump" ]]; then
+        # -C in millions of bytes, -W ring size (pcap; mergecap writes the final pcapng)
+        cmd=(tcpdump -i "$NETIF" -s 0 -U -n -C "$CAPTURE_RING_MB" -W "$CAPTURE_RING_FILES"
+             -w "/captures/${ring}_.pcap")
+    else
+        cmd=(dumpcap -i "$NETIF" -q -b "filesize:$(( CAPTURE_RING_MB * 1000 ))"
+             -b "files:$CAPTURE_RING_FILES" -w "/captures/${ring}.pcapng")
+    fi
+
+    docker rm -f $OQS_CAPTURE &>/dev/null || true
+    docker run -d --name $OQS_CAPTURE \
+        --network "container:$OQS_SERVER" \
+        --cap-add=NET_ADMIN --cap-add=NET_RAW \
+        -v "$CAPTURE_DIR":/captures \
+        "$CAPTURE_IMAGE" "${cmd[@]}" >/dev/null
+
+    # Wait until the tool has created its first file (interface open)
+    for _ in $(seq 1 50); do
+        compgen -G "$CAPTURE_DIR/${ring}_*" >/dev/null && return 0
+        if [[ "$(docker inspect -f '{{.State.Running}}' $OQS_CAPTURE 2>/dev/null)" != "true" ]]; then
+            break
+        fi
+        sleep 0.1
+    done
+    compgen -G "$CAPTURE_DIR/${ring}_*" >/dev/null && return 0
+    echo "❌ Capture did not start:"
+    docker logs $OQS_CAPTURE 2>&1 | tail -5
+    exit 1
+}
+
+stop_capture() {
+    local ring="$1" output="$2"
+    docker stop -t 10 $OQS_CAPTURE >/dev/null 2>&1 || true
+    docker rm -f $OQS_CAPTURE >/dev/null 2>&1 || true
+
+    # Oldest first (ring files are reused, so their names do not give the order)
+    local pieces=()
+    while IFS= read -r f; do pieces+=("$f"); done < <(ls -tr "$CAPTURE_DIR/${ring}"_* 2>/dev/null)
+    if (( ${#pieces[@]} == 0 )); then
+        echo "⚠️  No capture files for $ring"
+        return 0
+    fi
+    if (( ${#pieces[@]} >= CAPTURE_RING_FILES )); then
+        echo "⚠️  Ring buffer full for $ring: the oldest packets may have been overwritten (raise CAPTURE_RING_FILES/CAPTURE_RING_MB)"
+    fi
+
+    # Ring files → one capture per KEM (merged and removed inside the container,
+    # since the files belong to the capture container's root user)
+    local names=()
+    for f in "${pieces[@]}"; do names+=("/captures/$(basename "$f")"); done
+    docker run --rm -v "$CAPTURE_DIR":/captures "$CAPTURE_IMAGE" \
+        sh -c 'out="$1"; shift; mergecap -F pcapng -w "$out" "$@" && rm -f "$@"' _ \
+        "/captures/$output" "${names[@]}"
+    echo "    📦 Capture saved: $CAPTURE_DIR/$output"
+}
+
+###############################################################################
+#  Function: start_live / stop_live
+#    Live segmentation: the sidecar container writes the capture to its
+#    stdout (dumpcap -w -, or tshark -l fields) and the pipe feeds
+#    handshake_live.py on the host, which appends each handshake to
+#    "$LIVE_DIR/<sig>_<protocol>_handshakes.csv" as soon as it closes.
+#    stop_live stops the container; at EOF the analyzer reports the
+#    handshakes still open as incomplete and exits.
+###############################################################################
+
+start_live() {
+    local sig="$1" kem="$2"
+    mkdir -p "$LIVE_DIR"
+
+    local cmd
+    if [[ "$LIVE_READER" == "tshark" ]]; then
+        cmd=(tshark -l -n -i "$NETIF" -T fields
+             -e frame.number -e frame.time_relative -e frame.time_epoch -e frame.len
+             -e eth.src -e eth.dst -e ip.src -e ip.dst
+             -e _ws.col.Protocol -e _ws.col.Info
+             -e tcp.srcport -e tcp.dstport -e udp.srcport -e udp.dstport -e quic.crypto.offset
+             -E header=y -E separator=, -E quote=d -E occurrence=f)
+    else
+        cmd=(dumpcap -i "$NETIF" -q -w -)
+    fi
+
+    docker rm -f $OQS_CAPTURE &>/dev/null || true
+    docker run --rm --name $OQS_CAPTURE \
+        --network "container:$OQS_SERVER" \
+        --cap-add=NET_ADMIN --cap-add=NET_RAW \
+        "$CAPTURE_IMAGE" "${cmd[@]}" 2>/dev/null \
+      | python3 "$LIVE_SCRIPT" "$PROTOCOL" "$sig" "$kem" --entrada "$LIVE_READER" \
+          -o "$LIVE_DIR/${sig}_${PROTOCOL}_handshakes.csv" &
+    LIVE_PID=$!
+
+    # Wait until the capture container is up (interface open)
+    for _ in $(seq 1 50); do
+        [[ "$(docker inspect -f '{{.State.Running}}' $OQS_CAPTURE 2>/dev/null)" == "true" ]] && { sleep 0.5; return 0; }
+        sleep 0.1
+    done
+    echo "❌ Live capture did not start"
+    exit 1
+}
+
+stop_live() {
+    docker stop -t 10 $OQS_CAPTURE >/dev/null 2>&1 || true
+    if [[ -n "$LIVE_PID" ]]; then
+        wait "$LIVE_PID" || echo "⚠️  handshake_live.py exited with an error"
+        LIVE_PID=""
+    fi
+}
+
 ###############################################################################
 #  Function: cleaning
 #    
 ###############################################################################
 
 cleaning(){
+    docker kill $OQS_CAPTURE &>/dev/null || true
     docker kill $OQS_SERVER &>/dev/null || true
     docker kill $OQS_CLIENT &>/dev/null || true
 
@@ -260,7 +457,7 @@ echo "*************************************"
 
 
 
-if [[ "$CAPTURE_MODE" == "capture" || "$CAPTURE_MODE" == "captureKey" ]]; then
+if [[ "$INTERACTIVE_CAPTURE" == true ]]; then
     echo ""
     echo "Launching edgeshark"
     launch_edgeshark
@@ -301,7 +498,7 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
 
             SSL_DIR="$HOME/captures/sslkeys"
 
-            if [ "$PROTOCOL" = "tls" ] && [ "$CAPTURE_MODE" = "captureKey" ]; then
+            if [ "$PROTOCOL" = "tls" ] && [ "$KEYLOG" = true ]; then
                 mkdir -p "$SSL_DIR"
 
                 SSLKEY_NAME="sslkeys_server_${SIG_ALG}_${KEM}.log"
@@ -324,7 +521,7 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
               -e SIG_ALG=$SIG_ALG \
               -e USE_TLS=$USE_TLS \
               -e MUTUAL=$MUTUAL_AUTHENTICATION \
-             $( [ "$PROTOCOL" = "tls" ] && [ "$CAPTURE_MODE" = "captureKey" ] && echo "-e SSL_DIR=/sslkeys" ) \
+             $( [ "$PROTOCOL" = "tls" ] && [ "$KEYLOG" = true ] && echo "-e SSL_DIR=/sslkeys" ) \
               -d $IMAGE perftestServerTlsQuic.sh
            
             sleep 3    
@@ -334,7 +531,7 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
             echo "    IP..  $IP"
 
             
-            if [[ "$CAPTURE_MODE" == "capture" || "$CAPTURE_MODE" == "captureKey" ]]; then
+            if [[ "$INTERACTIVE_CAPTURE" == true ]]; then
                 echo ""
                 echo "Launching Wireshark"
 
@@ -345,6 +542,16 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
                 fi    
             fi   
 
+            CAPTURE_RING="${SIG_ALG}_${KEM}"
+            if [[ "$HEADLESS_CAPTURE" == true ]]; then
+                echo "    Starting $CAPTURE_TOOL in $OQS_SERVER's network namespace"
+                start_capture "$CAPTURE_RING"
+            fi
+            if [[ "$LIVE_CAPTURE" == true ]]; then
+                echo "    Streaming $OQS_SERVER's traffic into handshake_live.py"
+                start_live "$SIG_ALG" "$KEM"
+            fi
+
 
             ############################################################################
             #  NETWORK IMPAIRMENTS (Pumba)
@@ -379,7 +586,7 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
 
                 #SSL_DIR="$HOME/captures/sslkeys"
 
-            if [ "$PROTOCOL" = "quic" ] && [ "$CAPTURE_MODE" = "captureKey" ]; then
+            if [ "$PROTOCOL" = "quic" ] && [ "$KEYLOG" = true ]; then
                 mkdir -p "$SSL_DIR"
 
                 SSLKEY_NAME="sslkeys_client_${SIG_ALG}_${KEM}.log"
@@ -404,7 +611,9 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
                 -e USE_TLS=$USE_TLS \
                 -e NUM_RUNS=$NUM_RUNS \
                 -e MUTUAL=$MUTUAL_AUTHENTICATION \
-                $( [ "$PROTOCOL" = "quic" ]  && [ "$CAPTURE_MODE" = "captureKey" ] && echo "-e SSL_DIR=/sslkeys" ) \
+                -e OUTPUT_FORMAT=$OUTPUT_FORMAT \
+                -e NETEM_PROFILE="$NETEM_PROFILE" \
+                $( [ "$PROTOCOL" = "quic" ]  && [ "$KEYLOG" = true ] && echo "-e SSL_DIR=/sslkeys" ) \
                 "$IMAGE" sleep infinity
 
 
@@ -432,11 +641,24 @@ for SIG_ALG in "${SIG_ALGS[@]}"; do
             echo "**************************"
             echo "     Executing test  ... "
 
-            docker exec -it $OQS_CLIENT ./perftestClientTlsQuic.sh
+            if [[ -n "$CLIENT_LOG" ]]; then
+                # Live log: can be followed while the sweep runs with
+                #   processLogTimeHandshake.py "$CLIENT_LOG" <tag> <dir_output> --follow
+                docker exec -it $OQS_CLIENT ./perftestClientTlsQuic.sh | tee -a "$CLIENT_LOG"
+            else
+                docker exec -it $OQS_CLIENT ./perftestClientTlsQuic.sh
+            fi
 
             echo "     Waiting  ... "
             sleep 3
 
+            if [[ "$HEADLESS_CAPTURE" == true ]]; then
+                stop_capture "$CAPTURE_RING" "SIG_ALG=${SIG_ALG} and KEM_ALG=${KEM}.pcapng"
+            fi
+            if [[ "$LIVE_CAPTURE" == true ]]; then
+                stop_live
+            fi
+
          echo "   Shutting down server and impairments..."
         
          docker kill $OQS_SERVER &>/dev/null || true